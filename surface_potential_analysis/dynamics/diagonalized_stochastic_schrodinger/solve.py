@@ -1,19 +1,34 @@
 from __future__ import annotations
 
+import warnings
 from typing import TYPE_CHECKING, Any, Literal, TypeVar, overload
 
 import numpy as np
-from sse_solver_py import solve_sse_euler_bra_ket
 
 from surface_potential_analysis.basis.basis import FundamentalBasis
 from surface_potential_analysis.basis.stacked_basis import TupleBasis
+from surface_potential_analysis.dynamics.trajectories import (
+    TrajectoryScheduler,
+    run_trajectories,
+    solver_accepts,
+)
 from surface_potential_analysis.state_vector.state_vector_list import (
     get_basis_states,
     get_state_dual_vector,
     get_state_vector,
 )
 
+try:
+    from sse_solver_py import solve_sse_euler_bra_ket
+except ImportError:
+    # if sse_solver_py is not installed, fall back to the numpy implementation
+    from surface_potential_analysis.dynamics.stochastic_schrodinger._integrator import (
+        solve_sse_euler_bra_ket,
+    )
+
 if TYPE_CHECKING:
+    from collections.abc import Callable
+
     from surface_potential_analysis.basis.basis_like import BasisLike
     from surface_potential_analysis.basis.explicit_basis import ExplicitBasis
     from surface_potential_analysis.basis.stacked_basis import TupleBasisLike
@@ -45,6 +60,7 @@ def solve_stochastic_schrodinger_equation(
     | None = None,
     *,
     n_trajectories: _L1Inv,
+    scheduler: TrajectoryScheduler | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[_L1Inv], _AX0Inv], _B1Inv]:
     ...
 
@@ -58,11 +74,12 @@ def solve_stochastic_schrodinger_equation(
     | None = None,
     *,
     n_trajectories: Literal[1] = 1,
+    scheduler: TrajectoryScheduler | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[Literal[1]], _AX0Inv], _B1Inv]:
     ...
 
 
-def solve_stochastic_schrodinger_equation(  # type: ignore bad overload
+def solve_stochastic_schrodinger_equation(  # type: ignore bad overload  # noqa: PLR0913
     initial_state: StateVector[_B1Inv],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1Inv],
@@ -70,47 +87,96 @@ def solve_stochastic_schrodinger_equation(  # type: ignore bad overload
     | None = None,
     *,
     n_trajectories: int = 1,
+    scheduler: TrajectoryScheduler | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[Any], _AX0Inv], _B1Inv]:
+    """
+    Solve the stochastic schrodinger equation, given diagonal noise operators.
+
+    By default all trajectories are integrated in a single call to the solver.
+    A scheduler can be provided to run chunks of trajectories on a pool of workers.
+    Only the numpy solver can be seeded, so a warning is given if scheduler
+    has a seed but sse_solver_py is used.
+
+    Returns
+    -------
+    StateVectorList[TupleBasisLike[FundamentalBasis[Any], _AX0Inv], _B1Inv]
+    """
     assert times.offset == 0
-
-    data = np.zeros(
-        (n_trajectories, times.n, initial_state["data"].size), dtype=np.complex128
+    scheduler = (
+        TrajectoryScheduler(n_workers=1, chunk_size=max(n_trajectories, 1))
+        if scheduler is None
+        else scheduler
     )
+
     collapse_operators = [] if collapse_operators is None else collapse_operators
-    amplitudes = list[complex]()
-    bra = list[complex]()
-    ket = list[complex]()
-    for operator in collapse_operators:
+    n_states = initial_state["data"].size
+    amplitudes = np.zeros(len(collapse_operators), dtype=np.complex128)
+    bra = np.zeros((len(collapse_operators), n_states), dtype=np.complex128)
+    ket = np.zeros((len(collapse_operators), n_states), dtype=np.complex128)
+    for i, operator in enumerate(collapse_operators):
         # TODO: is it correct to pass bra as a dual_vector..
         states_bra = get_basis_states(operator["basis"][0])
         assert states_bra["basis"][0].n == 1
-        state_bra = get_state_dual_vector(states_bra, 0)
-        ket.extend(state_bra["data"])
+        bra[i] = get_state_dual_vector(states_bra, 0)["data"]
 
         states_ket = get_basis_states(operator["basis"][0])
         assert states_ket["basis"][0].n == 1
-        state_ket = get_state_vector(states_ket, 0)
-        ket.extend(state_ket["data"])
-
-        amplitudes.append(operator["data"].item())
-
-    for i in range(n_trajectories):
-        out = solve_sse_euler_bra_ket(
-            list(initial_state["data"]),
-            list(hamiltonian["data"]),
-            amplitudes,
-            bra,
-            ket,
-            times.n,
-            times.step,
-            times.fundamental_dt,
+        ket[i] = get_state_vector(states_ket, 0)["data"]
+
+        amplitudes[i] = operator["data"].item()
+
+    initial = np.ascontiguousarray(initial_state["data"], dtype=np.complex128)
+    hamiltonian_data = np.ascontiguousarray(hamiltonian["data"], dtype=np.complex128)
+    batched = solver_accepts(solve_sse_euler_bra_ket, "n_trajectories")
+    # sse_solver_py uses its own source of noise, so only
+    # the numpy implementation can be seeded
+    seeded = solver_accepts(solve_sse_euler_bra_ket, "rng")
+    if scheduler.seed is not None and not seeded:
+        warnings.warn(
+            "The installed solver cannot be seeded, so the trajectories "
+            "are not reproducible for the seed of scheduler",
+            stacklevel=2,
+        )
+    writes_out = solver_accepts(solve_sse_euler_bra_ket, "out")
+    # Older versions of sse_solver_py solve a single trajectory, taking lists
+    args = (
+        (initial, hamiltonian_data, amplitudes, bra, ket)
+        if batched
+        else (
+            list(initial),
+            list(hamiltonian_data),
+            list(amplitudes),
+            list(bra.reshape(-1)),
+            list(ket.reshape(-1)),
         )
-        data[i] = np.array(out).reshape(times.n, -1)
-
-    return {
-        "data": data.reshape(-1),
-        "basis": TupleBasis(
-            TupleBasis(FundamentalBasis(n_trajectories), times),
-            initial_state["basis"],
-        ),
-    }
+    )
+
+    def _solve_chunk(
+        n: int,
+        rng: np.random.Generator,
+    ) -> StateVectorList[TupleBasisLike[FundamentalBasis[int], _AX0Inv], _B1Inv]:
+        data = np.empty((n, times.n, n_states), dtype=np.complex128)
+        kwargs: dict[str, Any] = {"rng": rng} if seeded else {}
+        if batched:
+            kwargs["n_trajectories"] = n
+            if writes_out:
+                kwargs["out"] = data
+            out = solve_sse_euler_bra_ket(
+                *args, times.n, times.step, times.fundamental_dt, **kwargs
+            )
+            if not writes_out:
+                data[:] = np.asarray(out).reshape(data.shape)
+        else:
+            for i in range(n):
+                out = solve_sse_euler_bra_ket(
+                    *args, times.n, times.step, times.fundamental_dt, **kwargs
+                )
+                data[i] = np.asarray(out).reshape(times.n, -1)
+        return {
+            "data": data.reshape(-1),
+            "basis": TupleBasis(
+                TupleBasis(FundamentalBasis(n), times), initial_state["basis"]
+            ),
+        }
+
+    return run_trajectories(_solve_chunk, n_trajectories, scheduler)
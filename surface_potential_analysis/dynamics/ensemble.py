@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Any, Literal, TypeVar
+
+import numpy as np
+
+from surface_potential_analysis.basis.stacked_basis import TupleBasis
+from surface_potential_analysis.dynamics.isf import calculate_isf_approximate_locations
+from surface_potential_analysis.dynamics.trajectories import (
+    TrajectoryScheduler,
+    run_trajectories,
+)
+from surface_potential_analysis.probability_vector.probability_vector import (
+    from_state_vector_list,
+)
+from surface_potential_analysis.state_vector.eigenstate_calculation import (
+    calculate_expectation_list,
+)
+from surface_potential_analysis.util.statistics import WelfordAccumulator
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from surface_potential_analysis.basis.basis import FundamentalBasis
+    from surface_potential_analysis.basis.basis_like import BasisLike
+    from surface_potential_analysis.basis.stacked_basis import TupleBasisLike
+    from surface_potential_analysis.dynamics.tunnelling_basis import (
+        TunnellingSimulationBasis,
+    )
+    from surface_potential_analysis.operator.operator import (
+        Operator,
+        StatisticalDiagonalOperator,
+    )
+    from surface_potential_analysis.probability_vector.probability_vector import (
+        ProbabilityVector,
+    )
+    from surface_potential_analysis.state_vector.eigenstate_collection import (
+        StatisticalValueList,
+    )
+    from surface_potential_analysis.state_vector.state_vector_list import (
+        StateVectorList,
+    )
+
+    _B0 = TypeVar("_B0", bound=BasisLike[Any, Any])
+    _B1 = TypeVar("_B1", bound=BasisLike[Any, Any])
+    _B2 = TypeVar("_B2", bound=BasisLike[Any, Any])
+    _B3 = TypeVar("_B3", bound=TunnellingSimulationBasis[Any, Any, Any])
+
+
+def accumulate_probabilities(
+    trajectory: StateVectorList[_B0, _B1],
+    accumulator: WelfordAccumulator | None = None,
+) -> WelfordAccumulator:
+    """
+    Add the probabilities of a single trajectory to the ensemble statistics.
+
+    Parameters
+    ----------
+    trajectory : StateVectorList[_B0, _B1]
+        the states of a single trajectory, at each time in _B0
+    accumulator : WelfordAccumulator | None, optional
+        accumulator to update, by default a new accumulator
+
+    Returns
+    -------
+    WelfordAccumulator
+    """
+    accumulator = WelfordAccumulator() if accumulator is None else accumulator
+    accumulator.add(np.real(from_state_vector_list(trajectory)["data"]))
+    return accumulator
+
+
+def accumulate_expectations(
+    operator: Operator[_B2, Any],
+    trajectory: StateVectorList[_B0, _B1],
+    accumulator: WelfordAccumulator | None = None,
+) -> WelfordAccumulator:
+    """
+    Add the expectation of operator for a single trajectory to the ensemble statistics.
+
+    Parameters
+    ----------
+    operator : Operator[_B2, Any]
+    trajectory : StateVectorList[_B0, _B1]
+        the states of a single trajectory, at each time in _B0
+    accumulator : WelfordAccumulator | None, optional
+        accumulator to update, by default a new accumulator
+
+    Returns
+    -------
+    WelfordAccumulator
+    """
+    accumulator = WelfordAccumulator() if accumulator is None else accumulator
+    accumulator.add(calculate_expectation_list(operator, trajectory)["data"])
+    return accumulator
+
+
+def accumulate_isf_approximate_locations(
+    initial_occupation: ProbabilityVector[_B3],
+    trajectory: StateVectorList[_B0, _B3],
+    dk: np.ndarray[tuple[Literal[2]], np.dtype[np.float64]],
+    accumulator: WelfordAccumulator | None = None,
+) -> WelfordAccumulator:
+    """
+    Add the ISF of a single trajectory to the ensemble statistics.
+
+    See calculate_isf_approximate_locations.
+
+    Parameters
+    ----------
+    initial_occupation : ProbabilityVector[_B3]
+    trajectory : StateVectorList[_B0, _B3]
+        the states of a single trajectory, at each time in _B0
+    dk : np.ndarray[tuple[Literal[2]], np.dtype[np.float64]]
+    accumulator : WelfordAccumulator | None, optional
+        accumulator to update, by default a new accumulator
+
+    Returns
+    -------
+    WelfordAccumulator
+    """
+    accumulator = WelfordAccumulator() if accumulator is None else accumulator
+    isf = calculate_isf_approximate_locations(
+        initial_occupation, from_state_vector_list(trajectory), dk
+    )
+    accumulator.add(isf["data"])
+    return accumulator
+
+
+def get_ensemble_average(
+    accumulator: WelfordAccumulator, basis: _B0
+) -> StatisticalValueList[_B0]:
+    """
+    Get the ensemble average, with the standard error of the mean.
+
+    Parameters
+    ----------
+    accumulator : WelfordAccumulator
+    basis : _B0
+        basis of the accumulated values
+
+    Returns
+    -------
+    StatisticalValueList[_B0]
+    """
+    assert accumulator.mean is not None
+    return {
+        "basis": basis,
+        "data": accumulator.mean.reshape(-1),
+        "standard_deviation": accumulator.standard_error.reshape(-1),
+    }
+
+
+def get_ensemble_isf(
+    accumulator: WelfordAccumulator, basis: _B0
+) -> StatisticalDiagonalOperator[_B0, _B0]:
+    """
+    Get the ensemble average ISF, with the standard error of the mean.
+
+    Parameters
+    ----------
+    accumulator : WelfordAccumulator
+    basis : _B0
+        time basis of the ISF
+
+    Returns
+    -------
+    StatisticalDiagonalOperator[_B0, _B0]
+    """
+    average = get_ensemble_average(accumulator, basis)
+    return {
+        "basis": TupleBasis(basis, basis),
+        "data": average["data"].astype(np.complex128),
+        "standard_deviation": average["standard_deviation"],
+    }
+
+
+@dataclass
+class ConvergedEnsemble:
+    """
+    The result of run_trajectories_until_converged.
+
+    accumulator holds the statistics of the observable, error is the largest
+    standard error of the mean, and converged is True if error reached the
+    requested tolerance before the trajectory or time budget was exhausted.
+    """
+
+    accumulator: WelfordAccumulator
+    error: float
+    converged: bool
+    elapsed: float
+
+    @property
+    def n_trajectories(self) -> int:
+        """The number of trajectories which were run."""
+        return self.accumulator.n
+
+
+def _get_max_error(accumulator: WelfordAccumulator) -> float:
+    if accumulator.n < 2:  # noqa: PLR2004
+        return np.inf
+    return float(np.max(accumulator.standard_error))
+
+
+def run_trajectories_until_converged(  # noqa: PLR0913
+    solve_batch: Callable[
+        [int, np.random.Generator],
+        StateVectorList[TupleBasisLike[FundamentalBasis[Any], _B0], _B1],
+    ],
+    observable: Callable[[StateVectorList[_B0, _B1]], np.ndarray[Any, np.dtype[Any]]],
+    *,
+    tolerance: float,
+    batch_size: int = 8,
+    max_trajectories: int | None = None,
+    time_budget: float | None = None,
+    scheduler: TrajectoryScheduler | None = None,
+) -> ConvergedEnsemble:
+    """
+    Run batches of trajectories until the standard error of observable is below tolerance.
+
+    Each batch is run with run_trajectories, and observable is then evaluated
+    for each trajectory in turn, so only a single batch is held in memory.
+    Every batch is seeded from a fresh seed sequence spawned from
+    scheduler.seed, so the result is reproducible for a given seed.
+
+    Parameters
+    ----------
+    solve_batch : Callable[[int, np.random.Generator], StateVectorList[TupleBasisLike[FundamentalBasis[Any], _B0], _B1]]
+        solve_batch(n, rng) should return the states of n trajectories
+    observable : Callable[[StateVectorList[_B0, _B1]], np.ndarray[Any, np.dtype[Any]]]
+        the values to track for a single trajectory, such as the ISF at each time
+    tolerance : float
+        the largest acceptable standard error of the mean of any value
+    batch_size : int, optional
+        number of trajectories per batch, by default 8
+    max_trajectories : int | None, optional
+        stop after this many trajectories, by default None
+    time_budget : float | None, optional
+        do not start a new batch after this many seconds, by default None
+    scheduler : TrajectoryScheduler | None, optional
+        scheduler used to run each batch, by default TrajectoryScheduler()
+
+    Returns
+    -------
+    ConvergedEnsemble
+
+    Raises
+    ------
+    ValueError
+        If batch_size or max_trajectories is less than one
+    """
+    if batch_size < 1:
+        msg = "batch_size must be at least 1"
+        raise ValueError(msg)
+    if max_trajectories is not None and max_trajectories < 1:
+        msg = "max_trajectories must be at least 1"
+        raise ValueError(msg)
+    scheduler = TrajectoryScheduler() if scheduler is None else scheduler
+    (seed,) = scheduler.get_seed_sequences(1)
+    start = time.perf_counter()
+    accumulator = WelfordAccumulator()
+
+    while True:
+        n_trajectories = (
+            batch_size
+            if max_trajectories is None
+            else min(batch_size, max_trajectories - accumulator.n)
+        )
+        (batch_seed,) = seed.spawn(1)
+        batch = run_trajectories(
+            solve_batch, n_trajectories, replace(scheduler, seed=batch_seed)
+        )
+        basis = TupleBasis(batch["basis"][0][1], batch["basis"][1])
+        for data in batch["data"].reshape(n_trajectories, -1):
+            accumulator.add(observable({"basis": basis, "data": data}))
+
+        error = _get_max_error(accumulator)
+        elapsed = time.perf_counter() - start
+        converged = error <= tolerance
+        if (
+            converged
+            or (max_trajectories is not None and accumulator.n >= max_trajectories)
+            or (time_budget is not None and elapsed >= time_budget)
+        ):
+            return ConvergedEnsemble(accumulator, error, converged, elapsed)
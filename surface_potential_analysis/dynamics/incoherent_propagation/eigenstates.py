@@ -1,18 +1,28 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, TypeVar
+from typing import TYPE_CHECKING, Any, Literal, TypeVar
 
 import numpy as np
 import scipy.linalg
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.sparse.linalg
+import scipy.stats
 
 from surface_potential_analysis.basis.basis import FundamentalBasis
 from surface_potential_analysis.basis.stacked_basis import TupleBasis
 from surface_potential_analysis.basis.time_basis_like import (
     ExplicitTimeBasis,
 )
+from surface_potential_analysis.dynamics.tunnelling_basis import get_basis_from_shape
 from surface_potential_analysis.util.decorators import timed
 
-from .tunnelling_matrix import get_initial_pure_density_matrix_for_basis
+from .tunnelling_matrix import (
+    as_sparse_tunnelling_matrix,
+    get_initial_pure_density_matrix_for_basis,
+    get_tunnelling_m_matrix_kernel,
+    get_tunnelling_m_matrix_kernel_from_jump_matrix,
+)
 
 if TYPE_CHECKING:
     from surface_potential_analysis.dynamics.tunnelling_basis import (
@@ -27,29 +37,40 @@ if TYPE_CHECKING:
         StateVectorList,
     )
 
-    from .tunnelling_matrix import TunnellingMMatrix
+    from .tunnelling_matrix import (
+        SparseTunnellingMMatrix,
+        TunnellingJumpMatrix,
+        TunnellingMMatrix,
+    )
 
     _L0Inv = TypeVar("_L0Inv", bound=int)
+    _L1Inv = TypeVar("_L1Inv", bound=int)
+    _L2Inv = TypeVar("_L2Inv", bound=int)
     _B0Inv = TypeVar("_B0Inv", bound=TunnellingSimulationBasis[Any, Any, Any])
 
 
 @timed
 def calculate_tunnelling_eigenstates(
-    matrix: TunnellingMMatrix[_B0Inv],
+    matrix: TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv],
 ) -> EigenstateList[FundamentalBasis[int], _B0Inv]:
     """
     Given a tunnelling matrix, find the eigenstates.
 
+    A sparse matrix is converted to a dense matrix, since all eigenstates are required.
+
     Parameters
     ----------
-    matrix : TunnellingMMatrix[_S0Inv]
+    matrix : TunnellingMMatrix[_S0Inv] | SparseTunnellingMMatrix[_S0Inv]
 
     Returns
     -------
     TunnellingEigenstates[_S0Inv]
     """
+    data = matrix["data"]
     eigenvalues, vectors = scipy.linalg.eig(
-        matrix["data"].reshape(matrix["basis"].shape)
+        data.toarray()
+        if scipy.sparse.issparse(data)
+        else data.reshape(matrix["basis"].shape)
     )
     return {
         "basis": TupleBasis(FundamentalBasis(eigenvalues.size), matrix["basis"][0]),
@@ -58,6 +79,92 @@ def calculate_tunnelling_eigenstates(
     }
 
 
+def get_tunnelling_eigenstates_from_kernel(
+    kernel: np.ndarray[tuple[int, int, int, int], np.dtype[np.complex128]],
+    basis: _B0Inv,
+) -> EigenstateList[FundamentalBasis[int], _B0Inv]:
+    """
+    Given the kernel of a translationally invariant M matrix, find the eigenstates.
+
+    The lattice fourier transform of the kernel is block diagonal in q, so
+    we find the eigenstates of n_x0 * n_x1 independent n_bands * n_bands blocks.
+    The eigenstate of band m at q = (k0, k1) is exp(i q.x) c_m / sqrt(n_x0 n_x1),
+    and the eigenstates are ordered by (k0, k1, m).
+
+    Parameters
+    ----------
+    kernel : np.ndarray[tuple[int, int, int, int], np.dtype[np.complex128]]
+        kernel of the M matrix, see get_tunnelling_m_matrix_kernel
+    basis : _B0Inv
+        basis of the M matrix
+
+    Returns
+    -------
+    EigenstateList[FundamentalBasis[int], _B0Inv]
+    """
+    n_x0, n_x1 = kernel.shape[0], kernel.shape[1]
+    blocks = np.fft.fft2(kernel, axes=(0, 1))
+    eigenvalues, vectors = np.linalg.eig(blocks)
+
+    phase_0 = np.exp(2j * np.pi * np.outer(np.arange(n_x0), np.arange(n_x0)) / n_x0)
+    phase_1 = np.exp(2j * np.pi * np.outer(np.arange(n_x1), np.arange(n_x1)) / n_x1)
+    data = np.einsum("ax,by,abnm->abmxyn", phase_0, phase_1, vectors) / np.sqrt(
+        n_x0 * n_x1
+    )
+    eigenvalues = eigenvalues.reshape(-1)
+    return {
+        "basis": TupleBasis(FundamentalBasis(eigenvalues.size), basis),
+        "eigenvalue": eigenvalues - np.max(eigenvalues),
+        "data": data.reshape(eigenvalues.size, -1),
+    }
+
+
+@timed
+def calculate_tunnelling_eigenstates_bloch(
+    matrix: TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv],
+) -> EigenstateList[FundamentalBasis[int], _B0Inv]:
+    """
+    Given a translationally invariant tunnelling matrix, find the eigenstates.
+
+    This matches calculate_tunnelling_eigenstates, but only diagonalizes
+    n_x0 * n_x1 blocks of size n_bands * n_bands.
+
+    Parameters
+    ----------
+    matrix : TunnellingMMatrix[_B0Inv]
+
+    Returns
+    -------
+    EigenstateList[FundamentalBasis[int], _B0Inv]
+    """
+    return get_tunnelling_eigenstates_from_kernel(
+        get_tunnelling_m_matrix_kernel(matrix), matrix["basis"][0]
+    )
+
+
+@timed
+def calculate_tunnelling_eigenstates_from_jump_matrix(
+    matrix: TunnellingJumpMatrix[_L2Inv],
+    shape: tuple[_L0Inv, _L1Inv],
+) -> EigenstateList[FundamentalBasis[int], TunnellingSimulationBasis[Any, Any, Any]]:
+    """
+    Find the eigenstates of the M matrix of a jump matrix, without building the full M matrix.
+
+    Parameters
+    ----------
+    matrix : TunnellingJumpMatrix[_L2Inv]
+    shape : tuple[_L0Inv, _L1Inv]
+
+    Returns
+    -------
+    EigenstateList[FundamentalBasis[int], TunnellingSimulationBasis[Any, Any, Any]]
+    """
+    basis = get_basis_from_shape(shape, matrix["basis"][0].n, matrix["basis"][0])
+    return get_tunnelling_eigenstates_from_kernel(
+        get_tunnelling_m_matrix_kernel_from_jump_matrix(matrix, shape), basis
+    )
+
+
 def get_operator_state_vector_decomposition(
     density_matrix: DiagonalOperator[_B0Inv, _B0Inv],
     eigenstates: StateVectorList[FundamentalBasis[_L0Inv], _B0Inv],
@@ -117,25 +224,109 @@ def get_equilibrium_state(
     }
 
 
+def _has_unique_equilibrium(matrix: scipy.sparse.csr_matrix) -> bool:
+    # The equilibrium is unique if and only if there is a single closed set
+    # of states, ie a single strongly connected component with no way out
+    coo = scipy.sparse.coo_matrix(matrix)
+    hop = (coo.row != coo.col) & (coo.data != 0)
+    # M[i, j] is the rate of hopping from j to i
+    source, target = coo.col[hop], coo.row[hop]
+    n_components, labels = scipy.sparse.csgraph.connected_components(
+        scipy.sparse.csr_matrix(
+            (np.ones(source.size), (source, target)), shape=matrix.shape
+        ),
+        directed=True,
+        connection="strong",
+    )
+    # A component is closed if no hop leaves it
+    is_closed = np.ones(n_components, dtype=np.bool_)
+    leaving = labels[source] != labels[target]
+    is_closed[labels[source[leaving]]] = False
+    return np.count_nonzero(is_closed) == 1
+
+
+def _solve_equilibrium_occupation(
+    matrix: scipy.sparse.csr_matrix,
+    method: Literal["lu", "bicgstab"],
+    tolerance: float,
+) -> np.ndarray[tuple[int], np.dtype[np.float64]]:
+    if not _has_unique_equilibrium(matrix):
+        msg = (
+            "The tunnelling matrix has no unique equilibrium state, "
+            "as it is not well connected"
+        )
+        raise ValueError(msg)
+
+    n_states = matrix.shape[0]
+    if method == "lu":
+        # The columns of M sum to zero, so any one row of M p = 0 is redundant.
+        # Replacing the last row with sum(p) = 1 gives a bordered system, which
+        # is non-singular whenever the equilibrium is unique, even if some states
+        # have no weight in the equilibrium.
+        bordered = scipy.sparse.vstack(
+            [matrix[:-1], scipy.sparse.csr_matrix(np.ones((1, n_states)))],
+            format="csc",
+        )
+        rhs = np.zeros(n_states)
+        rhs[-1] = 1
+        occupation = np.atleast_1d(scipy.sparse.linalg.spsolve(bordered, rhs))
+    else:
+        # The bordered system converges poorly, so instead solve the
+        # equivalent system (M + u 1^T) p = u, which is non-singular for
+        # any u with sum(u) != 0. Here u is proportional to the escape rates.
+        u = -matrix.diagonal() / n_states
+        operator = scipy.sparse.linalg.LinearOperator(
+            matrix.shape,
+            matvec=lambda p: matrix @ p + u * np.sum(p),
+            dtype=np.float64,
+        )
+        occupation, info = scipy.sparse.linalg.bicgstab(operator, u, rtol=tolerance)
+        if info != 0:
+            msg = f"bicgstab failed to converge (info={info})"
+            raise RuntimeError(msg)
+
+    if np.any(occupation < -max(tolerance, 1e-8) * np.max(np.abs(occupation))):
+        msg = "Found a negative equilibrium occupation, M may be ill-conditioned"
+        raise ValueError(msg)
+    # Remove small negative occupations caused by rounding
+    occupation = np.clip(occupation, 0, None)
+    return occupation / np.sum(occupation)  # type: ignore[no-any-return]
+
+
 def calculate_equilibrium_state(
-    matrix: TunnellingMMatrix[_B0Inv],
+    matrix: TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv],
+    *,
+    method: Literal["lu", "bicgstab"] = "lu",
+    tolerance: float = 1e-10,
 ) -> DiagonalOperator[_B0Inv, _B0Inv]:
     """
     Calculate the equilibrium tunnelling state for a given matrix.
 
-    Since all of the eigenstates have E < 0 except for the equilibrium
-    this corresponds to the single "zero energy" state
+    The equilibrium is found directly as the solution of M p = 0 with
+    sum(p) = 1, using only sparse operations. This assumes the surface
+    is 'well connected', ie all initial states end up in the same
+    equilibrium configuration, and a ValueError is raised if it is not.
 
     Parameters
     ----------
-    matrix : TunnellingMatrix[_S0Inv]
+    matrix : TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv]
+    method : Literal["lu", "bicgstab"], optional
+        solve using a sparse LU decomposition or iteratively, by default "lu"
+    tolerance : float, optional
+        relative tolerance of the iterative solver, by default 1e-10
 
     Returns
     -------
-    TunnellingVector[_S0Inv]
+    DiagonalOperator[_B0Inv, _B0Inv]
     """
-    eigenstates = calculate_tunnelling_eigenstates(matrix)
-    return get_equilibrium_state(eigenstates)
+    sparse = as_sparse_tunnelling_matrix(matrix)["data"]
+    occupation = _solve_equilibrium_occupation(
+        scipy.sparse.csr_matrix(sparse.real), method, tolerance
+    )
+    return {
+        "basis": TupleBasis(matrix["basis"][0], matrix["basis"][0]),
+        "data": occupation.astype(np.complex128),
+    }
 
 
 def get_tunnelling_simulation_state(
@@ -174,7 +365,7 @@ def get_tunnelling_simulation_state(
 
 
 def calculate_tunnelling_simulation_state(
-    matrix: TunnellingMMatrix[_B0Inv],
+    matrix: TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv],
     initial: DiagonalOperator[_B0Inv, _B0Inv],
     times: np.ndarray[tuple[_L0Inv], np.dtype[np.float64]],
 ) -> DiagonalOperatorList[ExplicitTimeBasis[_L0Inv], _B0Inv, _B0Inv]:
@@ -197,3 +388,117 @@ def calculate_tunnelling_simulation_state(
     """
     eigenstates = calculate_tunnelling_eigenstates(matrix)
     return get_tunnelling_simulation_state(eigenstates, initial, times)
+
+
+def _propagate_uniformization(
+    matrix: scipy.sparse.csr_matrix,
+    initial: np.ndarray[tuple[int], np.dtype[np.float64]],
+    times: np.ndarray[tuple[int], np.dtype[np.float64]],
+    tolerance: float,
+) -> np.ndarray[tuple[int, int], np.dtype[np.float64]]:
+    # exp(M t) = sum_k Poisson(k, rate t) P^k where P = 1 + M / rate is a
+    # stochastic matrix, so every term is a non-negative probability vector.
+    rate = float(np.max(-matrix.diagonal(), initial=0)) or 1.0
+    transition = scipy.sparse.identity(initial.size, format="csr") + matrix / rate
+
+    means = rate * times
+    lower = scipy.stats.poisson.ppf(tolerance, means)
+    upper = scipy.stats.poisson.isf(tolerance, means)
+
+    out = np.zeros((times.size, initial.size), dtype=np.float64)
+    norm = np.zeros(times.size, dtype=np.float64)
+    vector = initial
+    for k in range(int(np.max(upper, initial=0)) + 1):
+        active = np.logical_and(lower <= k, k <= upper)
+        if np.any(active):
+            weights = scipy.stats.poisson.pmf(k, means[active])
+            out[active] += weights[:, np.newaxis] * vector[np.newaxis, :]
+            norm[active] += weights
+        vector = transition @ vector
+    # Normalizing by the included weights removes the truncation error
+    # from the total probability
+    return out / norm[:, np.newaxis]
+
+
+def _propagate_expm_multiply(
+    matrix: scipy.sparse.csr_matrix,
+    initial: np.ndarray[tuple[int], np.dtype[np.complex128]],
+    times: np.ndarray[tuple[int], np.dtype[np.float64]],
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    steps = np.diff(times)
+    if times.size > 1 and np.allclose(steps, steps[0]):
+        return scipy.sparse.linalg.expm_multiply(  # type: ignore[no-any-return]
+            matrix,
+            initial,
+            start=times[0],
+            stop=times[-1],
+            num=times.size,
+            endpoint=True,
+            traceA=matrix.diagonal().sum(),
+        )
+    out = np.zeros((times.size, initial.size), dtype=np.complex128)
+    vector = initial
+    current = 0.0
+    for idx in np.argsort(times):
+        vector = scipy.sparse.linalg.expm_multiply(
+            matrix * (times[idx] - current), vector
+        )
+        current = times[idx]
+        out[idx] = vector
+    return out
+
+
+def calculate_tunnelling_simulation_state_sparse(
+    matrix: TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv],
+    initial: DiagonalOperator[_B0Inv, _B0Inv],
+    times: np.ndarray[tuple[_L0Inv], np.dtype[np.float64]],
+    *,
+    method: Literal["uniformization", "expm_multiply"] = "uniformization",
+    tolerance: float = 1e-12,
+) -> DiagonalOperatorList[ExplicitTimeBasis[_L0Inv], _B0Inv, _B0Inv]:
+    """
+    Get the StateVector given an initial state, and a tunnelling matrix.
+
+    This matches calculate_tunnelling_simulation_state, but acts with the
+    sparse M matrix on the initial state instead of diagonalizing M,
+    so all times are found in a single pass using only sparse matrix products.
+
+    With method="uniformization" the state is expanded in powers of the
+    stochastic matrix 1 + M / rate, which keeps every probability non-negative
+    and conserves the total probability to machine precision.
+    method="expm_multiply" uses scipy.sparse.linalg.expm_multiply.
+
+    Parameters
+    ----------
+    matrix : TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv]
+    initial : DiagonalOperator[_B0Inv, _B0Inv]
+    times : np.ndarray[tuple[_L0Inv], np.dtype[np.float64]]
+        Times to calculate the occupation, measured from the initial state
+    method : Literal["uniformization", "expm_multiply"], optional
+        method, by default "uniformization"
+    tolerance : float, optional
+        truncation error of each time for uniformization, by default 1e-12
+
+    Returns
+    -------
+    DiagonalOperatorList[ExplicitTimeBasis[_L0Inv], _B0Inv, _B0Inv]
+    """
+    sparse = as_sparse_tunnelling_matrix(matrix)["data"]
+    if method == "uniformization":
+        vectors = _propagate_uniformization(
+            scipy.sparse.csr_matrix(sparse.real),
+            np.real(initial["data"]),
+            times,
+            tolerance,
+        ).astype(np.complex128)
+    else:
+        vectors = _propagate_expm_multiply(
+            sparse, initial["data"].astype(np.complex128), times
+        )
+    return {
+        "basis": TupleBasis(
+            ExplicitTimeBasis(times),
+            TupleBasis(matrix["basis"][0], matrix["basis"][0]),
+        ),
+        "data": vectors,
+    }
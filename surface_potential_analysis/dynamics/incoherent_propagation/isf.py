@@ -4,37 +4,36 @@ from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any, Generic, Literal, TypeVar
 
 import numpy as np
+import scipy.linalg
 
-from surface_potential_analysis.basis.basis import FundamentalBasis
 from surface_potential_analysis.basis.stacked_basis import TupleBasis
 from surface_potential_analysis.basis.time_basis_like import (
     ExplicitTimeBasis,
-    FundamentalTimeBasis,
 )
-from surface_potential_analysis.basis.util import BasisUtil
 from surface_potential_analysis.dynamics.incoherent_propagation.eigenstates import (
+    calculate_equilibrium_state,
     calculate_tunnelling_eigenstates,
     calculate_tunnelling_simulation_state,
-    get_equilibrium_state,
     get_operator_state_vector_decomposition,
-    get_tunnelling_simulation_state,
 )
 from surface_potential_analysis.dynamics.incoherent_propagation.tunnelling_matrix import (
     density_matrix_as_probability,
     density_matrix_list_as_probabilities,
-    get_initial_pure_density_matrix_for_basis,
 )
-from surface_potential_analysis.dynamics.isf import calculate_isf_approximate_locations
-from surface_potential_analysis.operator.operator import average_eigenvalues
+from surface_potential_analysis.dynamics.isf import (
+    calculate_isf_approximate_locations,
+    get_approximate_location_phases,
+)
+from surface_potential_analysis.dynamics.util import get_hop_shift
 from surface_potential_analysis.probability_vector.probability_vector import (
-    ProbabilityVector,
-    ProbabilityVectorList,
-    average_probabilities,
     sum_probability,
 )
 
 if TYPE_CHECKING:
+    from surface_potential_analysis.basis.basis import FundamentalBasis
     from surface_potential_analysis.dynamics.incoherent_propagation.tunnelling_matrix import (
+        SparseTunnellingMMatrix,
+        TunnellingJumpMatrix,
         TunnellingMMatrix,
     )
     from surface_potential_analysis.dynamics.tunnelling_basis import (
@@ -44,6 +43,9 @@ if TYPE_CHECKING:
         DiagonalOperator,
         SingleBasisDiagonalOperator,
     )
+    from surface_potential_analysis.state_vector.eigenstate_collection import (
+        EigenstateList,
+    )
 
     _B0Inv = TypeVar("_B0Inv", bound=TunnellingSimulationBasis[Any, Any, Any])
 
@@ -52,7 +54,7 @@ _L0Inv = TypeVar("_L0Inv", bound=int)
 
 
 def calculate_isf_at_times(
-    matrix: TunnellingMMatrix[_B0Inv],
+    matrix: TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv],
     initial: DiagonalOperator[_B0Inv, _B0Inv],
     times: np.ndarray[tuple[_L0Inv], np.dtype[np.float64]],
     dk: np.ndarray[tuple[Literal[2]], np.dtype[np.float64]],
@@ -78,117 +80,125 @@ def calculate_isf_at_times(
     return calculate_isf_approximate_locations(initial_occupation, final_occupation, dk)
 
 
+def _get_isf_per_initial_state(
+    eigenstates: EigenstateList[FundamentalBasis[int], Any],
+    initial: np.ndarray[tuple[int, int], np.dtype[np.float64]],
+    phases: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    times: np.ndarray[tuple[int], np.dtype[np.float64]],
+    chunk_size: int,
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    # The occupation of initial state j is sum_e c_ej exp(l_e t) v_e, so the ISF
+    # is sum_e c_ej exp(l_e t) (v_e . phase_j), without forming any occupation.
+    coefficients = scipy.linalg.solve(eigenstates["data"].T, initial)
+    projected = coefficients * np.einsum("ex,xj->ej", eigenstates["data"], phases)
+
+    out = np.zeros((initial.shape[1], times.size), dtype=np.complex128)
+    for start in range(0, times.size, chunk_size):
+        chunk = times[start : start + chunk_size]
+        decay = np.exp(eigenstates["eigenvalue"][:, np.newaxis] * chunk[np.newaxis, :])
+        out[:, start : start + chunk.size] = np.tensordot(projected, decay, axes=(0, 0))
+    return out
+
+
+def _get_equilibrium_band_occupation(
+    matrix: TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv],
+) -> np.ndarray[tuple[int], np.dtype[np.float64]]:
+    equilibrium = density_matrix_as_probability(calculate_equilibrium_state(matrix))
+    occupation = sum_probability(equilibrium, (0, 1))["data"]
+    return occupation / np.sum(occupation)  # type: ignore[no-any-return]
+
+
 def calculate_equilibrium_state_averaged_isf(
-    matrix: TunnellingMMatrix[_B0Inv],
+    matrix: TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv],
     times: np.ndarray[tuple[_L0Inv], np.dtype[np.float64]],
     dk: np.ndarray[tuple[Literal[2]], np.dtype[np.float64]],
-) -> SingleBasisDiagonalOperator[FundamentalTimeBasis[_L0Inv]]:
+    *,
+    chunk_size: int = 1024,
+) -> SingleBasisDiagonalOperator[ExplicitTimeBasis[_L0Inv]]:
     """
     Calculate the ISF, averaging over the equilibrium occupation of each band.
 
+    The initial state of every band is decomposed into the eigenstates
+    in a single solve, and the ISF of every band is found together.
+
     Parameters
     ----------
-    matrix : TunnellingMMatrix[_B0Inv]
+    matrix : TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv]
     times : np.ndarray[tuple[_L0Inv], np.dtype[np.float_]]
     dk : np.ndarray[tuple[Literal[2]], np.dtype[np.float_]]
+    chunk_size : int, optional
+        number of times to evaluate at once, by default 1024
 
     Returns
     -------
-    EigenvalueList[_L0Inv]
+    SingleBasisDiagonalOperator[ExplicitTimeBasis[_L0Inv]]
     """
-    util = BasisUtil(matrix["basis"])
+    basis = matrix["basis"][0]
+    n_bands = basis.shape[2]
     eigenstates = calculate_tunnelling_eigenstates(matrix)
-    equilibrium = get_equilibrium_state(eigenstates)
 
-    occupation_probabilities = sum_probability(
-        density_matrix_as_probability(equilibrium), (0, 1)
+    # The initial state of each band is at (0, 0, band)
+    initial = np.zeros((basis.n, n_bands))
+    initial[np.arange(n_bands), np.arange(n_bands)] = 1
+    phases = np.array(
+        [
+            get_approximate_location_phases(
+                {"basis": basis, "data": initial[:, band]}, dk
+            )
+            for band in range(n_bands)
+        ]
+    ).T
+    isf_per_band = _get_isf_per_initial_state(
+        eigenstates, initial, phases, times, chunk_size
     )
-    eigenvalues = np.zeros((util.shape[2], times.size), dtype=np.complex128)
-    for band in range(util.shape[2]):
-        initial = get_initial_pure_density_matrix_for_basis(
-            matrix["basis"][0], (0, 0, band)
-        )
-        initial_probability = density_matrix_as_probability(initial)
-        final = get_tunnelling_simulation_state(eigenstates, initial, times)
-        final_probabilities = density_matrix_list_as_probabilities(final)
-        isf = calculate_isf_approximate_locations(
-            initial_probability, final_probabilities, dk
-        )
-        eigenvalues[band] = isf
-    isf_per_band: SingleBasisDiagonalOperator[
-        TupleBasis[FundamentalBasis[int], ExplicitTimeBasis[_L0Inv]]
-    ] = {
-        "basis": TupleBasis(
-            TupleBasis(FundamentalBasis(util.shape[2]), ExplicitTimeBasis(times)),
-            TupleBasis(FundamentalBasis(util.shape[2]), ExplicitTimeBasis(times)),
-        ),
-        "data": eigenvalues.reshape(-1),
+
+    occupation = _get_equilibrium_band_occupation(matrix)
+    return {
+        "basis": TupleBasis(ExplicitTimeBasis(times), ExplicitTimeBasis(times)),
+        "data": np.tensordot(occupation, isf_per_band, axes=(0, 0)),
     }
-    averaged = average_eigenvalues(
-        isf_per_band, (0,), weights=np.abs(occupation_probabilities["data"])
-    )
-    return {"basis": averaged["basis"][0][0], "data": averaged["data"]}
 
 
 def calculate_equilibrium_initial_state_isf(
-    matrix: TunnellingMMatrix[_B0Inv],
+    matrix: TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv],
     times: np.ndarray[tuple[_L0Inv], np.dtype[np.float64]],
     dk: np.ndarray[tuple[Literal[2]], np.dtype[np.float64]],
-) -> SingleBasisDiagonalOperator[FundamentalTimeBasis[_L0Inv]]:
+    *,
+    chunk_size: int = 1024,
+) -> SingleBasisDiagonalOperator[ExplicitTimeBasis[_L0Inv]]:
     """
-    Calculate the ISF, averaging over the equilibrium occupation of each band.
+    Calculate the ISF, for an initial state with the equilibrium occupation of each band.
+
+    Since the occupation is linear in the initial state, the average
+    of the occupation of each band is found by propagating the mixed initial state.
 
     Parameters
     ----------
-    matrix : TunnellingMMatrix[_B0Inv]
+    matrix : TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv]
     times : np.ndarray[tuple[_L0Inv], np.dtype[np.float_]]
     dk : np.ndarray[tuple[Literal[2]], np.dtype[np.float_]]
+    chunk_size : int, optional
+        number of times to evaluate at once, by default 1024
 
     Returns
     -------
-    EigenvalueList[_L0Inv]
+    SingleBasisDiagonalOperator[ExplicitTimeBasis[_L0Inv]]
     """
+    basis = matrix["basis"][0]
+    n_bands = basis.shape[2]
     eigenstates = calculate_tunnelling_eigenstates(matrix)
 
-    vectors = np.zeros(
-        (matrix["basis"].shape[2], times.size, matrix["basis"].n), dtype=np.complex128
-    )
-    for band in range(matrix["basis"].shape[2]):
-        initial_state = get_initial_pure_density_matrix_for_basis(
-            matrix["basis"][0], (0, 0, band)
-        )
-        final_state = get_tunnelling_simulation_state(eigenstates, initial_state, times)
-        final_probabilities = density_matrix_list_as_probabilities(final_state)
-        vectors[band] = final_probabilities["data"]
-    probability_per_band: ProbabilityVectorList[
-        TupleBasis[FundamentalBasis[int], ExplicitTimeBasis[_L0Inv]], _B0Inv
-    ] = {
-        "basis": TupleBasis(
-            TupleBasis(
-                FundamentalBasis(matrix["basis"].shape[2]), ExplicitTimeBasis(times)
-            ),
-            matrix["basis"][0],
-        ),
-        "data": vectors.reshape(-1),
+    initial = np.zeros((basis.n, 1))
+    initial[:n_bands, 0] = _get_equilibrium_band_occupation(matrix)
+    phases = get_approximate_location_phases(
+        {"basis": basis, "data": initial[:, 0]}, dk
+    )[:, np.newaxis]
+    (isf,) = _get_isf_per_initial_state(eigenstates, initial, phases, times, chunk_size)
+    return {
+        "basis": TupleBasis(ExplicitTimeBasis(times), ExplicitTimeBasis(times)),
+        "data": isf,
     }
 
-    equilibrium = get_equilibrium_state(eigenstates)
-    occupation_probabilities = sum_probability(
-        density_matrix_as_probability(equilibrium), (0, 1)
-    )
-    vector = np.zeros(matrix["basis"].shape, dtype=np.complex128)
-    vector[0, 0, :] = occupation_probabilities["data"]
-    initial: ProbabilityVector[_B0Inv] = {
-        "basis": matrix["basis"][0],
-        "data": vector.reshape(-1),
-    }
-    average_probability = average_probabilities(
-        probability_per_band,
-        weights=np.abs(occupation_probabilities["data"]),
-        axis=(0,),
-    )
-    return calculate_isf_approximate_locations(initial, average_probability, dk)
-
 
 @dataclass
 class RateDecomposition(Generic[_L0Inv]):
@@ -199,7 +209,8 @@ class RateDecomposition(Generic[_L0Inv]):
 
 
 def get_rate_decomposition(
-    matrix: TunnellingMMatrix[_B0Inv], initial: DiagonalOperator[_B0Inv, _B0Inv]
+    matrix: TunnellingMMatrix[_B0Inv] | SparseTunnellingMMatrix[_B0Inv],
+    initial: DiagonalOperator[_B0Inv, _B0Inv],
 ) -> RateDecomposition[int]:
     """
     Get the eigenvalues and relevant contribution of the rates in the simulation.
@@ -216,3 +227,163 @@ def get_rate_decomposition(
     eigenstates = calculate_tunnelling_eigenstates(matrix)
     coefficients = get_operator_state_vector_decomposition(initial, eigenstates)
     return RateDecomposition(eigenstates["data"], coefficients)
+
+
+def get_isf_rate_matrix(
+    matrix: TunnellingJumpMatrix[Any],
+    dk: np.ndarray[tuple[int, ...], np.dtype[np.float64]],
+) -> np.ndarray[tuple[int, ...], np.dtype[np.complex128]]:
+    r"""
+    Get the rate matrix of the ISF generating function at each dk.
+
+    For an infinite lattice, G_n(t) = \sum_x exp(i dk.r_{x,n}) P_{x,n}(t)
+    evolves as dG/dt = B(dk) G, where
+    B(dk)_{n1,n0} = \sum_d K_{d,n1,n0} exp(i dk.(R_d + r_{n1} - r_{n0})).
+    Here K is the kernel of the M matrix and r_n is the location of band n.
+
+    Parameters
+    ----------
+    matrix : TunnellingJumpMatrix[Any]
+    dk : np.ndarray[tuple[int, ...], np.dtype[np.float64]]
+        wavevectors, with shape (..., 2)
+
+    Returns
+    -------
+    np.ndarray[tuple[int, ...], np.dtype[np.complex128]]
+        B(dk), with shape (..., n_bands, n_bands)
+    """
+    bands_basis = matrix["basis"][0]
+    n_bands = bands_basis.fundamental_n
+    jump_stacked = matrix["data"].reshape(n_bands, n_bands, 9)
+    unit_cell = np.array(bands_basis.unit_cell)
+    offsets = np.tensordot(unit_cell, bands_basis.locations, axes=(0, 0))
+
+    # A jump from n_0 to n_1 is a jump from column n_0 into row n_1
+    rates = np.transpose(jump_stacked, (2, 1, 0)).copy()
+    # As in get_tunnelling_m_matrix, jumps into the same state are ignored
+    zero_hop = next(hop for hop in range(9) if get_hop_shift(hop, 2) == (0, 0))
+    bands = np.arange(n_bands)
+    rates[zero_hop, bands, bands] = 0
+    out_rate = np.sum(rates, axis=(0, 1))
+
+    displacements = (
+        np.tensordot(
+            np.array([get_hop_shift(hop, 2) for hop in range(9)]),
+            unit_cell,
+            axes=(1, 0),
+        )[:, :, np.newaxis, np.newaxis]
+        + offsets[np.newaxis, :, :, np.newaxis]
+        - offsets[np.newaxis, :, np.newaxis, :]
+    )
+    phases = np.exp(1j * np.tensordot(dk, displacements, axes=(-1, 1)))
+    out = np.einsum("...dij,dij->...ij", phases, rates)
+    out[..., bands, bands] -= out_rate
+    return out  # type: ignore[no-any-return]
+
+
+def get_equilibrium_band_occupation(
+    matrix: TunnellingJumpMatrix[Any],
+) -> np.ndarray[tuple[int], np.dtype[np.float64]]:
+    """
+    Get the equilibrium occupation of each band, normalized to one.
+
+    Parameters
+    ----------
+    matrix : TunnellingJumpMatrix[Any]
+
+    Returns
+    -------
+    np.ndarray[tuple[int], np.dtype[np.float64]]
+    """
+    rate_matrix = get_isf_rate_matrix(matrix, np.zeros(2))
+    eigenvalues, vectors = scipy.linalg.eig(rate_matrix)
+    occupation = np.abs(vectors[:, np.argmax(np.real(eigenvalues))])
+    return occupation / np.sum(occupation)  # type: ignore[no-any-return]
+
+
+def _get_isf_propagator(
+    matrix: TunnellingJumpMatrix[Any],
+    times: np.ndarray[tuple[int], np.dtype[np.float64]],
+    dk: np.ndarray[tuple[int, ...], np.dtype[np.float64]],
+) -> np.ndarray[tuple[int, ...], np.dtype[np.complex128]]:
+    rate_matrix = get_isf_rate_matrix(matrix, dk)
+    return scipy.linalg.expm(  # type: ignore[no-any-return]
+        rate_matrix[..., np.newaxis, :, :] * times[:, np.newaxis, np.newaxis]
+    )
+
+
+def calculate_band_averaged_isf_from_jump_matrix(
+    matrix: TunnellingJumpMatrix[Any],
+    times: np.ndarray[tuple[_L0Inv], np.dtype[np.float64]],
+    dk: np.ndarray[tuple[int, ...], np.dtype[np.float64]],
+    weights: np.ndarray[tuple[int], np.dtype[np.float64]] | None = None,
+) -> np.ndarray[tuple[int, ...], np.dtype[np.complex128]]:
+    """
+    Calculate the ISF of a particle initially in each band, averaged over weights.
+
+    By default this uses the equilibrium band occupation, matching
+    calculate_equilibrium_state_averaged_isf in the limit of a large lattice.
+    The cost is independent of the size of the lattice.
+
+    Parameters
+    ----------
+    matrix : TunnellingJumpMatrix[Any]
+    times : np.ndarray[tuple[_L0Inv], np.dtype[np.float64]]
+    dk : np.ndarray[tuple[int, ...], np.dtype[np.float64]]
+        wavevectors, with shape (..., 2)
+    weights : np.ndarray[tuple[int], np.dtype[np.float64]] | None, optional
+        weight of each initial band, by default the equilibrium occupation
+
+    Returns
+    -------
+    np.ndarray[tuple[int, ...], np.dtype[np.complex128]]
+        the ISF, with shape (..., times.size)
+    """
+    weights = get_equilibrium_band_occupation(matrix) if weights is None else weights
+    propagator = _get_isf_propagator(matrix, times, dk)
+    # The ISF of a particle initially in band n0 is sum_n1 propagator[n1, n0]
+    return np.einsum("...ij,j->...", propagator, weights / np.sum(weights))  # type: ignore[no-any-return]
+
+
+def calculate_isf_from_jump_matrix(
+    matrix: TunnellingJumpMatrix[Any],
+    times: np.ndarray[tuple[_L0Inv], np.dtype[np.float64]],
+    dk: np.ndarray[tuple[int, ...], np.dtype[np.float64]],
+    initial_occupation: np.ndarray[tuple[int], np.dtype[np.float64]] | None = None,
+) -> np.ndarray[tuple[int, ...], np.dtype[np.complex128]]:
+    """
+    Calculate the ISF of a particle initially in a mixture of the bands of a single unit cell.
+
+    Distances are measured from the average initial location. By default the
+    initial occupation is the equilibrium occupation, matching
+    calculate_equilibrium_initial_state_isf in the limit of a large lattice.
+    The cost is independent of the size of the lattice.
+
+    Parameters
+    ----------
+    matrix : TunnellingJumpMatrix[Any]
+    times : np.ndarray[tuple[_L0Inv], np.dtype[np.float64]]
+    dk : np.ndarray[tuple[int, ...], np.dtype[np.float64]]
+        wavevectors, with shape (..., 2)
+    initial_occupation : np.ndarray[tuple[int], np.dtype[np.float64]] | None, optional
+        initial occupation of each band, by default the equilibrium occupation
+
+    Returns
+    -------
+    np.ndarray[tuple[int, ...], np.dtype[np.complex128]]
+        the ISF, with shape (..., times.size)
+    """
+    occupation = (
+        get_equilibrium_band_occupation(matrix)
+        if initial_occupation is None
+        else initial_occupation / np.sum(initial_occupation)
+    )
+    bands_basis = matrix["basis"][0]
+    offsets = np.tensordot(
+        np.array(bands_basis.unit_cell), bands_basis.locations, axes=(0, 0)
+    )
+    relative = offsets - np.average(offsets, axis=1, weights=occupation)[:, np.newaxis]
+    initial = occupation * np.exp(1j * np.tensordot(dk, relative, axes=(-1, 0)))
+
+    propagator = _get_isf_propagator(matrix, times, dk)
+    return np.einsum("...tij,...j->...t", propagator, initial)  # type: ignore[no-any-return]
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Literal, TypeVar
+
+import numpy as np
+
+from surface_potential_analysis.basis.stacked_basis import TupleBasis
+from surface_potential_analysis.basis.time_basis_like import ExplicitTimeBasis
+from surface_potential_analysis.dynamics.ensemble import (
+    get_ensemble_average,
+    get_ensemble_isf,
+)
+from surface_potential_analysis.dynamics.incoherent_propagation.isf import (
+    get_equilibrium_band_occupation,
+)
+from surface_potential_analysis.dynamics.util import get_hop_shift
+from surface_potential_analysis.util.statistics import WelfordAccumulator
+
+if TYPE_CHECKING:
+    from surface_potential_analysis.dynamics.incoherent_propagation.tunnelling_matrix import (
+        TunnellingJumpMatrix,
+    )
+    from surface_potential_analysis.dynamics.tunnelling_basis import (
+        TunnellingSimulationBandsBasis,
+    )
+    from surface_potential_analysis.operator.operator import (
+        StatisticalDiagonalOperator,
+    )
+    from surface_potential_analysis.probability_vector.probability_vector import (
+        ProbabilityVectorList,
+    )
+    from surface_potential_analysis.state_vector.eigenstate_collection import (
+        StatisticalValueList,
+    )
+
+    _L0Inv = TypeVar("_L0Inv", bound=int)
+
+
+@dataclass
+class KineticMonteCarloRates:
+    """
+    The jumps out of each band of a jump matrix, for sampling with the Gillespie algorithm.
+
+    The jumps are flattened over (n1, hop), such that the probability that
+    a jump from band n0 is jump j is the difference of cumulative[n0, j]
+    and cumulative[n0, j - 1]. The jump j ends in band target_band[j],
+    and moves the particle by target_shift[j] unit cells.
+    """
+
+    total_rate: np.ndarray[tuple[int], np.dtype[np.float64]]
+    cumulative: np.ndarray[tuple[int, int], np.dtype[np.float64]]
+    target_band: np.ndarray[tuple[int], np.dtype[np.int_]]
+    target_shift: np.ndarray[tuple[int, Literal[2]], np.dtype[np.int_]]
+
+
+def get_kinetic_monte_carlo_rates(
+    matrix: TunnellingJumpMatrix[Any],
+) -> KineticMonteCarloRates:
+    """
+    Get the rates used to sample trajectories from a jump matrix.
+
+    Parameters
+    ----------
+    matrix : TunnellingJumpMatrix[Any]
+
+    Returns
+    -------
+    KineticMonteCarloRates
+    """
+    n_bands = matrix["basis"][0].fundamental_n
+    rates = np.real(matrix["data"]).reshape(n_bands, n_bands, 9).copy()
+    # As in get_tunnelling_m_matrix, jumps into the same state are ignored
+    zero_hop = next(hop for hop in range(9) if get_hop_shift(hop, 2) == (0, 0))
+    bands = np.arange(n_bands)
+    rates[bands, bands, zero_hop] = 0
+
+    flat_rates = rates.reshape(n_bands, -1)
+    total_rate = np.sum(flat_rates, axis=1)
+    cumulative = (
+        np.cumsum(flat_rates, axis=1)
+        / np.where(total_rate == 0, 1, total_rate)[:, np.newaxis]
+    )
+    shifts = np.array([get_hop_shift(hop, 2) for hop in range(9)])
+    return KineticMonteCarloRates(
+        total_rate=total_rate,
+        cumulative=cumulative,
+        target_band=np.repeat(bands, 9),
+        target_shift=np.tile(shifts, (n_bands, 1)),
+    )
+
+
+def _get_waiting_time(
+    rates: KineticMonteCarloRates,
+    band: np.ndarray[tuple[int], np.dtype[np.int_]],
+    rng: np.random.Generator,
+) -> np.ndarray[tuple[int], np.dtype[np.float64]]:
+    total_rate = rates.total_rate[band]
+    # A particle in a band with no jumps out never moves
+    waiting_time = np.full(band.size, np.inf)
+    moving = total_rate > 0
+    waiting_time[moving] = rng.exponential(1 / total_rate[moving])
+    return waiting_time
+
+
+def _advance_walkers(  # noqa: PLR0913, PLR0917
+    rates: KineticMonteCarloRates,
+    cell: np.ndarray[tuple[int, Literal[2]], np.dtype[np.int_]],
+    band: np.ndarray[tuple[int], np.dtype[np.int_]],
+    next_time: np.ndarray[tuple[int], np.dtype[np.float64]],
+    time: float,
+    rng: np.random.Generator,
+) -> None:
+    """Jump each walker in place, until its next jump is after time."""
+    while np.any(jumping := next_time <= time):
+        (walkers,) = np.nonzero(jumping)
+        choice = np.sum(
+            rates.cumulative[band[walkers]] < rng.random(walkers.size)[:, np.newaxis],
+            axis=1,
+        )
+        choice = np.minimum(choice, rates.target_band.size - 1)
+        cell[walkers] += rates.target_shift[choice]
+        band[walkers] = rates.target_band[choice]
+        next_time[walkers] += _get_waiting_time(rates, band[walkers], rng)
+
+
+def _get_moments(
+    samples: np.ndarray[tuple[int], np.dtype[Any]],
+) -> tuple[Any, float]:
+    mean = np.mean(samples)
+    return mean, float(np.sum(np.square(np.abs(samples - mean))))
+
+
+def _sample_walkers(  # noqa: PLR0913, PLR0917
+    rates: KineticMonteCarloRates,
+    bands_basis: TunnellingSimulationBandsBasis[Any],
+    times: np.ndarray[tuple[int], np.dtype[np.float64]],
+    dk: np.ndarray[tuple[Literal[2]], np.dtype[np.float64]],
+    initial_band: np.ndarray[tuple[int], np.dtype[np.int_]],
+    rng: np.random.Generator,
+) -> tuple[WelfordAccumulator, WelfordAccumulator, WelfordAccumulator]:
+    unit_cell = np.array(bands_basis.unit_cell)
+    offsets = np.tensordot(unit_cell, bands_basis.locations, axes=(0, 0)).T
+
+    # Each walker only stores its unit cell, band and time of the next jump
+    n_walkers = initial_band.size
+    cell = np.zeros((n_walkers, 2), dtype=np.int_)
+    band = initial_band.copy()
+    next_time = _get_waiting_time(rates, band, rng)
+
+    # The statistics at each time are found as the walkers reach it,
+    # so the trajectory of each walker is never stored
+    n_bands = rates.total_rate.size
+    isf_mean = np.zeros(times.size, dtype=np.complex128)
+    isf_m2 = np.zeros(times.size, dtype=np.float64)
+    msd_mean = np.zeros(times.size, dtype=np.float64)
+    msd_m2 = np.zeros(times.size, dtype=np.float64)
+    band_mean = np.zeros((times.size, n_bands), dtype=np.float64)
+    band_m2 = np.zeros((times.size, n_bands), dtype=np.float64)
+    for idx, time in enumerate(times):
+        _advance_walkers(rates, cell, band, next_time, time, rng)
+        displacement = cell @ unit_cell + offsets[band] - offsets[initial_band]
+        isf_mean[idx], isf_m2[idx] = _get_moments(np.exp(1j * (displacement @ dk)))
+        msd_mean[idx], msd_m2[idx] = _get_moments(
+            np.sum(np.square(displacement), axis=1)
+        )
+        # The occupation of each band is the mean of an indicator variable
+        counts = np.bincount(band, minlength=n_bands)
+        band_mean[idx] = counts / n_walkers
+        band_m2[idx] = counts * np.square(1 - band_mean[idx]) + (
+            n_walkers - counts
+        ) * np.square(band_mean[idx])
+    return (
+        WelfordAccumulator(n_walkers, isf_mean, isf_m2),
+        WelfordAccumulator(n_walkers, msd_mean, msd_m2),
+        WelfordAccumulator(n_walkers, band_mean, band_m2),
+    )
+
+
+@dataclass
+class KineticMonteCarloResult:
+    """
+    The result of simulate_kinetic_monte_carlo.
+
+    The ISF and mean square displacement include the standard error of the
+    mean, and band_occupation is the fraction of walkers in each band.
+    """
+
+    isf: StatisticalDiagonalOperator[Any, Any]
+    mean_square_displacement: StatisticalValueList[Any]
+    band_occupation: ProbabilityVectorList[Any, Any]
+
+
+def simulate_kinetic_monte_carlo(  # noqa: PLR0913
+    matrix: TunnellingJumpMatrix[Any],
+    times: np.ndarray[tuple[_L0Inv], np.dtype[np.float64]],
+    dk: np.ndarray[tuple[Literal[2]], np.dtype[np.float64]],
+    *,
+    n_walkers: int = 1024,
+    batch_size: int = 1024,
+    initial_occupation: np.ndarray[tuple[int], np.dtype[np.float64]] | None = None,
+    rng: np.random.Generator | None = None,
+) -> KineticMonteCarloResult:
+    """
+    Sample hopping trajectories of independent walkers from a jump matrix.
+
+    Each walker hops on an infinite lattice using the Gillespie algorithm,
+    and the walkers are simulated together in batches of batch_size.
+    Each walker only stores its unit cell, band and time of the next jump,
+    and the statistics at each time are accumulated as the walkers reach it,
+    so the memory required is O(batch_size + times.size).
+
+    Parameters
+    ----------
+    matrix : TunnellingJumpMatrix[Any]
+    times : np.ndarray[tuple[_L0Inv], np.dtype[np.float64]]
+        increasing times at which to measure each walker, starting from t=0
+    dk : np.ndarray[tuple[Literal[2]], np.dtype[np.float64]]
+        direction along which to measure the ISF
+    n_walkers : int, optional
+        number of walkers, by default 1024
+    batch_size : int, optional
+        number of walkers to simulate at once, by default 1024
+    initial_occupation : np.ndarray[tuple[int], np.dtype[np.float64]] | None, optional
+        initial occupation of each band, by default the equilibrium occupation
+    rng : np.random.Generator | None, optional
+        random number generator, by default np.random.default_rng()
+
+    Returns
+    -------
+    KineticMonteCarloResult
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    bands_basis = matrix["basis"][0]
+    n_bands = bands_basis.fundamental_n
+    occupation = (
+        get_equilibrium_band_occupation(matrix)
+        if initial_occupation is None
+        else initial_occupation / np.sum(initial_occupation)
+    )
+    rates = get_kinetic_monte_carlo_rates(matrix)
+
+    isf_accumulator = WelfordAccumulator()
+    msd_accumulator = WelfordAccumulator()
+    band_accumulator = WelfordAccumulator()
+    for start in range(0, n_walkers, batch_size):
+        n_batch = min(batch_size, n_walkers - start)
+        initial_band = rng.choice(n_bands, size=n_batch, p=occupation)
+        isf, msd, bands = _sample_walkers(
+            rates, bands_basis, times, dk, initial_band, rng
+        )
+        isf_accumulator.merge(isf)
+        msd_accumulator.merge(msd)
+        band_accumulator.merge(bands)
+
+    time_basis = ExplicitTimeBasis(times)
+    assert band_accumulator.mean is not None
+    return KineticMonteCarloResult(
+        isf=get_ensemble_isf(isf_accumulator, time_basis),
+        mean_square_displacement=get_ensemble_average(msd_accumulator, time_basis),
+        band_occupation={
+            "basis": TupleBasis(time_basis, bands_basis),
+            "data": band_accumulator.mean.reshape(-1),
+        },
+    )
@@ -1,8 +1,18 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Literal, TypeVar, overload
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Generic,
+    Literal,
+    Protocol,
+    TypedDict,
+    TypeVar,
+    overload,
+)
 
 import numpy as np
+import scipy.sparse
 
 from surface_potential_analysis.basis.basis import FundamentalBasis
 from surface_potential_analysis.basis.basis_like import BasisLike
@@ -13,7 +23,10 @@ from surface_potential_analysis.dynamics.tunnelling_basis import (
     TunnellingSimulationBasis,
     get_basis_from_shape,
 )
-from surface_potential_analysis.dynamics.util import build_hop_operator, get_hop_shift
+from surface_potential_analysis.dynamics.util import (
+    build_hop_operator_sparse,
+    get_hop_shift,
+)
 from surface_potential_analysis.operator.operator import SingleBasisOperator
 from surface_potential_analysis.util.decorators import timed
 
@@ -68,6 +81,25 @@ Indexed such that A.reshape(*shape, n_bands, *shape, n_bands)[i0,j0,n0,i1,j1,n1]
 gives a from site i=i0,j0,n0 to site j=i1,j1,n1.
 """
 
+
+class SparseTunnellingMatrix(TypedDict, Generic[_B1Inv]):
+    """
+    A tunnelling matrix stored as a (n, n) csr matrix.
+
+    The matrix is indexed in the same way as the dense matrix,
+    with data.toarray() == dense["data"].reshape(dense["basis"].shape).
+    """
+
+    basis: TupleBasisLike[_B1Inv, _B1Inv]
+    data: scipy.sparse.csr_matrix
+
+
+SparseTunnellingAMatrix = SparseTunnellingMatrix[_B1Inv]
+"""A sparse TunnellingAMatrix."""
+
+SparseTunnellingMMatrix = SparseTunnellingMatrix[_B1Inv]
+"""A sparse TunnellingMMatrix."""
+
 FundamentalTunnellingAMatrixBasis = TunnellingSimulationBasis[
     FundamentalBasis[Literal[3]],
     FundamentalBasis[Literal[3]],
@@ -80,6 +112,11 @@ def get_jump_matrix_from_a_matrix(
         TunnellingSimulationBasis[
             _AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L2Inv]
         ]
+    ]
+    | SparseTunnellingAMatrix[
+        TunnellingSimulationBasis[
+            _AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L2Inv]
+        ]
     ],
 ) -> TunnellingJumpMatrix[_L2Inv]:
     """
@@ -87,27 +124,123 @@ def get_jump_matrix_from_a_matrix(
 
     Parameters
     ----------
-    matrix : TunnellingAMatrix[ TunnellingSimulationBasis[ _AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L2Inv] ] ]
+    matrix : TunnellingAMatrix[ TunnellingSimulationBasis[ _AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L2Inv] ] ] | SparseTunnellingAMatrix[ TunnellingSimulationBasis[ _AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L2Inv] ] ]
 
     Returns
     -------
     TunnellingJumpMatrix[_L2Inv]
     """
-    n_bands = matrix["basis"][2].fundamental_n
-    util = BasisUtil(matrix["basis"])
-    stacked = matrix["data"].reshape(*util.shape, *util.shape)
-    data = np.zeros((n_bands, n_bands, 9), dtype=np.complex128)
-    for n_0 in range(n_bands):
-        for n_1 in range(n_bands):
-            for hop in range(9):
-                hop_shift = get_hop_shift(hop, 2)
-                # A matrix uses the reverse order
-                hop_val = stacked[0, 0, n_0, hop_shift[0], hop_shift[1], n_1]
-                data[n_0, n_1, hop] = hop_val
+    util = BasisUtil(matrix["basis"][0])
+    n_bands = util.shape[2]
+    data = matrix["data"]
+    # A matrix uses the reverse order, so the jumps from (0, 0, n_0)
+    # are the first n_bands rows of the matrix
+    rows = (
+        data[:n_bands].toarray()
+        if scipy.sparse.issparse(data)
+        else data.reshape(util.n, util.n)[:n_bands]
+    ).reshape(n_bands, *util.shape)
+    hop_shift = np.array([get_hop_shift(hop, 2) for hop in range(9)])
+    # Rows are indexed by (n_0, hop, n_1)
+    stacked = rows[:, hop_shift[:, 0], hop_shift[:, 1], :]
 
     return {
         "basis": TupleBasis(matrix["basis"][0][2], matrix["basis"][1][2]),
-        "data": data.reshape(-1),
+        "data": np.transpose(stacked, (0, 2, 1)).astype(np.complex128).reshape(-1),
+    }
+
+
+def _get_a_matrix_data_from_jump_matrix(
+    matrix: TunnellingJumpMatrix[Any],
+    shape: tuple[int, int],
+    n_bands: int,
+) -> scipy.sparse.csr_matrix:
+    n_jump_bands = matrix["basis"][0].fundamental_n
+    jump_stacked = matrix["data"].reshape(n_jump_bands, n_jump_bands, 9)
+    jump_stacked = jump_stacked[:n_bands, :n_bands]
+    n_states = int(np.prod(shape)) * n_bands
+
+    out = scipy.sparse.csr_matrix((n_states, n_states), dtype=np.complex128)
+    for hop in range(9):
+        # Only the non-zero jumps contribute to the stencil
+        if not np.any(jump_stacked[:, :, hop]):
+            continue
+        # A matrix uses the reverse convention, ie the row is the initial state,
+        # and hops which wrap onto the same site are summed
+        out += scipy.sparse.kron(
+            build_hop_operator_sparse(hop, shape).T,
+            scipy.sparse.csr_matrix(jump_stacked[:, :, hop]),
+            format="csr",
+        )
+    return out
+
+
+@overload
+def get_sparse_a_matrix_from_jump_matrix(
+    matrix: TunnellingJumpMatrix[_L2Inv],
+    shape: tuple[_L0Inv, _L1Inv],
+    *,
+    n_bands: None = None,
+) -> SparseTunnellingAMatrix[
+    TupleBasisLike[
+        FundamentalBasis[_L0Inv],
+        FundamentalBasis[_L1Inv],
+        TunnellingSimulationBandsBasis[_L2Inv],
+    ]
+]:
+    ...
+
+
+@overload
+def get_sparse_a_matrix_from_jump_matrix(
+    matrix: TunnellingJumpMatrix[_L2Inv],
+    shape: tuple[_L0Inv, _L1Inv],
+    *,
+    n_bands: _L3Inv,
+) -> SparseTunnellingAMatrix[
+    TupleBasisLike[
+        FundamentalBasis[_L0Inv],
+        FundamentalBasis[_L1Inv],
+        TunnellingSimulationBandsBasis[_L3Inv],
+    ]
+]:
+    ...
+
+
+def get_sparse_a_matrix_from_jump_matrix(
+    matrix: TunnellingJumpMatrix[_L2Inv],
+    shape: tuple[_L0Inv, _L1Inv],
+    *,
+    n_bands: Any = None,
+) -> SparseTunnellingAMatrix[
+    TupleBasisLike[
+        FundamentalBasis[_L0Inv],
+        FundamentalBasis[_L1Inv],
+        TunnellingSimulationBandsBasis[Any],
+    ]
+]:
+    """
+    Given a jump matrix get a sparse a matrix.
+
+    The matrix is built directly from the nine point stencil of the jump matrix,
+    so only the 9 * n_bands**2 non-zero elements of each row are stored.
+
+    Parameters
+    ----------
+    matrix : TunnellingJumpMatrix[_L2Inv]
+    shape : tuple[_L0Inv, _L1Inv]
+    n_bands : int, optional
+        number of bands, by default None
+
+    Returns
+    -------
+    SparseTunnellingAMatrix[ tuple[ FundamentalBasis[_L0Inv], FundamentalBasis[_L1Inv], TunnellingSimulationBandsBasis[int], ] ]
+    """
+    n_bands = matrix["basis"][0].fundamental_n if n_bands is None else n_bands
+    final_basis = get_basis_from_shape(shape, n_bands, matrix["basis"][0])
+    return {
+        "basis": TupleBasis(final_basis, final_basis),
+        "data": _get_a_matrix_data_from_jump_matrix(matrix, shape, n_bands),
     }
 
 
@@ -169,24 +302,8 @@ def get_a_matrix_from_jump_matrix(
     -------
     TunnellingAMatrix[ tuple[ FundamentalBasis[_L0Inv], FundamentalBasis[_L1Inv], TunnellingSimulationBandsBasis[int], ] ]
     """
-    n_bands = matrix["basis"].fundamental_n if n_bands is None else n_bands
-    final_basis = get_basis_from_shape(shape, n_bands, matrix["basis"][0])
-    final_util = BasisUtil(final_basis)
-
-    (n_x0, n_x1) = shape
-    jump_stacked = matrix["data"].reshape(n_bands, n_bands, 9)
-    array = np.zeros((*final_util.shape, *final_util.shape), dtype=np.complex128)
-    for n_0 in range(n_bands):
-        for n_1 in range(n_bands):
-            for hop in range(9):
-                hop_val = jump_stacked[n_0, n_1, hop]
-                operator = hop_val * build_hop_operator(hop, (n_x0, n_x1))
-                array[:, :, n_1, :, :, n_0] += operator
-    # A matrix uses the reverse convention for array, ie n_0 first
-    return {
-        "basis": TupleBasis(final_basis, final_basis),
-        "data": array.reshape(final_util.n, final_util.n).T.reshape(-1),
-    }
+    sparse = get_sparse_a_matrix_from_jump_matrix(matrix, shape, n_bands=n_bands)
+    return {"basis": sparse["basis"], "data": sparse["data"].toarray().reshape(-1)}
 
 
 def resample_tunnelling_a_matrix(
@@ -218,6 +335,53 @@ def resample_tunnelling_a_matrix(
     return get_a_matrix_from_jump_matrix(jump_matrix, shape, n_bands=n_bands)
 
 
+class BatchJumpFunction(Protocol):
+    """
+    Calculates the jump rate for many (n_0, n_1, hop) at once.
+
+    The indices are integer arrays which broadcast together, and the
+    result should broadcast to their shape, such that
+    result[i] is the rate of a jump from band n_0[i] to n_1[i] with hop[i].
+    """
+
+    def __call__(
+        self,
+        n_0: np.ndarray[Any, np.dtype[np.int_]],
+        n_1: np.ndarray[Any, np.dtype[np.int_]],
+        hop: np.ndarray[Any, np.dtype[np.int_]],
+    ) -> np.ndarray[Any, np.dtype[np.complex128]]:
+        """Get the rate of each jump."""
+        ...
+
+
+def get_jump_matrix_from_batch_function(
+    bands_basis: TunnellingSimulationBandsBasis[_L2Inv],
+    jump_function: BatchJumpFunction,
+) -> TunnellingJumpMatrix[_L2Inv]:
+    """
+    Given the jump rate as a batch function, calculate the jump matrix.
+
+    jump_function is called once, with index arrays of shape (n_bands, n_bands, 9).
+
+    Parameters
+    ----------
+    bands_basis : TunnellingSimulationBandsBasis[_L2Inv]
+    jump_function : BatchJumpFunction
+        jump_function(n_0, n_1, hop)
+
+    Returns
+    -------
+    TunnellingJumpMatrix[_L2Inv]
+    """
+    n_bands = bands_basis.fundamental_n
+    n_0, n_1, hop = np.indices((n_bands, n_bands, 9))
+    data = np.broadcast_to(jump_function(n_0, n_1, hop), n_0.shape)
+    return {
+        "basis": TupleBasis(bands_basis, bands_basis),
+        "data": data.astype(np.complex128).reshape(-1),
+    }
+
+
 @timed
 def get_jump_matrix_from_function(
     bands_basis: TunnellingSimulationBandsBasis[_L2Inv],
@@ -226,28 +390,41 @@ def get_jump_matrix_from_function(
     r"""
     Given gamma as a function calculate the a matrix.
 
+    jump_function is called once for each (n_0, n_1, hop),
+    get_jump_matrix_from_batch_function should be preferred for many bands.
+
     Parameters
     ----------
-    shape : _S0Inv
-        shape of the simulation (nx0, nx1)
-    n_bands : int
-        number of bands in the simulation
-    a_function : Callable[[int, int, int], float]
-        a_function(i, j, hop_idx)
+    bands_basis : TunnellingSimulationBandsBasis[_L2Inv]
+    jump_function : Callable[[int, int, int], float]
+        jump_function(n_0, n_1, hop_idx)
 
     Returns
     -------
-    TunnellingAMatrix[_S0Inv]
+    TunnellingJumpMatrix[_L2Inv]
     """
-    n_bands = bands_basis.fundamental_n
-    data = np.zeros((n_bands, n_bands, 9), dtype=np.complex128)
-    for n0 in range(n_bands):
-        for n1 in range(n_bands):
-            for d1 in range(9):
-                data[n0, n1, d1] = jump_function((n0), n1, d1)
-    return {"basis": TupleBasis(bands_basis, bands_basis), "data": data.reshape(-1)}
+    return get_jump_matrix_from_batch_function(
+        bands_basis, np.vectorize(jump_function, otypes=[np.complex128])
+    )
+
+
+@overload
+def get_a_matrix_reduced_bands(
+    matrix: SparseTunnellingAMatrix[
+        TupleBasisLike[
+            _AX0Inv,
+            _AX1Inv,
+            TunnellingSimulationBandsBasis[_L0Inv],
+        ],
+    ],
+    n_bands: _L1Inv,
+) -> SparseTunnellingAMatrix[
+    TupleBasisLike[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L1Inv]]
+]:
+    ...
 
 
+@overload
 def get_a_matrix_reduced_bands(
     matrix: TunnellingAMatrix[
         TupleBasisLike[
@@ -260,19 +437,26 @@ def get_a_matrix_reduced_bands(
 ) -> TunnellingAMatrix[
     TupleBasisLike[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L1Inv]]
 ]:
+    ...
+
+
+def get_a_matrix_reduced_bands(
+    matrix: TunnellingAMatrix[Any] | SparseTunnellingAMatrix[Any],
+    n_bands: int,
+) -> TunnellingAMatrix[Any] | SparseTunnellingAMatrix[Any]:
     """
-    Get the MMatrix with only the first n_bands included.
+    Get the AMatrix with only the first n_bands included.
 
     Parameters
     ----------
-    matrix : TunnellingMMatrix[tuple[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L0Inv]]]
+    matrix : TunnellingAMatrix[tuple[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L0Inv]]] | SparseTunnellingAMatrix[tuple[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L0Inv]]]
     n_bands : _L1Inv
 
     Returns
     -------
-    TunnellingMMatrix[tuple[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L1Inv]]]
+    TunnellingAMatrix[tuple[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L1Inv]]] | SparseTunnellingAMatrix[tuple[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L1Inv]]]
     """
-    util = BasisUtil(matrix["basis"])
+    util = BasisUtil(matrix["basis"][0])
     a_basis = TupleBasis(
         matrix["basis"][0][0],
         matrix["basis"][0][1],
@@ -281,11 +465,18 @@ def get_a_matrix_reduced_bands(
             matrix["basis"][0][2].unit_cell,
         ),
     )
+    data = matrix["data"]
+    if scipy.sparse.issparse(data):
+        (kept,) = np.nonzero(np.arange(util.n) % util.shape[2] < n_bands)
+        return {
+            "basis": TupleBasis(a_basis, a_basis),
+            "data": scipy.sparse.csr_matrix(data[kept][:, kept]),
+        }
     return {
         "basis": TupleBasis(a_basis, a_basis),
-        "data": matrix["data"]
-        .reshape(*util.shape, *util.shape)[:, :, :n_bands, :, :, :n_bands]
-        .reshape(-1),
+        "data": data.reshape(*util.shape, *util.shape)[
+            :, :, :n_bands, :, :, :n_bands
+        ].reshape(-1),
     }
 
 
@@ -335,6 +526,120 @@ def get_tunnelling_m_matrix(
     return {"basis": matrix["basis"], "data": array}
 
 
+def get_sparse_tunnelling_m_matrix(
+    matrix: SparseTunnellingAMatrix[_B1Inv],
+) -> SparseTunnellingMMatrix[_B1Inv]:
+    r"""
+    Calculate the sparse M matrix (M_{ij} = A_{j,i} - \delta_{i,j} \sum_k A_{i,k}).
+
+    Parameters
+    ----------
+    matrix : SparseTunnellingAMatrix[_B1Inv]
+
+    Returns
+    -------
+    SparseTunnellingMMatrix[_B1Inv]
+    """
+    # As in get_tunnelling_m_matrix, jumps into the same state are ignored
+    data = matrix["data"]
+    off_diagonal = data - scipy.sparse.diags(data.diagonal())
+    off_diagonal.eliminate_zeros()
+    total = np.asarray(off_diagonal.sum(axis=1)).reshape(-1)
+    array = off_diagonal.T - scipy.sparse.diags(total)
+    return {"basis": matrix["basis"], "data": scipy.sparse.csr_matrix(array)}
+
+
+def as_sparse_tunnelling_matrix(
+    matrix: SingleBasisOperator[_B1Inv] | SparseTunnellingMatrix[_B1Inv],
+) -> SparseTunnellingMatrix[_B1Inv]:
+    """
+    Get a tunnelling matrix as a sparse matrix.
+
+    Parameters
+    ----------
+    matrix : SingleBasisOperator[_B1Inv] | SparseTunnellingMatrix[_B1Inv]
+
+    Returns
+    -------
+    SparseTunnellingMatrix[_B1Inv]
+    """
+    data = matrix["data"]
+    if scipy.sparse.issparse(data):
+        return {"basis": matrix["basis"], "data": scipy.sparse.csr_matrix(data)}
+    return {
+        "basis": matrix["basis"],
+        "data": scipy.sparse.csr_matrix(data.reshape(matrix["basis"].shape)),
+    }
+
+
+def get_tunnelling_m_matrix_kernel(
+    matrix: TunnellingMMatrix[
+        TupleBasisLike[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L0Inv]]
+    ]
+    | SparseTunnellingMMatrix[
+        TupleBasisLike[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L0Inv]]
+    ],
+) -> np.ndarray[tuple[int, int, _L0Inv, _L0Inv], np.dtype[np.complex128]]:
+    """
+    Get the kernel of a translationally invariant M matrix.
+
+    The kernel is indexed such that kernel[d0, d1, n1, n0] = M[(i0 + d0, j0 + d1, n1), (i0, j0, n0)]
+    for any site (i0, j0).
+
+    Parameters
+    ----------
+    matrix : TunnellingMMatrix[TupleBasisLike[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L0Inv]]] | SparseTunnellingMMatrix[TupleBasisLike[_AX0Inv, _AX1Inv, TunnellingSimulationBandsBasis[_L0Inv]]]
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int, _L0Inv, _L0Inv], np.dtype[np.complex128]]
+    """
+    util = BasisUtil(matrix["basis"][0])
+    n_bands = util.shape[2]
+    data = matrix["data"]
+    # The columns (0, 0, n0) are the first n_bands columns of the matrix
+    columns = (
+        data[:, :n_bands].toarray()
+        if scipy.sparse.issparse(data)
+        else data.reshape(util.n, util.n)[:, :n_bands]
+    )
+    return columns.reshape(*util.shape, n_bands)  # type: ignore[no-any-return]
+
+
+def get_tunnelling_m_matrix_kernel_from_jump_matrix(
+    matrix: TunnellingJumpMatrix[_L2Inv],
+    shape: tuple[_L0Inv, _L1Inv],
+) -> np.ndarray[tuple[_L0Inv, _L1Inv, _L2Inv, _L2Inv], np.dtype[np.complex128]]:
+    """
+    Get the kernel of the M matrix, without building the full M matrix.
+
+    This matches get_tunnelling_m_matrix_kernel(get_tunnelling_m_matrix(get_a_matrix_from_jump_matrix(matrix, shape)))
+
+    Parameters
+    ----------
+    matrix : TunnellingJumpMatrix[_L2Inv]
+    shape : tuple[_L0Inv, _L1Inv]
+
+    Returns
+    -------
+    np.ndarray[tuple[_L0Inv, _L1Inv, _L2Inv, _L2Inv], np.dtype[np.complex128]]
+    """
+    n_bands = matrix["basis"][0].fundamental_n
+    jump_stacked = matrix["data"].reshape(n_bands, n_bands, 9)
+    kernel = np.zeros((*shape, n_bands, n_bands), dtype=np.complex128)
+    for hop in range(9):
+        hop_shift = get_hop_shift(hop, 2)
+        # A jump from n_0 to n_1 is a jump from column n_0 into row n_1
+        kernel[hop_shift[0] % shape[0], hop_shift[1] % shape[1]] += jump_stacked[
+            :, :, hop
+        ].T
+    # As in get_tunnelling_m_matrix, jumps into the same state are ignored
+    bands = np.arange(n_bands)
+    kernel[0, 0, bands, bands] = 0
+    kernel[0, 0, bands, bands] = -np.sum(kernel, axis=(0, 1, 2))
+    return kernel
+
+
 def get_initial_pure_density_matrix_for_basis(
     basis: _B1Inv, idx: SingleIndexLike = 0
 ) -> DiagonalOperator[_B1Inv, _B1Inv]:
@@ -373,7 +678,7 @@ def density_matrix_as_probability(
     -------
     ProbabilityVector[_B0Inv]
     """
-    return {"basis": matrix["basis"], "data": np.real(matrix["data"])}  # type: ignore[typeddict-item]
+    return {"basis": matrix["basis"][0], "data": np.real(matrix["data"])}
 
 
 def density_matrix_list_as_probabilities(
@@ -61,26 +61,23 @@ def _calculate_approximate_locations(
     return central_locations + offsets  # type: ignore[no-any-return]
 
 
-def calculate_isf_approximate_locations(
+def get_approximate_location_phases(
     initial_occupation: ProbabilityVector[_B1Inv],
-    final_occupation: ProbabilityVectorList[_B0, _B1Inv],
     dk: np.ndarray[tuple[Literal[2]], np.dtype[np.float64]],
-) -> SingleBasisDiagonalOperator[_B0]:
+) -> np.ndarray[tuple[int], np.dtype[np.complex128]]:
     """
-    Calculate the ISF, assuming all states are approximately eigenstates of position.
+    Get the phase exp(i dk.(x - x0)) of each state, where x0 is the average initial location.
 
     Parameters
     ----------
-    initial_matrix : ProbabilityVector[_B0Inv]
+    initial_occupation : ProbabilityVector[_B1Inv]
         Initial occupation
-    final_matrices : ProbabilityVectorList[_B0Inv, _L0Inv]
-        Final occupation
-    dk : np.ndarray[tuple[Literal[3]], np.dtype[np.float_]]
+    dk : np.ndarray[tuple[Literal[2]], np.dtype[np.float_]]
         direction along which to measure the ISF
 
     Returns
     -------
-    EigenvalueList[_L0Inv]
+    np.ndarray[tuple[int], np.dtype[np.complex128]]
     """
     locations = _calculate_approximate_locations(initial_occupation["basis"])
     initial_location = np.average(locations, axis=1, weights=initial_occupation["data"])
@@ -102,8 +99,32 @@ def calculate_isf_approximate_locations(
     )
 
     mean_phi = np.tensordot(dk, distances_wrapped, axes=(0, 0))
+    return np.exp(1j * mean_phi)  # type: ignore[no-any-return]
+
+
+def calculate_isf_approximate_locations(
+    initial_occupation: ProbabilityVector[_B1Inv],
+    final_occupation: ProbabilityVectorList[_B0, _B1Inv],
+    dk: np.ndarray[tuple[Literal[2]], np.dtype[np.float64]],
+) -> SingleBasisDiagonalOperator[_B0]:
+    """
+    Calculate the ISF, assuming all states are approximately eigenstates of position.
+
+    Parameters
+    ----------
+    initial_matrix : ProbabilityVector[_B0Inv]
+        Initial occupation
+    final_matrices : ProbabilityVectorList[_B0Inv, _L0Inv]
+        Final occupation
+    dk : np.ndarray[tuple[Literal[3]], np.dtype[np.float_]]
+        direction along which to measure the ISF
+
+    Returns
+    -------
+    EigenvalueList[_L0Inv]
+    """
     eigenvalues = np.tensordot(
-        np.exp(1j * mean_phi),
+        get_approximate_location_phases(initial_occupation, dk),
         final_occupation["data"].reshape(final_occupation["basis"].shape),
         axes=(0, 1),
     )
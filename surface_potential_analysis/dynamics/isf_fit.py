@@ -0,0 +1,493 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, Any, Literal, TypeVar
+
+import numpy as np
+import scipy.linalg
+import scipy.optimize
+
+from surface_potential_analysis.dynamics.isf import (
+    calculate_isf_fey_4_variable_model_110,
+    calculate_isf_fey_model_110,
+    calculate_isf_fey_model_112bar,
+)
+from surface_potential_analysis.util.util import Measure, get_measured_data
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from surface_potential_analysis.basis.basis_like import BasisLike
+    from surface_potential_analysis.basis.time_basis_like import BasisWithTimeLike
+    from surface_potential_analysis.operator.operator_list import (
+        SingleBasisDiagonalOperatorList,
+    )
+
+    _B0 = TypeVar("_B0", bound=BasisLike[Any, Any])
+    _BT0 = TypeVar("_BT0", bound=BasisWithTimeLike[Any, Any])
+
+    _ModelFunction = Callable[
+        [np.ndarray[Any, np.dtype[np.float64]], np.ndarray[Any, np.dtype[np.float64]]],
+        np.ndarray[Any, np.dtype[np.float64]],
+    ]
+
+
+@dataclass(frozen=True)
+class ISFModel:
+    """
+    A model of the ISF, for use with fit_isf_batch.
+
+    function(times, parameters) gives the ISF at each time, and
+    jacobian(times, parameters) gives the derivative with respect to
+    each parameter, with shape (times.size, n_parameters). If jacobian
+    is None, it is estimated using finite differences. The models in this
+    module can be pickled, so they can be fit using a pool of processes.
+    """
+
+    parameter_names: tuple[str, ...]
+    function: _ModelFunction
+    jacobian: _ModelFunction | None
+    initial_guess: tuple[float, ...]
+    lower_bound: tuple[float, ...]
+    upper_bound: tuple[float, ...]
+
+
+def _double_exponential_function(
+    t: np.ndarray[Any, np.dtype[np.float64]],
+    p: np.ndarray[Any, np.dtype[np.float64]],
+) -> np.ndarray[Any, np.dtype[np.float64]]:
+    return p[0] * np.exp(-p[1] * t) + p[2] * np.exp(-p[3] * t) + (1 - p[0] - p[2])
+
+
+def _double_exponential_jacobian(
+    t: np.ndarray[Any, np.dtype[np.float64]],
+    p: np.ndarray[Any, np.dtype[np.float64]],
+) -> np.ndarray[Any, np.dtype[np.float64]]:
+    fast = np.exp(-p[1] * t)
+    slow = np.exp(-p[3] * t)
+    return np.stack([fast - 1, -p[0] * t * fast, slow - 1, -p[2] * t * slow], axis=-1)
+
+
+def get_double_exponential_model() -> ISFModel:
+    """
+    Get the double exponential model, as used by fit_isf_to_double_exponential.
+
+    The parameters are (fast_amplitude, fast_rate, slow_amplitude, slow_rate),
+    and the baseline is 1 - fast_amplitude - slow_amplitude.
+
+    Returns
+    -------
+    ISFModel
+    """
+    return ISFModel(
+        parameter_names=("fast_amplitude", "fast_rate", "slow_amplitude", "slow_rate"),
+        function=_double_exponential_function,
+        jacobian=_double_exponential_jacobian,
+        initial_guess=(0.5, 2e10, 0.5, 1e10),
+        lower_bound=(0, 0, 0, 0),
+        upper_bound=(1, np.inf, 1, np.inf),
+    )
+
+
+def _fey_4_variable_function_110(
+    t: np.ndarray[Any, np.dtype[np.float64]],
+    p: np.ndarray[Any, np.dtype[np.float64]],
+    *,
+    a_dk: float,
+) -> np.ndarray[Any, np.dtype[np.float64]]:
+    return calculate_isf_fey_4_variable_model_110(
+        t, p[0], p[1], p[2], p[3], p[4], a_dk=a_dk
+    )
+
+
+def _fey_4_variable_jacobian_110(
+    t: np.ndarray[Any, np.dtype[np.float64]],
+    p: np.ndarray[Any, np.dtype[np.float64]],
+    *,
+    a_dk: float,
+) -> np.ndarray[Any, np.dtype[np.float64]]:
+    # The decay rates are (fr + sr) / 2 +- w / 6, where
+    # w = sqrt(9 sr**2 + c sr fr + 9 fr**2)
+    c = 16 * np.cos(a_dk / 2) ** 2 + 16 * np.cos(a_dk / 2) - 14
+    fast_rate, fast_amplitude, slow_rate, slow_amplitude, _ = p
+    w = np.sqrt(9 * slow_rate**2 + c * slow_rate * fast_rate + 9 * fast_rate**2)
+    dw_dfast = (c * slow_rate + 18 * fast_rate) / (2 * w)
+    dw_dslow = (18 * slow_rate + c * fast_rate) / (2 * w)
+    fast = np.exp(-((fast_rate + slow_rate) / 2 + w / 6) * t)
+    slow = np.exp(-((fast_rate + slow_rate) / 2 - w / 6) * t)
+
+    def _get_rate_derivative(dw: float) -> np.ndarray[Any, np.dtype[np.float64]]:
+        return -t * (
+            fast_amplitude * fast * (0.5 + dw / 6)
+            + slow_amplitude * slow * (0.5 - dw / 6)
+        )
+
+    return np.stack(
+        [
+            _get_rate_derivative(dw_dfast),
+            fast,
+            _get_rate_derivative(dw_dslow),
+            slow,
+            np.ones_like(t),
+        ],
+        axis=-1,
+    )
+
+
+def get_fey_4_variable_model_110(a_dk: float = 2) -> ISFModel:
+    """
+    Get the fey 4 variable model, as used by fit_isf_to_fey_4_variable_model_110.
+
+    The parameters are (fast_rate, fast_amplitude, slow_rate, slow_amplitude, offset).
+
+    Parameters
+    ----------
+    a_dk : float, optional
+        a_dk, by default 2
+
+    Returns
+    -------
+    ISFModel
+    """
+    return ISFModel(
+        parameter_names=(
+            "fast_rate",
+            "fast_amplitude",
+            "slow_rate",
+            "slow_amplitude",
+            "offset",
+        ),
+        function=partial(_fey_4_variable_function_110, a_dk=a_dk),
+        jacobian=partial(_fey_4_variable_jacobian_110, a_dk=a_dk),
+        initial_guess=(1.4e9, 0.2, 0.7e9, 0.8, 0.05),
+        lower_bound=(0, 0, 0, 0, 0),
+        upper_bound=(np.inf, np.inf, np.inf, np.inf, 0.2),
+    )
+
+
+def _get_fey_amplitude(
+    lam: float, top_factor: complex, d: float, dd: float
+) -> tuple[float, float]:
+    # The amplitude |1 - lam T / d|^2 / ((1 + lam |T|^2 / d^2) (1 + lam))
+    # of a decay in the fey model, and its derivative with respect to lam,
+    # where d is a function of lam with derivative dd.
+    q = 1 - lam * top_factor / d
+    dq = -top_factor / d + lam * top_factor * dd / d**2
+    norm = np.square(np.abs(q))
+    dnorm = 2 * np.real(np.conj(q) * dq)
+    n = 1 + lam * np.square(np.abs(top_factor)) / d**2
+    dn = np.square(np.abs(top_factor)) * (1 / d**2 - 2 * lam * dd / d**3)
+    amplitude = norm / (n * (1 + lam))
+    derivative = (dnorm * n - norm * dn) / (n**2 * (1 + lam)) - amplitude / (1 + lam)
+    return amplitude, derivative
+
+
+def _get_fey_jacobian(  # noqa: PLR0913
+    t: np.ndarray[Any, np.dtype[np.float64]],
+    fast_rate: float,
+    slow_rate: float,
+    *,
+    h: float,
+    dh: float,
+    amplitudes: tuple[tuple[float, float], tuple[float, float]],
+) -> np.ndarray[Any, np.dtype[np.float64]]:
+    # The fey models are a sum of two decays, with rates
+    # (fr + sr) / 2 +- fr h(lam) and amplitudes A(lam), where lam = sr / fr
+    lam = slow_rate / fast_rate
+    d_fast = np.zeros_like(t)
+    d_slow = np.zeros_like(t)
+    for sign, (amplitude, d_amplitude) in zip((1, -1), amplitudes, strict=True):
+        decay = np.exp(-((fast_rate + slow_rate) / 2 + sign * fast_rate * h) * t)
+        d_fast += decay * (
+            -d_amplitude * lam / fast_rate
+            - amplitude * t * (0.5 + sign * (h - lam * dh))
+        )
+        d_slow += decay * (d_amplitude / fast_rate - amplitude * t * (0.5 + sign * dh))
+    return np.stack([d_fast, d_slow], axis=-1)
+
+
+def _fey_function_110(
+    t: np.ndarray[Any, np.dtype[np.float64]],
+    p: np.ndarray[Any, np.dtype[np.float64]],
+    *,
+    a_dk: float,
+) -> np.ndarray[Any, np.dtype[np.float64]]:
+    return calculate_isf_fey_model_110(t, p[0], p[1], a_dk=a_dk)
+
+
+def _fey_jacobian_110(
+    t: np.ndarray[Any, np.dtype[np.float64]],
+    p: np.ndarray[Any, np.dtype[np.float64]],
+    *,
+    a_dk: float,
+) -> np.ndarray[Any, np.dtype[np.float64]]:
+    fast_rate, slow_rate = p
+    lam = slow_rate / fast_rate
+    c = 16 * np.cos(a_dk / 2) ** 2 + 16 * np.cos(a_dk / 2) - 14
+    z = np.sqrt(9 * lam**2 + c * lam + 9)
+    dz = (18 * lam + c) / (2 * z)
+    top_factor = 4 * np.cos(a_dk / 2) + 2
+    amplitudes = (
+        _get_fey_amplitude(lam, top_factor, 3 * lam - 3 + z, 3 + dz),
+        _get_fey_amplitude(lam, top_factor, 3 * lam - 3 - z, 3 - dz),
+    )
+    return _get_fey_jacobian(
+        t, fast_rate, slow_rate, h=z / 6, dh=dz / 6, amplitudes=amplitudes
+    )
+
+
+def get_fey_model_110(a_dk: float = 2) -> ISFModel:
+    """
+    Get the fey model, as used by fit_isf_to_fey_model_110.
+
+    The parameters are (fast_rate, slow_rate).
+
+    Parameters
+    ----------
+    a_dk : float, optional
+        a_dk, by default 2
+
+    Returns
+    -------
+    ISFModel
+    """
+    return ISFModel(
+        parameter_names=("fast_rate", "slow_rate"),
+        function=partial(_fey_function_110, a_dk=a_dk),
+        jacobian=partial(_fey_jacobian_110, a_dk=a_dk),
+        initial_guess=(1.4e9, 3e8),
+        lower_bound=(0, 0),
+        upper_bound=(np.inf, np.inf),
+    )
+
+
+def _fey_function_112bar(
+    t: np.ndarray[Any, np.dtype[np.float64]],
+    p: np.ndarray[Any, np.dtype[np.float64]],
+    *,
+    a_dk: float,
+) -> np.ndarray[Any, np.dtype[np.float64]]:
+    return calculate_isf_fey_model_112bar(t, p[0], p[1], a_dk=a_dk)
+
+
+def _fey_jacobian_112bar(
+    t: np.ndarray[Any, np.dtype[np.float64]],
+    p: np.ndarray[Any, np.dtype[np.float64]],
+    *,
+    a_dk: float,
+) -> np.ndarray[Any, np.dtype[np.float64]]:
+    fast_rate, slow_rate = p
+    lam = slow_rate / fast_rate
+    b = (8 * np.cos(a_dk * np.sqrt(3) / 2) + 1) / 9
+    y = np.sqrt(lam**2 + 2 * lam * b + 1)
+    dy = (lam + b) / y
+    # The amplitudes of this model have the same form as 110,
+    # with a top factor of 2 T and d = 3 lam - 3 +- 3 y
+    top_factor = 2 * (
+        np.exp(1j * a_dk / np.sqrt(3)) + 2 * np.exp(-1j * a_dk / (np.sqrt(12)))
+    )
+    amplitudes = (
+        _get_fey_amplitude(lam, top_factor, 3 * lam - 3 + 3 * y, 3 + 3 * dy),
+        _get_fey_amplitude(lam, top_factor, 3 * lam - 3 - 3 * y, 3 - 3 * dy),
+    )
+    return _get_fey_jacobian(
+        t, fast_rate, slow_rate, h=y / 2, dh=dy / 2, amplitudes=amplitudes
+    )
+
+
+def get_fey_model_112bar(a_dk: float = 2) -> ISFModel:
+    """
+    Get the fey model, as used by fit_isf_to_fey_model_112bar.
+
+    The parameters are (fast_rate, slow_rate).
+
+    Parameters
+    ----------
+    a_dk : float, optional
+        a_dk, by default 2
+
+    Returns
+    -------
+    ISFModel
+    """
+    return ISFModel(
+        parameter_names=("fast_rate", "slow_rate"),
+        function=partial(_fey_function_112bar, a_dk=a_dk),
+        jacobian=partial(_fey_jacobian_112bar, a_dk=a_dk),
+        initial_guess=(2e10, 1e10),
+        lower_bound=(0, 0),
+        upper_bound=(np.inf, np.inf),
+    )
+
+
+@dataclass
+class ISFBatchFit:
+    """
+    The result of fit_isf_batch.
+
+    parameters and standard_error have shape (*batch_shape, n_parameters),
+    in the order given by the model's parameter_names.
+    """
+
+    parameters: np.ndarray[Any, np.dtype[np.float64]]
+    standard_error: np.ndarray[Any, np.dtype[np.float64]]
+    success: np.ndarray[Any, np.dtype[np.bool_]]
+
+
+def _fit_isf(
+    model: ISFModel,
+    times: np.ndarray[tuple[int], np.dtype[np.float64]],
+    data: np.ndarray[tuple[int], np.dtype[np.float64]],
+    sigma: np.ndarray[tuple[int], np.dtype[np.float64]],
+    initial_guess: np.ndarray[tuple[int], np.dtype[np.float64]],
+) -> tuple[
+    np.ndarray[tuple[int], np.dtype[np.float64]],
+    np.ndarray[tuple[int], np.dtype[np.float64]],
+    bool,
+]:
+    jacobian = model.jacobian
+    result = scipy.optimize.least_squares(
+        lambda p: (model.function(times, p) - data) / sigma,
+        initial_guess,
+        jac="2-point"
+        if jacobian is None
+        else (lambda p: jacobian(times, p) / sigma[:, np.newaxis]),
+        bounds=(model.lower_bound, model.upper_bound),
+        x_scale="jac",
+        max_nfev=10000,
+    )
+    # As in scipy.optimize.curve_fit, the covariance is scaled by the
+    # reduced chi squared of the fit
+    _, s, vh = scipy.linalg.svd(result.jac, full_matrices=False)
+    threshold = np.finfo(float).eps * max(result.jac.shape) * s[0]
+    s_inv = np.divide(1, s, out=np.zeros_like(s), where=s > threshold)
+    covariance = (vh.T * s_inv**2) @ vh
+    n_dof = max(times.size - initial_guess.size, 1)
+    covariance *= 2 * result.cost / n_dof
+    return result.x, np.sqrt(np.diag(covariance)), bool(result.success)
+
+
+def fit_isf_batch(  # noqa: PLR0913
+    times: np.ndarray[tuple[int], np.dtype[np.float64]],
+    data: np.ndarray[Any, np.dtype[np.float64]],
+    model: ISFModel,
+    *,
+    sigma: np.ndarray[Any, np.dtype[np.float64]] | None = None,
+    initial_guess: np.ndarray[Any, np.dtype[np.float64]] | None = None,
+    n_workers: int | None = None,
+    executor: Literal["thread", "process"] = "thread",
+) -> ISFBatchFit:
+    """
+    Fit a stack of ISFs to model, such as the ISF at each dk and temperature.
+
+    Each ISF is fit independently using scipy.optimize.least_squares,
+    and the fits are distributed over a pool of n_workers workers.
+    least_squares holds the GIL for most of each fit, so a pool of threads
+    only helps if the model is expensive to evaluate. Use executor="process"
+    to run the fits in parallel, in which case model must be picklable.
+
+    Parameters
+    ----------
+    times : np.ndarray[tuple[int], np.dtype[np.float64]]
+    data : np.ndarray[Any, np.dtype[np.float64]]
+        the ISFs to fit, with shape (*batch_shape, times.size)
+    model : ISFModel
+    sigma : np.ndarray[Any, np.dtype[np.float64]] | None, optional
+        uncertainty in data, broadcastable to data.shape, by default None
+    initial_guess : np.ndarray[Any, np.dtype[np.float64]] | None, optional
+        initial parameters, broadcastable to (*batch_shape, n_parameters),
+        by default model.initial_guess
+    n_workers : int | None, optional
+        number of workers, by default os.cpu_count()
+    executor : Literal["thread", "process"], optional
+        type of worker, by default "thread"
+
+    Returns
+    -------
+    ISFBatchFit
+    """
+    batch_shape = data.shape[:-1]
+    n_parameters = len(model.parameter_names)
+    stacked_data = data.reshape(-1, times.size)
+    stacked_sigma = np.broadcast_to(
+        np.ones(1) if sigma is None else sigma, data.shape
+    ).reshape(-1, times.size)
+    stacked_guess = (
+        np.broadcast_to(
+            model.initial_guess if initial_guess is None else initial_guess,
+            (*batch_shape, n_parameters),
+        )
+        .reshape(-1, n_parameters)
+        .astype(np.float64)
+    )
+
+    n_fits = stacked_data.shape[0]
+    n_workers = (os.cpu_count() or 1) if n_workers is None else n_workers
+    pool = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    with pool(max(1, min(n_workers, n_fits))) as workers:
+        results = list(
+            workers.map(
+                _fit_isf,
+                [model] * n_fits,
+                [times] * n_fits,
+                stacked_data,
+                stacked_sigma,
+                stacked_guess,
+            )
+        )
+
+    return ISFBatchFit(
+        parameters=np.array([r[0] for r in results]).reshape(
+            *batch_shape, n_parameters
+        ),
+        standard_error=np.array([r[1] for r in results]).reshape(
+            *batch_shape, n_parameters
+        ),
+        success=np.array([r[2] for r in results], dtype=np.bool_).reshape(batch_shape),
+    )
+
+
+def fit_isf_list(
+    isf: SingleBasisDiagonalOperatorList[_B0, _BT0],
+    model: ISFModel,
+    *,
+    measure: Measure = "abs",
+    n_workers: int | None = None,
+    executor: Literal["thread", "process"] = "thread",
+) -> ISFBatchFit:
+    """
+    Fit each ISF in a list to model.
+
+    If isf has a standard_deviation, it is used as the uncertainty of each fit.
+
+    Parameters
+    ----------
+    isf : SingleBasisDiagonalOperatorList[_B0, _BT0]
+    model : ISFModel
+    measure : Measure, optional
+        measure, by default "abs"
+    n_workers : int | None, optional
+        number of workers, by default os.cpu_count()
+    executor : Literal["thread", "process"], optional
+        type of worker, by default "thread"
+
+    Returns
+    -------
+    ISFBatchFit
+    """
+    times = isf["basis"][1][0].times
+    data = get_measured_data(isf["data"], measure).reshape(-1, times.size)
+    sigma = isf.get("standard_deviation")
+    if isinstance(sigma, np.ndarray):
+        sigma = sigma.reshape(data.shape)
+    return fit_isf_batch(
+        times,
+        data,
+        model,
+        sigma=sigma,
+        n_workers=n_workers,
+        executor=executor,
+    )
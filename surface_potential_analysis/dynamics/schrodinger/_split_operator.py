@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from scipy.constants import hbar
+
+from surface_potential_analysis.hamiltonian_builder.momentum_basis import (
+    hamiltonian_from_mass,
+)
+from surface_potential_analysis.potential.conversion import convert_potential_to_basis
+from surface_potential_analysis.stacked_basis.conversion import (
+    stacked_basis_as_fundamental_position_basis,
+)
+
+if TYPE_CHECKING:
+    from surface_potential_analysis.basis.basis import FundamentalPositionBasis
+    from surface_potential_analysis.basis.stacked_basis import (
+        TupleBasisWithLengthLike,
+    )
+    from surface_potential_analysis.basis.time_basis_like import EvenlySpacedTimeBasis
+    from surface_potential_analysis.potential.potential import Potential
+
+
+@dataclass
+class SplitOperatorSystem:
+    """
+    A hamiltonian H = T(k) + V(x), in units such that hbar = 1.
+
+    The potential is stored in the fundamental position basis, and the
+    kinetic energy in the corresponding fundamental momentum basis, so
+    that the two are related by an n-dimensional fft over shape.
+    """
+
+    basis: TupleBasisWithLengthLike[*tuple[FundamentalPositionBasis[Any, Any], ...]]
+    potential: np.ndarray[tuple[int], np.dtype[np.complex128]]
+    kinetic: np.ndarray[tuple[int], np.dtype[np.complex128]]
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        """Shape of the position grid."""
+        return self.basis.shape
+
+    def get_phases(self, dt: float) -> SplitOperatorPhases:
+        """
+        Get the phases used to take a step of length dt.
+
+        Returns
+        -------
+        SplitOperatorPhases
+        """
+        return SplitOperatorPhases(
+            shape=self.shape,
+            half_potential=np.exp(-0.5j * self.potential * dt),
+            kinetic=np.exp(-1j * self.kinetic * dt),
+        )
+
+
+@dataclass
+class SplitOperatorPhases:
+    """The phases exp(-i V dt / 2) and exp(-i T dt) of a Strang splitting step."""
+
+    shape: tuple[int, ...]
+    half_potential: np.ndarray[tuple[int], np.dtype[np.complex128]]
+    kinetic: np.ndarray[tuple[int], np.dtype[np.complex128]]
+
+    def apply_kinetic(
+        self, states: np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    ) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+        """
+        Apply exp(-i T dt) to a batch of states, with shape (n_states, n).
+
+        Returns
+        -------
+        np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        """
+        axes = tuple(range(1, len(self.shape) + 1))
+        stacked = states.reshape(-1, *self.shape)
+        transformed = np.fft.fftn(stacked, axes=axes, norm="ortho")
+        transformed *= self.kinetic.reshape(self.shape)
+        return np.fft.ifftn(transformed, axes=axes, norm="ortho").reshape(states.shape)
+
+
+def get_split_operator_system(
+    potential: Potential[Any],
+    mass: float,
+    bloch_fraction: np.ndarray[tuple[int], np.dtype[np.float64]] | None = None,
+) -> SplitOperatorSystem:
+    """
+    Get the split operator system for a particle of mass in potential.
+
+    Parameters
+    ----------
+    potential : Potential[Any]
+    mass : float
+    bloch_fraction : np.ndarray[tuple[int], np.dtype[np.float64]] | None, optional
+        bloch phase, by default None
+
+    Returns
+    -------
+    SplitOperatorSystem
+    """
+    basis = stacked_basis_as_fundamental_position_basis(potential["basis"])
+    converted = convert_potential_to_basis(potential, basis)
+    kinetic = hamiltonian_from_mass(basis, mass, bloch_fraction)
+    return SplitOperatorSystem(
+        basis=basis,
+        potential=np.asarray(converted["data"], dtype=np.complex128) / hbar,
+        kinetic=np.asarray(kinetic["data"], dtype=np.complex128) / hbar,
+    )
+
+
+def get_split_operator_dt(times: EvenlySpacedTimeBasis[Any, Any, Any]) -> float:
+    """
+    Get the length of each step between consecutive times in times.times.
+
+    Each interval is split into times.step steps, so the states are found
+    at exactly times.times.
+
+    Returns
+    -------
+    float
+    """
+    if times.n == 1:
+        return times.fundamental_dt
+    return (times.times[1] - times.times[0]) / times.step  # type: ignore[no-any-return]
+
+
+def split_operator_step(
+    phases: SplitOperatorPhases,
+    states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    """
+    Take a single Strang splitting step exp(-i V dt / 2) exp(-i T dt) exp(-i V dt / 2).
+
+    Parameters
+    ----------
+    phases : SplitOperatorPhases
+    states : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        States with shape (n_states, n), in the fundamental position basis
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    """
+    states = phases.apply_kinetic(phases.half_potential * states)
+    return phases.half_potential * states
+
+
+def propagate_split_operator(
+    phases: SplitOperatorPhases,
+    states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    n_steps: int,
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    """
+    Take n_steps Strang splitting steps.
+
+    The half steps of the potential between consecutive steps are combined,
+    so each step costs a single forward and inverse fft.
+
+    Parameters
+    ----------
+    phases : SplitOperatorPhases
+    states : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        States with shape (n_states, n), in the fundamental position basis
+    n_steps : int
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    """
+    if n_steps == 0:
+        return states
+    potential = np.square(phases.half_potential)
+    states = phases.half_potential * states
+    for _ in range(n_steps - 1):
+        states = potential * phases.apply_kinetic(states)
+    return phases.half_potential * phases.apply_kinetic(states)
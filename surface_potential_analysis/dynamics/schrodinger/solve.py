@@ -6,11 +6,17 @@ import numpy as np
 import qutip
 import qutip.ui
 import scipy.sparse
+import scipy.sparse.linalg
 from scipy.constants import hbar
 
 from surface_potential_analysis.basis.stacked_basis import (
     TupleBasis,
 )
+from surface_potential_analysis.dynamics.schrodinger._split_operator import (
+    get_split_operator_dt,
+    get_split_operator_system,
+    propagate_split_operator,
+)
 from surface_potential_analysis.state_vector.conversion import (
     convert_state_vector_to_basis,
 )
@@ -19,12 +25,17 @@ from surface_potential_analysis.state_vector.eigenstate_calculation import (
 )
 
 if TYPE_CHECKING:
+    from surface_potential_analysis.basis.basis import FundamentalPositionBasis
     from surface_potential_analysis.basis.basis_like import BasisLike
+    from surface_potential_analysis.basis.stacked_basis import (
+        TupleBasisWithLengthLike,
+    )
     from surface_potential_analysis.basis.time_basis_like import EvenlySpacedTimeBasis
     from surface_potential_analysis.operator.operator import (
         SingleBasisDiagonalOperator,
         SingleBasisOperator,
     )
+    from surface_potential_analysis.potential.potential import Potential
     from surface_potential_analysis.state_vector import (
         StateVector,
     )
@@ -78,6 +89,8 @@ def solve_schrodinger_equation_decomposition(
     initial_state: StateVector[_B0Inv],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B0Inv],
+    *,
+    debug: bool = False,
 ) -> StateVectorList[_AX0Inv, _B0Inv]:
     """
     Given an initial state, use the stochastic schrodinger equation to solve the dynamics of the system.
@@ -87,26 +100,30 @@ def solve_schrodinger_equation_decomposition(
     initial_state : StateVector[_B0Inv]
     times : np.ndarray[tuple[int], np.dtype[np.float_]]
     hamiltonian : SingleBasisOperator[_B0Inv]
-    collapse_operators : list[SingleBasisOperator[_B0Inv]]
+    debug : bool, optional
+        check the hamiltonian is hermitian, and the decomposition is complete,
+        by default False
 
     Returns
     -------
     StateVectorList[_B0Inv, _L0Inv]
     """
     eigenstates = calculate_eigenvectors_hermitian(hamiltonian)
-    np.testing.assert_array_almost_equal(
-        hamiltonian["data"].reshape(hamiltonian["basis"].shape),
-        np.conj(hamiltonian["data"].reshape(hamiltonian["basis"].shape)).T,
-    )
+    if debug:
+        np.testing.assert_array_almost_equal(
+            hamiltonian["data"].reshape(hamiltonian["basis"].shape),
+            np.conj(hamiltonian["data"].reshape(hamiltonian["basis"].shape)).T,
+        )
     coefficients = get_state_vector_decomposition(initial_state, eigenstates)
-    np.testing.assert_array_almost_equal(
-        np.tensordot(
-            coefficients["data"],
-            eigenstates["data"].reshape(eigenstates["basis"].shape),
-            axes=(0, 0),
-        ),
-        initial_state["data"],
-    )
+    if debug:
+        np.testing.assert_array_almost_equal(
+            np.tensordot(
+                coefficients["data"],
+                eigenstates["data"].reshape(eigenstates["basis"].shape),
+                axes=(0, 0),
+            ),
+            initial_state["data"],
+        )
     constants = coefficients["data"][np.newaxis, :] * np.exp(
         -1j
         * eigenstates["eigenvalue"][np.newaxis, :]
@@ -147,6 +164,151 @@ def solve_schrodinger_equation_diagonal(
     return {"basis": TupleBasis(times, hamiltonian["basis"][0]), "data": data}
 
 
+def _get_scaled_generator(
+    hamiltonian: SingleBasisOperator[Any]
+    | scipy.sparse.sparray
+    | scipy.sparse.spmatrix
+    | scipy.sparse.linalg.LinearOperator,
+) -> scipy.sparse.csr_matrix | scipy.sparse.linalg.LinearOperator:
+    """
+    Get the generator -iH / hbar of the evolution, without densifying the hamiltonian.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix | scipy.sparse.linalg.LinearOperator
+    """
+    if isinstance(hamiltonian, scipy.sparse.linalg.LinearOperator):
+        return hamiltonian * (-1j / hbar)
+    if isinstance(hamiltonian, dict):
+        hamiltonian = scipy.sparse.csr_matrix(
+            hamiltonian["data"].reshape(hamiltonian["basis"].shape)
+        )
+    return scipy.sparse.csr_matrix(hamiltonian, dtype=np.complex128) * (-1j / hbar)
+
+
+def solve_schrodinger_equation_krylov(
+    initial_state: StateVector[_B0Inv],
+    times: _AX0Inv,
+    hamiltonian: SingleBasisOperator[_B0Inv]
+    | scipy.sparse.sparray
+    | scipy.sparse.spmatrix
+    | scipy.sparse.linalg.LinearOperator,
+    *,
+    debug: bool = False,
+) -> StateVectorList[_AX0Inv, _B0Inv]:
+    """
+    Given an initial state, use the schrodinger equation to solve the dynamics of the system.
+
+    Rather than diagonalizing the hamiltonian, this computes the action
+    of exp(-iHt / hbar) on the initial state directly using expm_multiply,
+    so each time step costs O(nnz m) for a hamiltonian with nnz non-zero elements.
+    The hamiltonian may also be given as a sparse matrix, or a matrix free
+    LinearOperator in the basis of the initial state.
+
+    Parameters
+    ----------
+    initial_state : StateVector[_B0Inv]
+    times : _AX0Inv
+    hamiltonian : SingleBasisOperator[_B0Inv] | scipy.sparse.sparray | scipy.sparse.spmatrix | scipy.sparse.linalg.LinearOperator
+    debug : bool, optional
+        check the hamiltonian is hermitian, by default False
+
+    Returns
+    -------
+    StateVectorList[_AX0Inv, _B0Inv]
+    """
+    generator = _get_scaled_generator(hamiltonian)
+    if debug and not isinstance(generator, scipy.sparse.linalg.LinearOperator):
+        np.testing.assert_array_almost_equal(
+            (generator + generator.conj().T).toarray(), 0
+        )
+
+    # expm_multiply shifts the generator by its trace, which greatly reduces the
+    # number of steps for a hamiltonian with a large constant offset. The trace
+    # of a LinearOperator can only be estimated, so it is not shifted.
+    trace = (
+        0
+        if isinstance(generator, scipy.sparse.linalg.LinearOperator)
+        else generator.trace()
+    )
+    t = times.times
+    initial = initial_state["data"].astype(np.complex128)
+    # Propagate to the first time, then out to the remaining (evenly spaced) times.
+    start = scipy.sparse.linalg.expm_multiply(
+        generator * t[0], initial, traceA=trace * t[0]
+    )
+    data = (
+        start[np.newaxis, :]
+        if times.n == 1
+        else scipy.sparse.linalg.expm_multiply(
+            generator,
+            start,
+            start=0,
+            stop=t[-1] - t[0],
+            num=times.n,
+            endpoint=True,
+            traceA=trace,
+        )
+    )
+    return {
+        "basis": TupleBasis(times, initial_state["basis"]),
+        "data": np.asarray(data, dtype=np.complex128).reshape(-1),
+    }
+
+
+def solve_schrodinger_equation_split_operator(
+    initial_state: StateVector[Any],
+    times: _AX0Inv,
+    potential: Potential[Any],
+    mass: float,
+    *,
+    bloch_fraction: np.ndarray[tuple[int], np.dtype[np.float64]] | None = None,
+) -> StateVectorList[
+    _AX0Inv,
+    TupleBasisWithLengthLike[*tuple[FundamentalPositionBasis[Any, Any], ...]],
+]:
+    """
+    Given an initial state, use the schrodinger equation to solve the dynamics of a particle in a potential.
+
+    The hamiltonian T(k) + V(x) is never built, instead each fundamental
+    time step is taken using a Strang splitting, which costs O(N log N) for
+    a grid of N points.
+
+    As for every solver in this module, the states are found at times.times.
+    The first time is reached using times.offset steps of times.fundamental_dt,
+    and each interval between times is split into times.step steps.
+
+    Parameters
+    ----------
+    initial_state : StateVector[Any]
+    times : _AX0Inv
+    potential : Potential[Any]
+    mass : float
+    bloch_fraction : np.ndarray[tuple[int], np.dtype[np.float64]] | None, optional
+        bloch phase, by default None
+
+    Returns
+    -------
+    StateVectorList[_AX0Inv, TupleBasisWithLengthLike[*tuple[FundamentalPositionBasis[Any, Any], ...]]]
+        The states in the fundamental position basis of the potential
+    """
+    system = get_split_operator_system(potential, mass, bloch_fraction)
+    converted = convert_state_vector_to_basis(initial_state, system.basis)
+
+    states = propagate_split_operator(
+        system.get_phases(times.fundamental_dt),
+        converted["data"].reshape(1, -1),
+        times.offset,
+    )
+    phases = system.get_phases(get_split_operator_dt(times))
+    data = np.empty((times.n, states.size), dtype=np.complex128)
+    data[0] = states
+    for i in range(1, times.n):
+        states = propagate_split_operator(phases, states, times.step)
+        data[i] = states
+    return {"basis": TupleBasis(times, system.basis), "data": data.reshape(-1)}
+
+
 def solve_schrodinger_equation(
     initial_state: StateVector[_B0Inv],
     times: _AX0Inv,
@@ -0,0 +1,780 @@
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Literal
+
+import numpy as np
+
+from surface_potential_analysis.dynamics.stochastic_schrodinger._operators import (
+    BandedOperator,
+    BraKetOperator,
+    OperatorRepresentation,
+    as_operator_representation,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+
+SSEMethod = Literal["Euler", "Milstein", "Order2ExplicitWeak"]
+
+
+@dataclass
+class SimulationConfig:
+    """
+    Configuration of a SSE simulation, matching sse_solver_py.SimulationConfig.
+
+    The simulation stores n states, separated by step integration
+    steps each of length dt.
+
+    If tolerance is set, each step is checked using step doubling, and
+    repeatedly halved down to min_dt until the relative difference
+    between a single step and two half steps is below tolerance.
+    Only the trajectories which fail this check are halved.
+    """
+
+    n: int
+    step: int
+    dt: float
+    n_trajectories: int = 1
+    method: SSEMethod = "Euler"
+    tolerance: float | None = None
+    min_dt: float | None = None
+
+
+@dataclass
+class SSEStepStatistics:
+    """
+    Statistics of the steps taken during a SSE simulation.
+
+    Steps are counted per trajectory, as each trajectory in a batch
+    is accepted or rejected separately. The time of a batch step is
+    shared equally between its trajectories.
+    """
+
+    n_accepted: int = 0
+    n_rejected: int = 0
+    accepted_time: float = 0.0
+    rejected_time: float = 0.0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def record(self, *, accepted: bool, elapsed: float, n: int = 1) -> None:
+        """Record n trajectory steps which took elapsed seconds in total."""
+        with self._lock:
+            if accepted:
+                self.n_accepted += n
+                self.accepted_time += elapsed
+            else:
+                self.n_rejected += n
+                self.rejected_time += elapsed
+
+    @property
+    def mean_accepted_time(self) -> float:
+        """The average time taken by an accepted step."""
+        return self.accepted_time / max(self.n_accepted, 1)
+
+    @property
+    def mean_rejected_time(self) -> float:
+        """The average time taken by a rejected step."""
+        return self.rejected_time / max(self.n_rejected, 1)
+
+
+@dataclass
+class SSESystem:
+    """
+    A system of operators, in units such that hbar = 1.
+
+    The state evolves according to the quantum state diffusion
+    unravelling of the lindblad equation
+
+    d psi = -i H psi dt
+        + sum_k (<L_k^dagger> L_k - L_k^dagger L_k / 2 - |<L_k>|^2 / 2) psi dt
+        + sum_k (L_k - <L_k>) psi dW_k
+
+    where dW_k are independent complex wiener increments.
+    """
+
+    hamiltonian: OperatorRepresentation
+    operators: list[OperatorRepresentation] = field(default_factory=list)
+
+
+def _get_expectation(
+    states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    applied: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+) -> np.ndarray[tuple[int], np.dtype[np.complex128]]:
+    norm = np.sum(np.square(np.abs(states)), axis=-1)
+    return np.sum(np.conj(states) * applied, axis=-1) / norm  # type: ignore[no-any-return]
+
+
+def get_noise(
+    rng: np.random.Generator, n_operators: int, n_trajectories: int, dt: float
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    """
+    Get the complex wiener increments dW of a step of length dt.
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        Noise with shape (n_operators, n_trajectories)
+    """
+    shape = (n_operators, n_trajectories)
+    return np.sqrt(dt / 2) * (
+        rng.standard_normal(shape) + 1j * rng.standard_normal(shape)
+    )
+
+
+def _get_drift(
+    system: SSESystem, states: np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    out = -1j * system.hamiltonian.apply(states)
+    for operator in system.operators:
+        applied = operator.apply(states)
+        expectation = _get_expectation(states, applied)[:, np.newaxis]
+        out += (
+            np.conj(expectation) * applied
+            - 0.5 * operator.apply_adjoint(applied)
+            - 0.5 * np.square(np.abs(expectation)) * states
+        )
+    return out
+
+
+def _get_diffusion(
+    operator: OperatorRepresentation,
+    states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    applied = operator.apply(states)
+    return applied - _get_expectation(states, applied)[:, np.newaxis] * states
+
+
+def _get_two_point_noise(
+    rng: np.random.Generator, n_channels: int, n_trajectories: int, dt: float
+) -> np.ndarray[tuple[int, int, int], np.dtype[np.float64]]:
+    # The variables V_{j1,j2} of Kloeden and Platen (14.2.8), which take the values
+    # +-dt for j2 < j1, with V_{j1,j1} = -dt and V_{j1,j2} = -V_{j2,j1}
+    v = dt * rng.choice([-1.0, 1.0], size=(n_channels, n_channels, n_trajectories))
+    v = np.tril(v.transpose(2, 0, 1), k=-1)
+    v -= v.transpose(0, 2, 1)
+    v -= dt * np.eye(n_channels)
+    return v.transpose(1, 2, 0)
+
+
+def _weak_order_2_step(
+    system: SSESystem,
+    states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    dt: float,
+    dw: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    rng: np.random.Generator,
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    # The complex noise (dW_r + i dW_i) / sqrt(2) of each operator is
+    # treated as two real channels, with diffusion b / sqrt(2) and i b / sqrt(2).
+    # We use the explicit weak order 2 scheme of Kloeden and Platen (15.1.3),
+    # including the cross terms between channels, as the noise is not commutative.
+    sqrt_dt = np.sqrt(dt)
+    factors = (1 / np.sqrt(2), 1j / np.sqrt(2))
+    noise = np.sqrt(2) * np.stack([np.real(dw), np.imag(dw)], axis=1).reshape(
+        -1, dw.shape[1]
+    )
+    b = [
+        factor * _get_diffusion(operator, states)
+        for operator in system.operators
+        for factor in factors
+    ]
+    v = _get_two_point_noise(rng, len(b), states.shape[0], dt)
+
+    drift = _get_drift(system, states)
+    predictor = states + drift * dt
+    supporting = predictor + sum(
+        (b_j * w_j[:, np.newaxis] for (b_j, w_j) in zip(b, noise, strict=True)),
+        start=np.zeros_like(states),
+    )
+    out = states + 0.5 * (_get_drift(system, supporting) + drift) * dt
+    for j, (b_j, w_j) in enumerate(zip(b, noise, strict=True)):
+        operator = system.operators[j // 2]
+        b_plus = factors[j % 2] * _get_diffusion(operator, predictor + b_j * sqrt_dt)
+        b_minus = factors[j % 2] * _get_diffusion(operator, predictor - b_j * sqrt_dt)
+        out += 0.25 * (b_plus + b_minus + 2 * b_j) * w_j[:, np.newaxis]
+        out += (
+            0.25 * (b_plus - b_minus) * ((np.square(w_j) - dt) / sqrt_dt)[:, np.newaxis]
+        )
+
+    # The cross terms use the diffusion of each channel j,
+    # evaluated at the states shifted along every other channel r
+    for r, (b_r, w_r) in enumerate(zip(b, noise, strict=True)):
+        for sign in (1, -1):
+            shifted = states + sign * b_r * sqrt_dt
+            diffusion = [_get_diffusion(o, shifted) for o in system.operators]
+            for j, (b_j, w_j) in enumerate(zip(b, noise, strict=True)):
+                if j == r:
+                    continue
+                b_shifted = factors[j % 2] * diffusion[j // 2]
+                out += 0.25 * (b_shifted - b_j) * w_j[:, np.newaxis]
+                out += (
+                    0.25
+                    * sign
+                    * b_shifted
+                    * ((w_j * w_r + v[r, j]) / sqrt_dt)[:, np.newaxis]
+                )
+    return out
+
+
+def sse_step(  # noqa: PLR0913
+    system: SSESystem,
+    states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    dt: float,
+    dw: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    *,
+    method: SSEMethod = "Euler",
+    rng: np.random.Generator | None = None,
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    """
+    Take a single step of the SSE for a batch of states.
+
+    The Milstein correction neglects the cross terms between
+    different operators, and the derivative of the expectation <L_k>.
+    Order2ExplicitWeak includes the cross terms, so is weak order 2
+    for any operators, at a cost of O(n_operators**2) evaluations of
+    the diffusion per step.
+
+    Parameters
+    ----------
+    system : SSESystem
+    states : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        States with shape (n_trajectories, n)
+    dt : float
+    dw : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        Noise with shape (n_operators, n_trajectories)
+    method : SSEMethod, optional
+        method, by default "Euler"
+    rng : np.random.Generator | None, optional
+        source of the additional noise of Order2ExplicitWeak, by default None
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    """
+    if method == "Order2ExplicitWeak":
+        rng = np.random.default_rng() if rng is None else rng
+        return _weak_order_2_step(system, states, dt, dw, rng)
+    out = states - 1j * dt * system.hamiltonian.apply(states)
+    for operator, noise in zip(system.operators, dw, strict=True):
+        applied = operator.apply(states)
+        expectation = _get_expectation(states, applied)[:, np.newaxis]
+        out += dt * (
+            np.conj(expectation) * applied
+            - 0.5 * operator.apply_adjoint(applied)
+            - 0.5 * np.square(np.abs(expectation)) * states
+        )
+        diffusion = applied - expectation * states
+        out += noise[:, np.newaxis] * diffusion
+        if method == "Milstein":
+            out += (
+                0.5
+                * np.square(noise)[:, np.newaxis]
+                * (operator.apply(diffusion) - expectation * diffusion)
+            )
+    return out
+
+
+def _get_bridge_noise(
+    rng: np.random.Generator,
+    dw: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    dt: float,
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    # Sample the noise over the first half of a step, given the noise dw over dt
+    return dw / 2 + get_noise(rng, *dw.shape, dt / 4)
+
+
+def _adaptive_step(  # noqa: PLR0913
+    system: SSESystem,
+    states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    dt: float,
+    dw: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    *,
+    config: SimulationConfig,
+    rng: np.random.Generator,
+    statistics: SSEStepStatistics | None,
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    assert config.tolerance is not None
+    min_dt = config.dt / 2**12 if config.min_dt is None else config.min_dt
+    start = time.perf_counter()
+
+    full = sse_step(system, states, dt, dw, method=config.method, rng=rng)
+    # The noise of each half step is sampled from a brownian bridge,
+    # so the path is unchanged if the step is rejected.
+    dw_0 = _get_bridge_noise(rng, dw, dt)
+    dw_1 = dw - dw_0
+    half = sse_step(system, states, dt / 2, dw_0, method=config.method, rng=rng)
+    half = sse_step(system, half, dt / 2, dw_1, method=config.method, rng=rng)
+
+    error = np.linalg.norm(full - half, axis=-1) / np.linalg.norm(half, axis=-1)
+    # Each trajectory is accepted or rejected separately,
+    # so a single stiff trajectory does not slow down the rest
+    rejected = np.logical_and(error > config.tolerance, dt / 2 > min_dt)
+    n_rejected = int(np.count_nonzero(rejected))
+    if statistics is not None:
+        elapsed = time.perf_counter() - start
+        n_accepted = rejected.size - n_rejected
+        statistics.record(
+            accepted=True, elapsed=elapsed * n_accepted / rejected.size, n=n_accepted
+        )
+        statistics.record(
+            accepted=False, elapsed=elapsed * n_rejected / rejected.size, n=n_rejected
+        )
+    if n_rejected == 0:
+        return half
+
+    dw_0 = dw_0[:, rejected]
+    dw_1 = dw_1[:, rejected]
+    retried = _adaptive_step(
+        system,
+        states[rejected],
+        dt / 2,
+        dw_0,
+        config=config,
+        rng=rng,
+        statistics=statistics,
+    )
+    half[rejected] = _adaptive_step(
+        system, retried, dt / 2, dw_1, config=config, rng=rng, statistics=statistics
+    )
+    return half
+
+
+def _step(  # noqa: PLR0913
+    system: SSESystem,
+    states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    dw: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    *,
+    config: SimulationConfig,
+    rng: np.random.Generator,
+    statistics: SSEStepStatistics | None,
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    if config.tolerance is not None:
+        return _adaptive_step(
+            system, states, config.dt, dw, config=config, rng=rng, statistics=statistics
+        )
+    if statistics is None:
+        return sse_step(system, states, config.dt, dw, method=config.method, rng=rng)
+    start = time.perf_counter()
+    out = sse_step(system, states, config.dt, dw, method=config.method, rng=rng)
+    statistics.record(
+        accepted=True, elapsed=time.perf_counter() - start, n=states.shape[0]
+    )
+    return out
+
+
+def iter_sse(
+    system: SSESystem,
+    initial_states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    config: SimulationConfig,
+    *,
+    rng: np.random.Generator | None = None,
+    statistics: SSEStepStatistics | None = None,
+) -> Iterator[np.ndarray[tuple[int, int], np.dtype[np.complex128]]]:
+    """
+    Integrate the SSE, yielding the states of every trajectory at each saved time.
+
+    Only the current states are held in memory, so the results can be reduced
+    or written to disk as they are produced.
+
+    Parameters
+    ----------
+    system : SSESystem
+    initial_states : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        Initial state of each trajectory, with shape (n_trajectories, n)
+    config : SimulationConfig
+    rng : np.random.Generator | None, optional
+        source of noise, by default None
+    statistics : SSEStepStatistics | None, optional
+        used to record the number and duration of accepted and rejected steps
+
+    Yields
+    ------
+    Iterator[np.ndarray[tuple[int, int], np.dtype[np.complex128]]]
+        The states with shape (n_trajectories, n), for each of the config.n times
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    states = np.array(initial_states, dtype=np.complex128)
+    n_trajectories = states.shape[0]
+    if config.n == 0:
+        return
+
+    yield states
+    for _ in range(1, config.n):
+        for _ in range(config.step):
+            dw = get_noise(rng, len(system.operators), n_trajectories, config.dt)
+            states = _step(
+                system, states, dw, config=config, rng=rng, statistics=statistics
+            )
+        yield states
+
+
+def integrate_sse(  # noqa: PLR0913
+    system: SSESystem,
+    initial_states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    config: SimulationConfig,
+    *,
+    rng: np.random.Generator | None = None,
+    statistics: SSEStepStatistics | None = None,
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None = None,
+) -> np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]:
+    """
+    Integrate the SSE, advancing all trajectories as a single batch.
+
+    Parameters
+    ----------
+    system : SSESystem
+    initial_states : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        Initial state of each trajectory, with shape (n_trajectories, n)
+    config : SimulationConfig
+    rng : np.random.Generator | None, optional
+        source of noise, by default None
+    statistics : SSEStepStatistics | None, optional
+        used to record the number and duration of accepted and rejected steps
+    out : np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None, optional
+        array to store the result in, with shape (n_trajectories, config.n, n)
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]
+        The states with shape (n_trajectories, config.n, n)
+    """
+    n_trajectories, n_states = np.shape(initial_states)
+    out = (
+        np.empty((n_trajectories, config.n, n_states), dtype=np.complex128)
+        if out is None
+        else out
+    )
+    for i, states in enumerate(
+        iter_sse(system, initial_states, config, rng=rng, statistics=statistics)
+    ):
+        out[:, i] = states
+    return out
+
+
+def select_localized_states(
+    states: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]],
+    rng: np.random.Generator,
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    """
+    Select a random localized state for each set of realizations.
+
+    For each trajectory, this finds the combinations of realizations which
+    diagonalize the overlap matrix, and selects a combination according
+    to its relative occupation. The small eigenvalue problems of all
+    trajectories are solved as a single batch.
+
+    Parameters
+    ----------
+    states : np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]
+        States with shape (n_trajectories, n_realizations, n)
+    rng : np.random.Generator
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        The selected states, with shape (n_trajectories, n)
+    """
+    overlap = np.einsum("tik,tjk->tij", np.conj(states), states)
+    overlap /= np.linalg.norm(overlap, axis=(1, 2), keepdims=True)
+    eigenvalues, eigenvectors = np.linalg.eigh(overlap)
+
+    probabilities = np.clip(eigenvalues, 0, None)
+    probabilities /= np.sum(probabilities, axis=1, keepdims=True)
+    idx = np.argmax(
+        np.cumsum(probabilities, axis=1) > rng.random((states.shape[0], 1)), axis=1
+    )
+    transformation = eigenvectors[np.arange(states.shape[0]), :, idx] / np.sqrt(2)
+    return np.einsum("ti,tik->tk", transformation, states)  # type: ignore[no-any-return]
+
+
+def integrate_localized_sse(  # noqa: PLR0913
+    system: SSESystem,
+    initial_states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    config: SimulationConfig,
+    *,
+    n_realizations: int = 2,
+    rng: np.random.Generator | None = None,
+    statistics: SSEStepStatistics | None = None,
+) -> np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]:
+    """
+    Integrate the localized SSE, advancing all realizations of all trajectories as a batch.
+
+    Each trajectory is split into n_realizations, which are integrated for
+    config.step steps. The realizations are then re-localized into a single
+    state using select_localized_states, which is stored.
+
+    Parameters
+    ----------
+    system : SSESystem
+    initial_states : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        Initial state of each trajectory, with shape (n_trajectories, n)
+    config : SimulationConfig
+    n_realizations : int, optional
+        number of realizations of each trajectory, by default 2
+    rng : np.random.Generator | None, optional
+        source of noise, by default None
+    statistics : SSEStepStatistics | None, optional
+        used to record the number and duration of accepted and rejected steps
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]
+        The localized states with shape (n_trajectories, config.n, n)
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    n_trajectories, n_states = np.shape(initial_states)
+    out = np.empty((n_trajectories, config.n, n_states), dtype=np.complex128)
+
+    states = np.asarray(initial_states, dtype=np.complex128)
+    for t in range(config.n):
+        realizations = np.repeat(states, n_realizations, axis=0)
+        for _ in range(config.step):
+            dw = get_noise(rng, len(system.operators), realizations.shape[0], config.dt)
+            realizations = _step(
+                system,
+                realizations,
+                dw,
+                config=config,
+                rng=rng,
+                statistics=statistics,
+            )
+        states = select_localized_states(
+            realizations.reshape(n_trajectories, n_realizations, n_states), rng
+        )
+        out[:, t] = states
+    return out
+
+
+class OperatorObservable:
+    """
+    The expectation <psi|O|psi> of an operator.
+
+    An operator given as a one dimensional array is taken to be diagonal.
+    As for calculate_expectation_list the states are not normalized.
+    """
+
+    def __init__(
+        self,
+        operator: OperatorRepresentation | np.ndarray[Any, np.dtype[Any]] | Any,  # noqa: ANN401
+    ) -> None:
+        self.operator = (
+            BandedOperator([operator], [0])
+            if np.ndim(operator) == 1
+            else as_operator_representation(operator)
+        )
+
+    @property
+    def n_values(self) -> int:
+        return 1
+
+    def evaluate(
+        self, states: np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    ) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+        applied = self.operator.apply(states)
+        return np.sum(np.conj(states) * applied, axis=-1)[:, np.newaxis]  # type: ignore[no-any-return]
+
+
+class ProjectionObservable:
+    """
+    The occupation |<phi_m|psi>|^2 of each of a set of states phi_m.
+
+    As for calculate_expectation_list the states are not normalized.
+    """
+
+    def __init__(
+        self, projections: np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    ) -> None:
+        self.projections = np.asarray(projections, dtype=np.complex128)
+
+    @property
+    def n_values(self) -> int:
+        return self.projections.shape[0]
+
+    def evaluate(
+        self, states: np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    ) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+        overlap = states @ np.conj(self.projections).T
+        return np.square(np.abs(overlap)).astype(np.complex128)
+
+
+Observable = OperatorObservable | ProjectionObservable
+
+
+def integrate_sse_observables(  # noqa: PLR0913
+    system: SSESystem,
+    initial_states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    config: SimulationConfig,
+    observables: Sequence[Observable],
+    *,
+    rng: np.random.Generator | None = None,
+    statistics: SSEStepStatistics | None = None,
+) -> list[np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]]:
+    """
+    Integrate the SSE, storing only the expectation of each observable.
+
+    The states are discarded after each time is processed, so the storage
+    required is n_values rather than n for each trajectory and time.
+
+    Parameters
+    ----------
+    system : SSESystem
+    initial_states : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        Initial state of each trajectory, with shape (n_trajectories, n)
+    config : SimulationConfig
+    observables : Sequence[Observable]
+    rng : np.random.Generator | None, optional
+        source of noise, by default None
+    statistics : SSEStepStatistics | None, optional
+        used to record the number and duration of accepted and rejected steps
+
+    Returns
+    -------
+    list[np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]]
+        The expectation of each observable, with shape
+        (n_trajectories, config.n, observable.n_values)
+    """
+    n_trajectories = np.shape(initial_states)[0]
+    out = [
+        np.empty((n_trajectories, config.n, o.n_values), dtype=np.complex128)
+        for o in observables
+    ]
+    for i, states in enumerate(
+        iter_sse(system, initial_states, config, rng=rng, statistics=statistics)
+    ):
+        for observable, values in zip(observables, out, strict=True):
+            values[:, i] = observable.evaluate(states)
+    return out
+
+
+def solve_sse(  # noqa: PLR0913
+    initial_state: np.ndarray[tuple[int], np.dtype[np.complex128]] | Sequence[complex],
+    hamiltonian: np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    | Sequence[Sequence[complex]],
+    operators: Sequence[Any],
+    config: SimulationConfig,
+    *,
+    rng: np.random.Generator | None = None,
+    statistics: SSEStepStatistics | None = None,
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None = None,
+) -> np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]:
+    """
+    Solve the SSE, given the hamiltonian and operators as dense matrices.
+
+    Equivalent to sse_solver_py.solve_sse. If out is provided, the states
+    are written into out, which must have shape (n_trajectories, n, n_states).
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]
+    """
+    system = SSESystem(
+        as_operator_representation(np.asarray(hamiltonian, dtype=np.complex128)),
+        [
+            as_operator_representation(np.asarray(o, dtype=np.complex128))
+            for o in operators
+        ],
+    )
+    initial = np.asarray(initial_state, dtype=np.complex128)
+    return integrate_sse(
+        system,
+        np.tile(initial, (config.n_trajectories, 1)),
+        config,
+        rng=rng,
+        out=out,
+        statistics=statistics,
+    )
+
+
+def solve_sse_banded(  # noqa: PLR0913, PLR0917
+    initial_state: np.ndarray[tuple[int], np.dtype[np.complex128]] | Sequence[complex],
+    hamiltonian_diagonal: Any,  # noqa: ANN401
+    hamiltonian_offset: Sequence[int],
+    operators_diagonals: Sequence[Any],
+    operators_offsets: Sequence[Sequence[int]],
+    config: SimulationConfig,
+    *,
+    rng: np.random.Generator | None = None,
+    statistics: SSEStepStatistics | None = None,
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None = None,
+) -> np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]:
+    """
+    Solve the SSE, given the hamiltonian and operators as banded matrices.
+
+    Equivalent to sse_solver_py.solve_sse_banded. If out is provided, the states
+    are written into out, which must have shape (n_trajectories, n, n_states).
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]
+    """
+    system = SSESystem(
+        BandedOperator(hamiltonian_diagonal, hamiltonian_offset),
+        list(
+            itertools.starmap(
+                BandedOperator,
+                zip(operators_diagonals, operators_offsets, strict=True),
+            )
+        ),
+    )
+    initial = np.asarray(initial_state, dtype=np.complex128)
+    return integrate_sse(
+        system,
+        np.tile(initial, (config.n_trajectories, 1)),
+        config,
+        rng=rng,
+        out=out,
+        statistics=statistics,
+    )
+
+
+def solve_sse_euler_bra_ket(  # noqa: PLR0913, PLR0917
+    initial_state: np.ndarray[tuple[int], np.dtype[np.complex128]] | Sequence[complex],
+    hamiltonian: np.ndarray[Any, np.dtype[np.complex128]] | Sequence[complex],
+    amplitudes: np.ndarray[tuple[int], np.dtype[np.complex128]] | Sequence[complex],
+    bra: np.ndarray[Any, np.dtype[np.complex128]] | Sequence[complex],
+    ket: np.ndarray[Any, np.dtype[np.complex128]] | Sequence[complex],
+    n: int,
+    step: int,
+    dt: float,
+    *,
+    n_trajectories: int = 1,
+    rng: np.random.Generator | None = None,
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None = None,
+) -> np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]:
+    """
+    Solve the SSE, given operators of the form amplitudes[k] |ket[k]><bra[k]|.
+
+    Equivalent to sse_solver_py.solve_sse_euler_bra_ket, but all
+    n_trajectories are integrated together. bra and ket are packed
+    with shape (n_operators, n_states).
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]
+        The states with shape (n_trajectories, n, n_states)
+    """
+    initial = np.asarray(initial_state, dtype=np.complex128)
+    n_states = initial.size
+    amplitudes = np.asarray(amplitudes, dtype=np.complex128).reshape(-1)
+    bras = np.asarray(bra, dtype=np.complex128).reshape(amplitudes.size, n_states)
+    kets = np.asarray(ket, dtype=np.complex128).reshape(amplitudes.size, n_states)
+    system = SSESystem(
+        as_operator_representation(
+            np.asarray(hamiltonian, dtype=np.complex128).reshape(n_states, n_states)
+        ),
+        list(
+            itertools.starmap(BraKetOperator, zip(amplitudes, bras, kets, strict=True))
+        ),
+    )
+    return integrate_sse(
+        system,
+        np.tile(initial, (n_trajectories, 1)),
+        SimulationConfig(n=n, step=step, dt=dt, n_trajectories=n_trajectories),
+        rng=rng,
+        out=out,
+    )
@@ -0,0 +1,419 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Literal, Protocol, TypeVar
+
+import numpy as np
+import scipy.sparse
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+_S0Inv = TypeVar("_S0Inv", bound=tuple[int, ...])
+
+
+class OperatorRepresentation(Protocol):
+    """An operator which can be applied to a batch of states."""
+
+    @property
+    def n(self) -> int:
+        """The size of the vectors the operator acts on."""
+        ...
+
+    def apply(
+        self, states: np.ndarray[_S0Inv, np.dtype[np.complex128]]
+    ) -> np.ndarray[_S0Inv, np.dtype[np.complex128]]:
+        """Apply the operator to states, acting along the last axis."""
+        ...
+
+    def apply_adjoint(
+        self, states: np.ndarray[_S0Inv, np.dtype[np.complex128]]
+    ) -> np.ndarray[_S0Inv, np.dtype[np.complex128]]:
+        """Apply the adjoint of the operator to states, acting along the last axis."""
+        ...
+
+
+class BandedOperator:
+    """
+    An operator stored as a list of wrapped diagonals.
+
+    The diagonal with offset o is defined such that
+    diagonals[i][j] = operator[(j + offsets[i]) % n, j].
+    """
+
+    def __init__(
+        self,
+        diagonals: np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+        | Sequence[Sequence[complex]],
+        offsets: np.ndarray[tuple[int], np.dtype[np.int_]] | Sequence[int],
+    ) -> None:
+        self.offsets = np.asarray(offsets, dtype=np.int_).reshape(-1)
+        self.diagonals = (
+            np.asarray(diagonals, dtype=np.complex128).reshape(self.offsets.size, -1)
+            if self.offsets.size > 0
+            else np.zeros((0, 0), dtype=np.complex128)
+        )
+
+    @property
+    def n(self) -> int:
+        return self.diagonals.shape[1]
+
+    def apply(
+        self, states: np.ndarray[_S0Inv, np.dtype[np.complex128]]
+    ) -> np.ndarray[_S0Inv, np.dtype[np.complex128]]:
+        out = np.zeros_like(states, dtype=np.complex128)
+        for diagonal, offset in zip(self.diagonals, self.offsets, strict=True):
+            out += np.roll(diagonal * states, offset, axis=-1)
+        return out  # type: ignore[no-any-return]
+
+    def apply_adjoint(
+        self, states: np.ndarray[_S0Inv, np.dtype[np.complex128]]
+    ) -> np.ndarray[_S0Inv, np.dtype[np.complex128]]:
+        out = np.zeros_like(states, dtype=np.complex128)
+        for diagonal, offset in zip(self.diagonals, self.offsets, strict=True):
+            out += np.conj(diagonal) * np.roll(states, -offset, axis=-1)
+        return out  # type: ignore[no-any-return]
+
+
+class SparseOperator:
+    """An operator stored as a sparse CSR matrix."""
+
+    def __init__(
+        self,
+        matrix: scipy.sparse.sparray
+        | scipy.sparse.spmatrix
+        | np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    ) -> None:
+        self.matrix = scipy.sparse.csr_array(matrix, dtype=np.complex128)
+        self._adjoint = scipy.sparse.csr_array(self.matrix.conj().T)
+
+    @property
+    def n(self) -> int:
+        return self.matrix.shape[1]
+
+    @staticmethod
+    def _apply_matrix(
+        matrix: scipy.sparse.csr_array,
+        states: np.ndarray[_S0Inv, np.dtype[np.complex128]],
+    ) -> np.ndarray[_S0Inv, np.dtype[np.complex128]]:
+        flat = states.reshape(-1, states.shape[-1])
+        return (matrix @ flat.T).T.reshape(states.shape)  # type: ignore[no-any-return]
+
+    def apply(
+        self, states: np.ndarray[_S0Inv, np.dtype[np.complex128]]
+    ) -> np.ndarray[_S0Inv, np.dtype[np.complex128]]:
+        return self._apply_matrix(self.matrix, states)
+
+    def apply_adjoint(
+        self, states: np.ndarray[_S0Inv, np.dtype[np.complex128]]
+    ) -> np.ndarray[_S0Inv, np.dtype[np.complex128]]:
+        return self._apply_matrix(self._adjoint, states)
+
+
+class DenseOperator:
+    """An operator stored as a dense matrix."""
+
+    def __init__(
+        self, matrix: np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    ) -> None:
+        self.matrix = np.asarray(matrix, dtype=np.complex128)
+
+    @property
+    def n(self) -> int:
+        return self.matrix.shape[1]
+
+    def apply(
+        self, states: np.ndarray[_S0Inv, np.dtype[np.complex128]]
+    ) -> np.ndarray[_S0Inv, np.dtype[np.complex128]]:
+        return states @ self.matrix.T  # type: ignore[no-any-return]
+
+    def apply_adjoint(
+        self, states: np.ndarray[_S0Inv, np.dtype[np.complex128]]
+    ) -> np.ndarray[_S0Inv, np.dtype[np.complex128]]:
+        return states @ np.conj(self.matrix)  # type: ignore[no-any-return]
+
+
+class BraKetOperator:
+    """
+    A sum of rank one operators, sum_k amplitudes[k] |kets[k]><bras[k]|.
+
+    bras are stored as dual vectors, so <bras[k]|psi> = sum_i bras[k, i] psi_i.
+    """
+
+    def __init__(
+        self,
+        amplitudes: np.ndarray[tuple[int], np.dtype[np.complex128]] | Sequence[complex],
+        bras: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+        kets: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    ) -> None:
+        self.amplitudes = np.asarray(amplitudes, dtype=np.complex128).reshape(-1)
+        n_operators = self.amplitudes.size
+        self.bras = np.asarray(bras, dtype=np.complex128).reshape(n_operators, -1)
+        self.kets = np.asarray(kets, dtype=np.complex128).reshape(n_operators, -1)
+
+    @property
+    def n(self) -> int:
+        return self.kets.shape[1]
+
+    def apply(
+        self, states: np.ndarray[_S0Inv, np.dtype[np.complex128]]
+    ) -> np.ndarray[_S0Inv, np.dtype[np.complex128]]:
+        return (states @ self.bras.T * self.amplitudes) @ self.kets  # type: ignore[no-any-return]
+
+    def apply_adjoint(
+        self, states: np.ndarray[_S0Inv, np.dtype[np.complex128]]
+    ) -> np.ndarray[_S0Inv, np.dtype[np.complex128]]:
+        return (  # type: ignore[no-any-return]
+            states @ np.conj(self.kets).T * np.conj(self.amplitudes)
+        ) @ np.conj(self.bras)
+
+
+def get_operator_diagonals(
+    operator: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    """
+    Get the wrapped diagonals of an operator.
+
+    The diagonals are such that diagonals[i, j] = operator[(j + i) % n, j].
+    Stacking two copies of the operator, the diagonals are a strided view
+    into the stacked array, so this is O(n^2).
+
+    Parameters
+    ----------
+    operator : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+
+    Returns
+    -------
+    np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    """
+    n = operator.shape[0]
+    stacked = np.concatenate([operator, operator], axis=0)
+    row_stride, column_stride = stacked.strides
+    return np.lib.stride_tricks.as_strided(
+        stacked,
+        shape=(n, n),
+        strides=(row_stride, row_stride + column_stride),
+        writeable=False,
+    ).copy()
+
+
+def get_banded_operator(
+    operator: np.ndarray[tuple[int, int], np.dtype[np.complex128]], threshold: float
+) -> BandedOperator:
+    """
+    Get the banded representation of an operator.
+
+    Diagonals with a norm below threshold are discarded, and real or imaginary
+    parts of the remaining diagonals below threshold are set to zero.
+
+    Parameters
+    ----------
+    operator : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    threshold : float
+
+    Returns
+    -------
+    BandedOperator
+    """
+    diagonals = get_operator_diagonals(np.asarray(operator, dtype=np.complex128))
+    return _get_banded_operator_from_diagonals(diagonals, threshold)
+
+
+def _get_banded_operator_from_diagonals(
+    diagonals: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    threshold: float,
+    offsets: np.ndarray[tuple[int], np.dtype[np.int_]] | None = None,
+) -> BandedOperator:
+    offsets = np.arange(diagonals.shape[0]) if offsets is None else offsets
+    above_threshold = np.linalg.norm(diagonals, axis=1) > threshold
+
+    diagonals_filtered = diagonals[above_threshold]
+    real = np.real(diagonals_filtered)
+    imag = np.imag(diagonals_filtered)
+    real[np.abs(real) < threshold] = 0
+    imag[np.abs(imag) < threshold] = 0
+
+    return BandedOperator(real + 1j * imag, offsets[above_threshold])
+
+
+def _get_element_diagonals(
+    n: int,
+    rows: np.ndarray[tuple[int], np.dtype[np.int_]],
+    columns: np.ndarray[tuple[int], np.dtype[np.int_]],
+    values: np.ndarray[tuple[int], np.dtype[np.complex128]],
+) -> tuple[
+    np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    np.ndarray[tuple[int], np.dtype[np.int_]],
+]:
+    offsets, offset_idx = np.unique(np.mod(rows - columns, n), return_inverse=True)
+    diagonals = np.zeros((offsets.size, n), dtype=np.complex128)
+    np.add.at(diagonals, (offset_idx, columns), values)
+    return diagonals, offsets
+
+
+def get_banded_operator_from_elements(
+    n: int,
+    rows: np.ndarray[tuple[int], np.dtype[np.int_]],
+    columns: np.ndarray[tuple[int], np.dtype[np.int_]],
+    values: np.ndarray[tuple[int], np.dtype[np.complex128]],
+    threshold: float,
+) -> BandedOperator:
+    """
+    Get the banded representation of an n by n operator, given its non-zero elements.
+
+    Only the diagonals which contain an element are stored, so
+    the operator is never built as a dense matrix.
+
+    Parameters
+    ----------
+    n : int
+    rows : np.ndarray[tuple[int], np.dtype[np.int_]]
+    columns : np.ndarray[tuple[int], np.dtype[np.int_]]
+    values : np.ndarray[tuple[int], np.dtype[np.complex128]]
+    threshold : float
+
+    Returns
+    -------
+    BandedOperator
+    """
+    diagonals, offsets = _get_element_diagonals(n, rows, columns, values)
+    return _get_banded_operator_from_diagonals(diagonals, threshold, offsets)
+
+
+def get_element_representation(
+    n: int,
+    rows: np.ndarray[tuple[int], np.dtype[np.int_]],
+    columns: np.ndarray[tuple[int], np.dtype[np.int_]],
+    values: np.ndarray[tuple[int], np.dtype[np.complex128]],
+    threshold: float = 0,
+) -> BandedOperator | SparseOperator:
+    """
+    Get a representation of an n by n operator, given its non-zero elements.
+
+    Chooses between a banded and sparse representation, using the
+    same cost estimate as get_operator_representation.
+
+    Parameters
+    ----------
+    n : int
+    rows : np.ndarray[tuple[int], np.dtype[np.int_]]
+    columns : np.ndarray[tuple[int], np.dtype[np.int_]]
+    values : np.ndarray[tuple[int], np.dtype[np.complex128]]
+    threshold : float, optional
+        threshold below which elements are discarded, by default 0
+
+    Returns
+    -------
+    BandedOperator | SparseOperator
+    """
+    diagonals, offsets = _get_element_diagonals(n, rows, columns, values)
+    n_diagonals = np.count_nonzero(np.linalg.norm(diagonals, axis=1) > threshold)
+    n_elements = np.count_nonzero(np.abs(values) > threshold)
+    if 3 * n_diagonals * n <= 2 * n_elements + n:
+        return _get_banded_operator_from_diagonals(diagonals, threshold, offsets)
+    keep = np.abs(values) > threshold
+    return SparseOperator(
+        scipy.sparse.coo_array(
+            (values[keep], (rows[keep], columns[keep])), shape=(n, n)
+        )
+    )
+
+
+OperatorRepresentationKind = Literal["banded", "sparse", "dense"]
+
+
+def get_operator_representation_kind(
+    operator: np.ndarray[tuple[int, int], np.dtype[np.complex128]], threshold: float
+) -> OperatorRepresentationKind:
+    """
+    Choose the cheapest representation of an operator given its measured fill.
+
+    The cost of applying each representation is estimated from the number
+    of diagonals and the number of elements above threshold.
+
+    Parameters
+    ----------
+    operator : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    threshold : float
+
+    Returns
+    -------
+    OperatorRepresentationKind
+    """
+    return _get_representation_kind(
+        operator, get_operator_diagonals(operator), threshold
+    )
+
+
+def _get_representation_kind(
+    operator: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    diagonals: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    threshold: float,
+) -> OperatorRepresentationKind:
+    n = operator.shape[0]
+    n_diagonals = np.count_nonzero(np.linalg.norm(diagonals, axis=1) > threshold)
+    n_elements = np.count_nonzero(np.abs(operator) > threshold)
+    # Each diagonal requires a multiply, a roll and an add
+    costs: dict[OperatorRepresentationKind, float] = {
+        "banded": 3 * n_diagonals * n,
+        "sparse": 2 * n_elements + n,
+        "dense": n * n,
+    }
+    return min(costs, key=lambda k: costs[k])
+
+
+def get_operator_representation(
+    operator: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+    threshold: float = 0,
+    *,
+    kind: OperatorRepresentationKind | None = None,
+) -> OperatorRepresentation:
+    """
+    Get a representation of an operator.
+
+    Parameters
+    ----------
+    operator : np.ndarray[tuple[int, int], np.dtype[np.complex128]]
+    threshold : float, optional
+        threshold below which elements are discarded, by default 0
+    kind : OperatorRepresentationKind | None, optional
+        representation to use, by default chosen from the fill of the operator
+
+    Returns
+    -------
+    OperatorRepresentation
+    """
+    operator = np.asarray(operator, dtype=np.complex128)
+    diagonals = get_operator_diagonals(operator)
+    kind = (
+        _get_representation_kind(operator, diagonals, threshold)
+        if kind is None
+        else kind
+    )
+    if kind == "banded":
+        return _get_banded_operator_from_diagonals(diagonals, threshold)
+    if kind == "sparse":
+        return SparseOperator(np.where(np.abs(operator) > threshold, operator, 0))
+    return DenseOperator(operator)
+
+
+def as_operator_representation(
+    operator: OperatorRepresentation | np.ndarray[Any, np.dtype[Any]] | Any,  # noqa: ANN401
+) -> OperatorRepresentation:
+    """
+    Get the representation of an operator, given as an array or sparse matrix.
+
+    Parameters
+    ----------
+    operator : OperatorRepresentation | np.ndarray[Any, np.dtype[Any]] | Any
+
+    Returns
+    -------
+    OperatorRepresentation
+    """
+    if isinstance(
+        operator, BandedOperator | SparseOperator | DenseOperator | BraKetOperator
+    ):
+        return operator
+    if scipy.sparse.issparse(operator):
+        return SparseOperator(operator)
+    return get_operator_representation(np.asarray(operator, dtype=np.complex128))
@@ -1,6 +1,16 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Literal, TypeVar, overload
+import itertools
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Literal,
+    TypedDict,
+    TypeGuard,
+    TypeVar,
+    overload,
+)
 
 import numpy as np
 import qutip
@@ -8,63 +18,72 @@ import qutip.ui
 import scipy.sparse
 from scipy.constants import hbar
 
-from surface_potential_analysis.basis.basis import FundamentalBasis
+from surface_potential_analysis.basis.basis import (
+    FundamentalBasis,
+    FundamentalPositionBasis,
+)
 from surface_potential_analysis.basis.stacked_basis import (
     TupleBasis,
     TupleBasisLike,
 )
-from surface_potential_analysis.basis.time_basis_like import EvenlySpacedTimeBasis
 from surface_potential_analysis.basis.util import BasisUtil
+from surface_potential_analysis.dynamics.ensemble import (
+    ConvergedEnsemble,
+    run_trajectories_until_converged,
+)
+from surface_potential_analysis.dynamics.schrodinger._split_operator import (
+    get_split_operator_dt,
+    get_split_operator_system,
+    split_operator_step,
+)
+from surface_potential_analysis.dynamics.stochastic_schrodinger import _integrator
+from surface_potential_analysis.dynamics.stochastic_schrodinger._operators import (
+    BandedOperator,
+    as_operator_representation,
+    get_banded_operator,
+    get_banded_operator_from_elements,
+    get_element_representation,
+)
+from surface_potential_analysis.dynamics.trajectories import (
+    TrajectoryScheduler,
+    run_trajectories,
+    solver_accepts,
+)
 from surface_potential_analysis.dynamics.tunnelling_basis import (
     get_basis_from_shape,
 )
 from surface_potential_analysis.dynamics.util import build_hop_operator, get_hop_shift
-from surface_potential_analysis.operator.conversion import convert_operator_to_basis
+from surface_potential_analysis.operator.conversion import (
+    convert_diagonal_operator_to_basis,
+    convert_operator_to_basis,
+)
+from surface_potential_analysis.operator.operator import as_operator_from_jump_operator
 from surface_potential_analysis.state_vector.conversion import (
+    convert_state_vector_list_to_basis,
     convert_state_vector_to_basis,
 )
-from surface_potential_analysis.state_vector.eigenstate_calculation import (
-    calculate_eigenvectors_hermitian,
-)
-from surface_potential_analysis.state_vector.state_vector_list import (
-    calculate_inner_products,
-    get_state_along_axis,
-    get_state_vector,
-    get_weighted_state_vector,
-)
 
 try:
     from sse_solver_py import SimulationConfig, SSEMethod, solve_sse, solve_sse_banded
 except ImportError:
-    # if sse_solver_py is not installed, create a dummy functions
-
-    def solve_sse(  # noqa: D103
-        initial_state: list[complex],  # noqa: ARG001
-        hamiltonian: list[list[complex]],  # noqa: ARG001
-        operators: list[list[list[complex]]],  # noqa: ARG001
-        config: SimulationConfig,  # noqa: ARG001
-    ) -> list[complex]:
-        msg = "sse_solver_py not installed, add sse_solver_py feature"
-        raise NotImplementedError(msg)
-
-    def solve_sse_banded(  # noqa: PLR0913, PLR0917, D103
-        initial_state: list[complex],  # noqa: ARG001
-        hamiltonian_diagonal: list[list[complex]],  # noqa: ARG001
-        hamiltonian_offset: list[int],  # noqa: ARG001
-        operators_diagonals: list[list[list[complex]]],  # noqa: ARG001
-        operators_offsets: list[list[int]],  # noqa: ARG001
-        config: SimulationConfig,  # noqa: ARG001
-    ) -> list[complex]:
-        msg = "sse_solver_py not installed, add sse_solver_py feature"
-        raise NotImplementedError(msg)
-
+    # if sse_solver_py is not installed, fall back to the numpy implementation
+    from surface_potential_analysis.dynamics.stochastic_schrodinger._integrator import (
+        SimulationConfig,
+        solve_sse,
+        solve_sse_banded,
+    )
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from collections.abc import Callable, Iterator, Sequence
+    from pathlib import Path
 
     from sse_solver_py import SSEMethod
 
     from surface_potential_analysis.basis.basis_like import BasisLike
+    from surface_potential_analysis.basis.stacked_basis import (
+        TupleBasisWithLengthLike,
+    )
+    from surface_potential_analysis.basis.time_basis_like import EvenlySpacedTimeBasis
     from surface_potential_analysis.dynamics.incoherent_propagation.tunnelling_matrix import (
         TunnellingAMatrix,
     )
@@ -73,12 +92,19 @@ if TYPE_CHECKING:
         TunnellingSimulationBasis,
     )
     from surface_potential_analysis.operator.operator import (
+        DiagonalOperator,
+        JumpOperator,
         Operator,
+        SingleBasisJumpOperator,
         SingleBasisOperator,
     )
+    from surface_potential_analysis.potential.potential import Potential
     from surface_potential_analysis.state_vector import (
         StateVector,
     )
+    from surface_potential_analysis.state_vector.eigenstate_collection import (
+        ValueList,
+    )
     from surface_potential_analysis.state_vector.state_vector_list import (
         StateVectorList,
     )
@@ -93,6 +119,112 @@ if TYPE_CHECKING:
     _L2Inv = TypeVar("_L2Inv", bound=int)
     _AX0Inv = TypeVar("_AX0Inv", bound=EvenlySpacedTimeBasis[Any, Any, Any])
 
+    _BandedSolver = Callable[
+        [
+            np.ndarray[tuple[int, int, int], np.dtype[np.complex128]],
+            TrajectoryScheduler | None,
+            np.random.Generator | None,
+        ],
+        np.ndarray[tuple[int, int, int], np.dtype[np.complex128]],
+    ]
+
+
+def _is_jump_operator(
+    operator: Operator[Any, Any] | JumpOperator[Any, Any],
+) -> TypeGuard[JumpOperator[Any, Any]]:
+    return "amplitude" in operator
+
+
+def _get_jump_operator_matrix(
+    operator: JumpOperator[Any, Any],
+) -> scipy.sparse.csr_matrix:
+    return scipy.sparse.csr_matrix(
+        (operator["amplitude"], (operator["target"], operator["source"])),
+        shape=operator["basis"].shape,
+    )
+
+
+def get_jump_operators_from_a_matrix(
+    matrix: TunnellingAMatrix[_B0],
+) -> list[SingleBasisJumpOperator[_B0]]:
+    """
+    Get a jump operator for each off-diagonal element of the A matrix.
+
+    Parameters
+    ----------
+    matrix : TunnellingAMatrix[_B0]
+
+    Returns
+    -------
+    list[SingleBasisJumpOperator[_B0]]
+    """
+    data = matrix["data"].reshape(matrix["basis"].shape)
+    target, source = np.nonzero(data)
+    off_diagonal = target != source
+    return [
+        {
+            "basis": matrix["basis"],
+            "source": np.array([j]),
+            "target": np.array([i]),
+            "amplitude": np.array([data[i, j]], dtype=np.complex128),
+        }
+        for (i, j) in zip(target[off_diagonal], source[off_diagonal], strict=True)
+    ]
+
+
+def get_simplified_jump_operators_from_a_matrix(
+    matrix: TunnellingAMatrix[_B0], *, factor: float = 1
+) -> list[SingleBasisJumpOperator[_B0]]:
+    """
+    Get a jump operator for each hop between bands, assuming the A matrix is translationally invariant.
+
+    Each operator hops every site in band n_0 to the site in band n_1
+    shifted by the hop, so has a single jump for each site.
+
+    Parameters
+    ----------
+    matrix : TunnellingAMatrix[_B0]
+    factor : float, optional
+        factor to scale the rates, by default 1
+
+    Returns
+    -------
+    list[SingleBasisJumpOperator[_B0]]
+    """
+    util = BasisUtil(matrix["basis"][0])
+    (n_x1, n_x2, n_bands) = util.shape
+    jump_array = matrix["data"].reshape(*util.shape, *util.shape)[0, 0]
+    x1, x2 = np.meshgrid(np.arange(n_x1), np.arange(n_x2), indexing="ij")
+    out: list[SingleBasisJumpOperator[_B0]] = []
+    for n_0 in range(n_bands):
+        for n_1 in range(n_bands):
+            if n_0 == n_1:
+                continue
+            for hop in range(9):
+                hop_shift = get_hop_shift(hop, 2)
+                hop_val = factor * jump_array[n_0, hop_shift[0], hop_shift[1], n_1]
+                if hop_val < 1:
+                    continue
+
+                source = np.ravel_multi_index((x1, x2, n_0), util.shape).ravel()
+                target = np.ravel_multi_index(
+                    (x1 + hop_shift[0], x2 + hop_shift[1], n_1),
+                    util.shape,
+                    mode="wrap",
+                ).ravel()
+                out.append(
+                    {
+                        "basis": matrix["basis"],
+                        "source": source,
+                        "target": target,
+                        "amplitude": np.full(
+                            source.size, np.sqrt(hop_val), dtype=np.complex128
+                        ),
+                    }
+                )
+
+    return out
+
 
 def get_collapse_operators_from_a_matrix(
     matrix: TunnellingAMatrix[_B0],
@@ -165,7 +297,7 @@ def get_simplified_collapse_operators_from_a_matrix(
     return out
 
 
-def get_collapse_operators_from_function(
+def get_jump_operators_from_function(
     shape: tuple[_L0Inv, _L1Inv],
     bands_basis: TunnellingSimulationBandsBasis[_L2Inv],
     a_function: Callable[
@@ -178,7 +310,7 @@ def get_collapse_operators_from_function(
         float,
     ],
 ) -> list[
-    SingleBasisOperator[
+    SingleBasisJumpOperator[
         TupleBasisLike[
             FundamentalBasis[_L0Inv],
             FundamentalBasis[_L1Inv],
@@ -189,6 +321,11 @@ def get_collapse_operators_from_function(
     """
     Given a function which produces the collapse operators S_{i,j} calculate the relevant collapse operators.
 
+    The rates only depend on the bands and the hop, so a_function is evaluated
+    once for each (band, band, hop), and the operators are built by broadcasting
+    over all sites. Each operator is a single jump, and jumps with a rate of
+    zero are skipped.
+
     Parameters
     ----------
     shape : tuple[_L0Inv, _L1Inv]
@@ -197,39 +334,91 @@ def get_collapse_operators_from_function(
 
     Returns
     -------
-    list[SingleBasisOperator[ tuple[ FundamentalBasis[_L0Inv], FundamentalBasis[_L1Inv], TunnellingSimulationBandsBasis[_L2Inv]]]]
+    list[SingleBasisJumpOperator[ tuple[ FundamentalBasis[_L0Inv], FundamentalBasis[_L1Inv], TunnellingSimulationBandsBasis[_L2Inv]]]]
     """
-    operators: list[
-        SingleBasisOperator[
-            TupleBasisLike[
-                FundamentalBasis[_L0Inv],
-                FundamentalBasis[_L1Inv],
-                TunnellingSimulationBandsBasis[_L2Inv],
-            ]
-        ]
-    ] = []
-    n_sites = np.prod(shape).item()
     n_bands = bands_basis.fundamental_n
     basis = get_basis_from_shape(shape, n_bands, bands_basis)
+    stacked_shape = (*shape, n_bands)
 
-    array = np.zeros((n_sites * n_bands, n_sites * n_bands))
-    for i in range(array.shape[0]):
-        for n1 in range(n_bands):
-            for d1 in range(9):
-                (i0, j0, n0) = np.unravel_index(i, (*shape, n_bands))
-                d1_stacked = np.unravel_index(d1, (3, 3)) - np.array([1, 1])
-                (i1, j1) = (i0 + d1_stacked[0], j0 + d1_stacked[1])
-                j = np.ravel_multi_index((i1, j1, n1), (*shape, n_bands), mode="wrap")
-
-                data = np.zeros(shape, dtype=np.complex128)
-                data[i, j] = a_function(
-                    int(n0), n1, (0, 0), (d1_stacked[0], d1_stacked[1])
-                )
-                # TODO: use a single point basis, and a normal np.array...
-                operators.append(
-                    {"basis": TupleBasis(basis, basis), "data": data.reshape(-1)}
-                )
-    return operators
+    hops = np.array(np.unravel_index(np.arange(9), (3, 3))) - 1
+    rates = np.array(
+        [
+            [
+                [a_function(n0, n1, (0, 0), (int(d0), int(d1))) for (d0, d1) in hops.T]
+                for n1 in range(n_bands)
+            ]
+            for n0 in range(n_bands)
+        ],
+        dtype=np.complex128,
+    )
+
+    # Index the initial state i, the final band n1 and the hop d1
+    (i0, j0, n0) = np.unravel_index(np.arange(np.prod(stacked_shape)), stacked_shape)
+    i_rates = rates[n0]
+    j = np.ravel_multi_index(
+        (
+            i0[:, np.newaxis, np.newaxis] + hops[0][np.newaxis, np.newaxis, :],
+            j0[:, np.newaxis, np.newaxis] + hops[1][np.newaxis, np.newaxis, :],
+            np.arange(n_bands)[np.newaxis, :, np.newaxis],
+        ),
+        stacked_shape,
+        mode="wrap",
+    )
+    (i, n1, d1) = np.nonzero(i_rates)
+    return [
+        {
+            "basis": TupleBasis(basis, basis),
+            "source": np.array([source]),
+            "target": np.array([target]),
+            "amplitude": np.array([amplitude]),
+        }
+        for (target, source, amplitude) in zip(
+            i, j[i, n1, d1], i_rates[i, n1, d1], strict=True
+        )
+    ]
+
+
+def get_collapse_operators_from_function(
+    shape: tuple[_L0Inv, _L1Inv],
+    bands_basis: TunnellingSimulationBandsBasis[_L2Inv],
+    a_function: Callable[
+        [
+            int,
+            int,
+            tuple[int, int],
+            tuple[int, int],
+        ],
+        float,
+    ],
+) -> list[
+    SingleBasisOperator[
+        TupleBasisLike[
+            FundamentalBasis[_L0Inv],
+            FundamentalBasis[_L1Inv],
+            TunnellingSimulationBandsBasis[_L2Inv],
+        ]
+    ]
+]:
+    """
+    Given a function which produces the collapse operators S_{i,j} calculate the relevant collapse operators.
+
+    Prefer get_jump_operators_from_function, which does not build
+    each operator as a dense matrix.
+
+    Parameters
+    ----------
+    shape : tuple[_L0Inv, _L1Inv]
+    bands_basis : TunnellingSimulationBandsBasis[_L2Inv]
+    a_function : Callable[ [ int, int, tuple[int, int], tuple[int, int], ], float, ]
+
+    Returns
+    -------
+    list[SingleBasisOperator[ tuple[ FundamentalBasis[_L0Inv], FundamentalBasis[_L1Inv], TunnellingSimulationBandsBasis[_L2Inv]]]]
+    """
+    return [
+        as_operator_from_jump_operator(operator)
+        for operator in get_jump_operators_from_function(shape, bands_basis, a_function)
+    ]
 
 
 @overload
@@ -237,9 +426,11 @@ def solve_stochastic_schrodinger_equation(
     initial_state: StateVector[_B1],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[SingleBasisOperator[_B1]] | None = None,
+    collapse_operators: list[SingleBasisOperator[_B1] | SingleBasisJumpOperator[_B1]]
+    | None = None,
     *,
     n_trajectories: _L1Inv,
+    scheduler: TrajectoryScheduler | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[_L1Inv], _AX0Inv], _B1]:
     ...
 
@@ -249,20 +440,24 @@ def solve_stochastic_schrodinger_equation(
     initial_state: StateVector[_B1],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[SingleBasisOperator[_B1]] | None = None,
+    collapse_operators: list[SingleBasisOperator[_B1] | SingleBasisJumpOperator[_B1]]
+    | None = None,
     *,
     n_trajectories: Literal[1] = 1,
+    scheduler: TrajectoryScheduler | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[Literal[1]], _AX0Inv], _B1]:
     ...
 
 
-def solve_stochastic_schrodinger_equation(  # type: ignore bad overload
+def solve_stochastic_schrodinger_equation(  # type: ignore bad overload  # noqa: PLR0913
     initial_state: StateVector[_B1],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[SingleBasisOperator[_B1]] | None = None,
+    collapse_operators: list[SingleBasisOperator[_B1] | SingleBasisJumpOperator[_B1]]
+    | None = None,
     *,
     n_trajectories: _L1Inv | Literal[1] = 1,
+    scheduler: TrajectoryScheduler | None = None,
 ) -> (
     StateVectorList[TupleBasisLike[FundamentalBasis[Literal[1]], _AX0Inv], _B1]
     | StateVectorList[TupleBasisLike[FundamentalBasis[_L1Inv], _AX0Inv], _B1]
@@ -276,11 +471,14 @@ def solve_stochastic_schrodinger_equation(  # type: ignore bad overload
     times : np.ndarray[tuple[int], np.dtype[np.float_]]
     hamiltonian : SingleBasisOperator[_B0Inv]
     collapse_operators : list[SingleBasisOperator[_B0Inv]]
+    scheduler : TrajectoryScheduler | None, optional
+        Used to set the number of workers, and the seed of each trajectory
 
     Returns
     -------
     StateVectorList[_B0Inv, _L0Inv]
     """
+    scheduler = TrajectoryScheduler() if scheduler is None else scheduler
     if collapse_operators is None:
         collapse_operators = []
     hamiltonian_qobj = qutip.Qobj(
@@ -289,7 +487,11 @@ def solve_stochastic_schrodinger_equation(  # type: ignore bad overload
     initial_state_qobj = qutip.Qobj(initial_state["data"])
 
     sc_ops = [
-        qutip.Qobj(op["data"].reshape(op["basis"].shape) / hbar).to("CSR")
+        qutip.Qobj(
+            _get_jump_operator_matrix(op) / hbar
+            if _is_jump_operator(op)
+            else op["data"].reshape(op["basis"].shape) / hbar
+        ).to("CSR")
         for op in collapse_operators
     ]
     result = qutip.ssesolve(
@@ -305,10 +507,11 @@ def solve_stochastic_schrodinger_equation(  # type: ignore bad overload
             "store_states": True,
             "keep_runs_results": True,
             "map": "parallel",
-            "num_cpus": n_trajectories,
+            "num_cpus": scheduler.get_n_workers(n_trajectories),
             "dt": times.fundamental_dt,
         },
         ntraj=n_trajectories,  # cspell:disable-line
+        seeds=scheduler.get_seed_sequences(n_trajectories),
     )
     return {
         "basis": TupleBasis(
@@ -330,9 +533,12 @@ def solve_stochastic_schrodinger_equation_rust(
     initial_state: StateVector[_B1],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[SingleBasisOperator[_B1]] | None = None,
+    collapse_operators: list[SingleBasisOperator[_B1] | SingleBasisJumpOperator[_B1]]
+    | None = None,
     *,
     n_trajectories: _L1Inv,
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None = None,
+    scheduler: TrajectoryScheduler | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[_L1Inv], _AX0Inv], _B1]:
     ...
 
@@ -342,20 +548,89 @@ def solve_stochastic_schrodinger_equation_rust(
     initial_state: StateVector[_B1],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[SingleBasisOperator[_B1]] | None = None,
+    collapse_operators: list[SingleBasisOperator[_B1] | SingleBasisJumpOperator[_B1]]
+    | None = None,
     *,
     n_trajectories: Literal[1] = 1,
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None = None,
+    scheduler: TrajectoryScheduler | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[Literal[1]], _AX0Inv], _B1]:
     ...
 
 
-def solve_stochastic_schrodinger_equation_rust(  # type: ignore bad overload
+def _solve_into(
+    solver: Callable[..., Any],
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]],
+    *args: Any,  # noqa: ANN401
+    rng: np.random.Generator | None = None,
+) -> np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]:
+    # sse_solver_py uses its own source of noise, so only
+    # the numpy implementation can be seeded
+    kwargs = {} if rng is None or not solver_accepts(solver, "rng") else {"rng": rng}
+    if solver_accepts(solver, "out"):
+        solver(*args, out=out, **kwargs)
+        return out
+    # Older versions of sse_solver_py return the states, rather than
+    # writing them into the output array
+    out[:] = np.asarray(solver(*args, **kwargs), dtype=np.complex128).reshape(out.shape)
+    return out
+
+
+def _solve_scheduled(  # noqa: PLR0913, PLR0917
+    solver: Callable[..., Any],
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]],
+    args: tuple[Any, ...],
+    get_config: Callable[[int], Any],
+    scheduler: TrajectoryScheduler | None,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]:
+    if scheduler is None:
+        return _solve_into(solver, out, *args, get_config(out.shape[0]), rng=rng)
+
+    n_trajectories, n_times, n_states = out.shape
+
+    def _solve_chunk(
+        n: int, rng: np.random.Generator
+    ) -> StateVectorList[TupleBasisLike[FundamentalBasis[int], Any], Any]:
+        chunk = np.empty((n, n_times, n_states), dtype=np.complex128)
+        _solve_into(solver, chunk, *args, get_config(n), rng=rng)
+        return {
+            "basis": TupleBasis(
+                TupleBasis(FundamentalBasis(n), FundamentalBasis(n_times)),
+                FundamentalBasis(n_states),
+            ),
+            "data": chunk.reshape(-1),
+        }
+
+    run_trajectories(_solve_chunk, n_trajectories, scheduler, out=out)
+    return out
+
+
+def _get_output_array(
+    n_trajectories: int,
+    times: EvenlySpacedTimeBasis[Any, Any, Any],
+    n_states: int,
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None,
+) -> np.ndarray[tuple[int, int, int], np.dtype[np.complex128]]:
+    shape = (n_trajectories, times.n, n_states)
+    if out is None:
+        return np.empty(shape, dtype=np.complex128)
+    if out.shape != shape or out.dtype != np.complex128:
+        msg = f"out must be a complex128 array of shape {shape}"
+        raise ValueError(msg)
+    return out
+
+
+def solve_stochastic_schrodinger_equation_rust(  # type: ignore bad overload  # noqa: PLR0913
     initial_state: StateVector[_B1],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[SingleBasisOperator[_B1]] | None = None,
+    collapse_operators: list[SingleBasisOperator[_B1] | SingleBasisJumpOperator[_B1]]
+    | None = None,
     *,
     n_trajectories: _L1Inv | Literal[1] = 1,
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None = None,
+    scheduler: TrajectoryScheduler | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[Any], _AX0Inv], _B1]:
     """
     Given an initial state, use the stochastic schrodinger equation to solve the dynamics of the system.
@@ -366,30 +641,49 @@ def solve_stochastic_schrodinger_equation_rust(  # type: ignore bad overload
     times : np.ndarray[tuple[int], np.dtype[np.float_]]
     hamiltonian : SingleBasisOperator[_B0Inv]
     collapse_operators : list[SingleBasisOperator[_B0Inv]]
+    out : np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None, optional
+        Array of shape (n_trajectories, times.n, n_states) to store the result in
+    scheduler : TrajectoryScheduler | None, optional
+        If provided, the trajectories are split into chunks and run in parallel.
+        The result is only reproducible when using the numpy solver.
 
     Returns
     -------
     StateVectorList[_B0Inv, _L0Inv]
     """
     collapse_operators = [] if collapse_operators is None else collapse_operators
-
-    data = solve_sse(
-        list(initial_state["data"]),
-        [
-            list(x / hbar)
-            for x in hamiltonian["data"].reshape(hamiltonian["basis"].shape)
-        ],
-        [
-            [list(x / np.sqrt(hbar)) for x in o["data"].reshape(o["basis"].shape)]
-            for o in collapse_operators
-        ],
-        SimulationConfig(
+    out = _get_output_array(n_trajectories, times, initial_state["data"].size, out)
+
+    n_states = hamiltonian["basis"].shape[0]
+    operators = np.empty((len(collapse_operators), n_states, n_states), np.complex128)
+    for i, o in enumerate(collapse_operators):
+        if _is_jump_operator(o):
+            operators[i] = 0
+            np.add.at(
+                operators[i], (o["target"], o["source"]), o["amplitude"] / np.sqrt(hbar)
+            )
+            continue
+        np.divide(o["data"].reshape(o["basis"].shape), np.sqrt(hbar), out=operators[i])
+
+    _solve_scheduled(
+        solve_sse,
+        out,
+        (
+            np.ascontiguousarray(initial_state["data"], dtype=np.complex128),
+            np.ascontiguousarray(
+                hamiltonian["data"].reshape(hamiltonian["basis"].shape) / hbar,
+                dtype=np.complex128,
+            ),
+            operators,
+        ),
+        lambda n: SimulationConfig(
             n=times.n,
             step=times.step,
-            dt=times.dt,
-            n_trajectories=n_trajectories,
+            dt=times.fundamental_dt,
+            n_trajectories=n,
             method="Euler",
         ),
+        scheduler,
     )
 
     return {
@@ -397,42 +691,116 @@ def solve_stochastic_schrodinger_equation_rust(  # type: ignore bad overload
             TupleBasis(FundamentalBasis(n_trajectories), times),
             hamiltonian["basis"][0],
         ),
-        "data": np.array(data).ravel(),
+        "data": out.reshape(-1),
     }
 
 
-def _get_operator_diagonals(
-    operator: list[list[complex]],
-) -> list[list[complex]]:
-    return [
-        np.diag(np.roll(operator, shift=-i, axis=0)).tolist()
-        for i in range(len(operator))
+def _get_banded_system(
+    times: EvenlySpacedTimeBasis[Any, Any, Any],
+    hamiltonian: SingleBasisOperator[_B1],
+    collapse_operators: list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None,
+    r_threshold: float,
+) -> tuple[BandedOperator, list[BandedOperator], float]:
+    collapse_operators = [] if collapse_operators is None else collapse_operators
+
+    operators_norm = [
+        np.linalg.norm(o["amplitude"] if _is_jump_operator(o) else o["data"])
+        for o in collapse_operators
     ]
 
+    # We get the best numerical performace if we set the norm of the largest collapse operators
+    # to be one. This prevents us from accumulating large errors when multiplying state * dt * operator * conj_operator
+    max_norm = float(max(operators_norm, default=1.0))
+    dt = float(times.fundamental_dt * max_norm**2 / hbar)
+
+    # Jump operators are assumed to be in the basis of the hamiltonian,
+    # and are never converted to a dense matrix
+    banded_collapse = [
+        get_banded_operator_from_elements(
+            hamiltonian["basis"][0].n,
+            o["target"],
+            o["source"],
+            o["amplitude"] / max_norm,
+            r_threshold / dt,
+        )
+        if _is_jump_operator(o)
+        else get_banded_operator(
+            convert_operator_to_basis(o, hamiltonian["basis"])["data"].reshape(
+                hamiltonian["basis"].shape
+            )
+            / max_norm,
+            r_threshold / dt,
+        )
+        for o in collapse_operators
+    ]
 
-def _get_banded_operator(
-    operator: list[list[complex]], threshold: float
-) -> tuple[list[list[complex]], list[int]]:
-    diagonals = _get_operator_diagonals(operator)
-    above_threshold = np.linalg.norm(diagonals, axis=1) > threshold
+    banded_h = get_banded_operator(
+        hamiltonian["data"].reshape(hamiltonian["basis"].shape) / max_norm**2,
+        r_threshold / dt,
+    )
+    return banded_h, banded_collapse, dt
 
-    diagonals_filtered = np.array(diagonals)[above_threshold]
 
-    zero_imag = np.abs(np.imag(diagonals_filtered)) < threshold
-    diagonals_filtered[zero_imag] = np.real(diagonals_filtered[zero_imag])
-    zero_real = np.abs(np.real(diagonals_filtered)) < threshold
-    diagonals_filtered[zero_real] = 1j * np.imag(diagonals_filtered[zero_real])
+def _get_banded_solver(  # noqa: PLR0913
+    initial_state: StateVector[_B2],
+    times: EvenlySpacedTimeBasis[Any, Any, Any],
+    hamiltonian: SingleBasisOperator[_B1],
+    collapse_operators: list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None,
+    *,
+    r_threshold: float,
+    method: SSEMethod,
+    use_numpy: bool = False,
+    tolerance: float | None = None,
+    statistics: _integrator.SSEStepStatistics | None = None,
+) -> _BandedSolver:
+    """
+    Build the banded system once, and get a function which solves it.
 
-    diagonals_filtered = diagonals_filtered.tolist()
+    solve(out, scheduler, rng) fills out with trajectories of the system,
+    so repeated calls never convert or band the operators again.
 
-    offsets = np.arange(len(operator))[above_threshold].tolist()
-    return (diagonals_filtered, offsets)
+    Returns
+    -------
+    _BandedSolver
+    """
+    banded_h, banded_collapse, dt = _get_banded_system(
+        times, hamiltonian, collapse_operators, r_threshold
+    )
+    initial_state_converted = convert_state_vector_to_basis(
+        initial_state, hamiltonian["basis"][0]
+    )
+    # Adaptive steps and step statistics are only supported by the numpy solver
+    use_numpy = use_numpy or tolerance is not None or statistics is not None
+    solver = (
+        partial(_integrator.solve_sse_banded, statistics=statistics)
+        if use_numpy
+        else solve_sse_banded
+    )
+    args = (
+        np.ascontiguousarray(initial_state_converted["data"], dtype=np.complex128),
+        banded_h.diagonals,
+        banded_h.offsets,
+        [b.diagonals for b in banded_collapse],
+        [b.offsets for b in banded_collapse],
+    )
 
+    def _get_config(n: int) -> Any:  # noqa: ANN401
+        if use_numpy:
+            return _integrator.SimulationConfig(
+                n=times.n,
+                step=times.step,
+                dt=dt,
+                n_trajectories=n,
+                method=method,
+                tolerance=tolerance,
+            )
+        return SimulationConfig(
+            n=times.n, step=times.step, dt=dt, n_trajectories=n, method=method
+        )
 
-def _get_banded_operators(
-    operators: list[list[list[complex]]], threshold: float
-) -> list[tuple[list[list[complex]], list[int]]]:
-    return [_get_banded_operator(o, threshold) for o in operators]
+    return lambda out, scheduler, rng: _solve_scheduled(
+        solver, out, args, _get_config, scheduler, rng
+    )
 
 
 @overload
@@ -440,11 +808,16 @@ def solve_stochastic_schrodinger_equation_rust_banded(
     initial_state: StateVector[_B2],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[SingleBasisOperator[_B3]] | None = None,
+    collapse_operators: list[SingleBasisOperator[_B3] | SingleBasisJumpOperator[_B3]]
+    | None = None,
     *,
     n_trajectories: _L1Inv,
     r_threshold: float = 1e-8,
     method: SSEMethod = "Euler",
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None = None,
+    scheduler: TrajectoryScheduler | None = None,
+    tolerance: float | None = None,
+    statistics: _integrator.SSEStepStatistics | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[_L1Inv], _AX0Inv], _B1]:
     ...
 
@@ -454,24 +827,33 @@ def solve_stochastic_schrodinger_equation_rust_banded(
     initial_state: StateVector[_B2],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[SingleBasisOperator[_B3]] | None = None,
+    collapse_operators: list[SingleBasisOperator[_B3] | SingleBasisJumpOperator[_B3]]
+    | None = None,
     *,
     n_trajectories: Literal[1] = 1,
     r_threshold: float = 1e-8,
     method: SSEMethod = "Euler",
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None = None,
+    scheduler: TrajectoryScheduler | None = None,
+    tolerance: float | None = None,
+    statistics: _integrator.SSEStepStatistics | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[Literal[1]], _AX0Inv], _B1]:
     ...
 
 
-def solve_stochastic_schrodinger_equation_rust_banded(  # type: ignore bad overload
+def solve_stochastic_schrodinger_equation_rust_banded(  # type: ignore bad overload  # noqa: PLR0913
     initial_state: StateVector[_B2],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[Operator[_B3, _B4]] | None = None,
+    collapse_operators: list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None = None,
     *,
     n_trajectories: _L1Inv | Literal[1] = 1,
     r_threshold: float = 1e-8,
     method: SSEMethod = "Euler",
+    out: np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None = None,
+    scheduler: TrajectoryScheduler | None = None,
+    tolerance: float | None = None,
+    statistics: _integrator.SSEStepStatistics | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[Any], _AX0Inv], _B1]:
     """
     Given an initial state, use the stochastic schrodinger equation to solve the dynamics of the system.
@@ -482,105 +864,364 @@ def solve_stochastic_schrodinger_equation_rust_banded(  # type: ignore bad overl
     times : np.ndarray[tuple[int], np.dtype[np.float_]]
     hamiltonian : SingleBasisOperator[_B0Inv]
     collapse_operators : list[SingleBasisOperator[_B0Inv]]
+    out : np.ndarray[tuple[int, int, int], np.dtype[np.complex128]] | None, optional
+        Array of shape (n_trajectories, times.n, n_states) to store the result in
+    scheduler : TrajectoryScheduler | None, optional
+        If provided, the trajectories are split into chunks and run in parallel.
+        The result is only reproducible when using the numpy solver.
+    tolerance : float | None, optional
+        If provided, the relative error of each step is estimated using step doubling,
+        and steps are halved until the error is below tolerance.
+    statistics : _integrator.SSEStepStatistics | None, optional
+        Used to record the number and duration of accepted and rejected steps
 
     Returns
     -------
     StateVectorList[_B0Inv, _L0Inv]
     """
-    data = np.zeros(
-        (n_trajectories, times.n, initial_state["data"].size), dtype=np.complex128
+    out = _get_output_array(n_trajectories, times, hamiltonian["basis"][0].n, out)
+    solve = _get_banded_solver(
+        initial_state,
+        times,
+        hamiltonian,
+        collapse_operators,
+        r_threshold=r_threshold,
+        method=method,
+        tolerance=tolerance,
+        statistics=statistics,
     )
-    collapse_operators = [] if collapse_operators is None else collapse_operators
+    solve(out, scheduler, None)
 
-    operators_data = [o["data"].reshape(o["basis"].shape) for o in collapse_operators]
-    operators_norm = [np.linalg.norm(o) for o in operators_data]
+    return {
+        "basis": TupleBasis(
+            TupleBasis(FundamentalBasis(n_trajectories), times),
+            hamiltonian["basis"][0],
+        ),
+        "data": out.reshape(-1),
+    }
 
-    # We get the best numerical performace if we set the norm of the largest collapse operators
-    # to be one. This prevents us from accumulating large errors when multiplying state * dt * operator * conj_operator
-    max_norm = np.max(operators_norm)
-    dt = (times.fundamental_dt * max_norm**2 / hbar).item()
 
-    banded_collapse = _get_banded_operators(
-        [
-            [
-                list(x / max_norm)
-                for x in convert_operator_to_basis(o, hamiltonian["basis"])[
-                    "data"
-                ].reshape(hamiltonian["basis"].shape)
-            ]
-            for o in collapse_operators
-        ],
-        r_threshold / dt,
-    )
+def solve_stochastic_schrodinger_equation_banded_iter(  # noqa: PLR0913
+    initial_state: StateVector[_B2],
+    times: _AX0Inv,
+    hamiltonian: SingleBasisOperator[_B1],
+    collapse_operators: list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None = None,
+    *,
+    n_trajectories: _L1Inv,
+    r_threshold: float = 1e-8,
+    method: SSEMethod = "Euler",
+    rng: np.random.Generator | None = None,
+) -> Iterator[StateVectorList[FundamentalBasis[_L1Inv], _B1]]:
+    """
+    Solve the stochastic schrodinger equation, yielding the states at each time in times.
 
-    banded_h = _get_banded_operator(
-        [
-            list(x / max_norm**2)
-            for x in hamiltonian["data"].reshape(hamiltonian["basis"].shape)
-        ],
-        r_threshold / dt,
+    All trajectories are advanced together, and only the states at the current
+    time are held in memory, so results can be reduced as they are produced
+    without storing the full (n_trajectories, times.n, n_states) array.
+    This always uses the numpy integrator, as sse_solver_py only returns
+    the complete trajectories.
+
+    Parameters
+    ----------
+    initial_state : StateVector[_B2]
+    times : _AX0Inv
+    hamiltonian : SingleBasisOperator[_B1]
+    collapse_operators : list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None, optional
+    n_trajectories : _L1Inv
+    r_threshold : float, optional
+        threshold below which operator elements are discarded, by default 1e-8
+    method : SSEMethod, optional
+        method, by default "Euler"
+    rng : np.random.Generator | None, optional
+        source of noise, by default None
+
+    Yields
+    ------
+    Iterator[StateVectorList[FundamentalBasis[_L1Inv], _B1]]
+        The state of each trajectory, for each time in times
+    """
+    banded_h, banded_collapse, dt = _get_banded_system(
+        times, hamiltonian, collapse_operators, r_threshold
     )
     initial_state_converted = convert_state_vector_to_basis(
         initial_state, hamiltonian["basis"][0]
     )
-    data = solve_sse_banded(
-        list(initial_state_converted["data"]),
-        banded_h[0],
-        banded_h[1],
-        [b[0] for b in banded_collapse],
-        [b[1] for b in banded_collapse],
-        SimulationConfig(
-            n=times.n,
-            step=times.step,
-            dt=dt,
+    initial_states = np.tile(initial_state_converted["data"], (n_trajectories, 1))
+    config = _integrator.SimulationConfig(
+        n=times.n, step=times.step, dt=dt, method=method
+    )
+    basis = TupleBasis(FundamentalBasis(n_trajectories), hamiltonian["basis"][0])
+    for states in _integrator.iter_sse(
+        _integrator.SSESystem(banded_h, banded_collapse),
+        initial_states,
+        config,
+        rng=rng,
+    ):
+        yield {"basis": basis, "data": states.reshape(-1)}
+
+
+def solve_stochastic_schrodinger_equation_banded_trajectories(  # noqa: PLR0913
+    initial_state: StateVector[_B2],
+    times: _AX0Inv,
+    hamiltonian: SingleBasisOperator[_B1],
+    collapse_operators: list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None = None,
+    *,
+    n_trajectories: int,
+    r_threshold: float = 1e-8,
+    method: SSEMethod = "Euler",
+    rng: np.random.Generator | None = None,
+) -> Iterator[StateVectorList[_AX0Inv, _B1]]:
+    """
+    Solve the stochastic schrodinger equation, yielding each trajectory in turn.
+
+    Only a single trajectory is held in memory at a time, and the banded
+    system is built once and shared by every trajectory. Unlike
+    solve_stochastic_schrodinger_equation_banded_iter this uses
+    sse_solver_py where it is available, unless rng is provided.
+
+    Parameters
+    ----------
+    initial_state : StateVector[_B2]
+    times : _AX0Inv
+    hamiltonian : SingleBasisOperator[_B1]
+    collapse_operators : list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None, optional
+    n_trajectories : int
+    r_threshold : float, optional
+        threshold below which operator elements are discarded, by default 1e-8
+    method : SSEMethod, optional
+        method, by default "Euler"
+    rng : np.random.Generator | None, optional
+        source of noise, by default None. sse_solver_py cannot be seeded,
+        so if rng is provided the numpy integrator is used.
+
+    Yields
+    ------
+    Iterator[StateVectorList[_AX0Inv, _B1]]
+        The states of a single trajectory, at each time in times
+    """
+    solve = _get_banded_solver(
+        initial_state,
+        times,
+        hamiltonian,
+        collapse_operators,
+        r_threshold=r_threshold,
+        method=method,
+        use_numpy=rng is not None,
+    )
+    basis = TupleBasis(times, hamiltonian["basis"][0])
+    out = np.empty((1, times.n, hamiltonian["basis"][0].n), dtype=np.complex128)
+    for _ in range(n_trajectories):
+        solve(out, None, rng)
+        yield {"basis": basis, "data": out.reshape(-1).copy()}
+
+
+def solve_stochastic_schrodinger_equation_banded_memmap(  # noqa: PLR0913
+    path: Path | str,
+    initial_state: StateVector[_B2],
+    times: _AX0Inv,
+    hamiltonian: SingleBasisOperator[_B1],
+    collapse_operators: list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None = None,
+    *,
+    n_trajectories: _L1Inv,
+    r_threshold: float = 1e-8,
+    method: SSEMethod = "Euler",
+    rng: np.random.Generator | None = None,
+) -> StateVectorList[TupleBasisLike[FundamentalBasis[_L1Inv], _AX0Inv], _B1]:
+    """
+    Solve the stochastic schrodinger equation, storing the states in a memory mapped file.
+
+    The states are written to path as they are produced, so the memory
+    required is independent of the number of times.
+
+    Parameters
+    ----------
+    path : Path | str
+        path of the file to store the raw states in
+    initial_state : StateVector[_B2]
+    times : _AX0Inv
+    hamiltonian : SingleBasisOperator[_B1]
+    collapse_operators : list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None, optional
+    n_trajectories : _L1Inv
+    r_threshold : float, optional
+        threshold below which operator elements are discarded, by default 1e-8
+    method : SSEMethod, optional
+        method, by default "Euler"
+    rng : np.random.Generator | None, optional
+        source of noise, by default None
+
+    Returns
+    -------
+    StateVectorList[TupleBasisLike[FundamentalBasis[_L1Inv], _AX0Inv], _B1]
+        The states, with data backed by the file at path
+    """
+    data = np.memmap(
+        path,
+        dtype=np.complex128,
+        mode="w+",
+        shape=(n_trajectories, times.n, hamiltonian["basis"][0].n),
+    )
+    for i, states in enumerate(
+        solve_stochastic_schrodinger_equation_banded_iter(
+            initial_state,
+            times,
+            hamiltonian,
+            collapse_operators,
             n_trajectories=n_trajectories,
+            r_threshold=r_threshold,
             method=method,
-        ),
-    )
+            rng=rng,
+        )
+    ):
+        data[:, i] = states["data"].reshape(n_trajectories, -1)
+    data.flush()
 
     return {
         "basis": TupleBasis(
             TupleBasis(FundamentalBasis(n_trajectories), times),
             hamiltonian["basis"][0],
         ),
-        "data": np.array(data).ravel(),
+        "data": data.reshape(-1),
     }
 
 
-rng = np.random.default_rng()
+class SSEExpectationValues(TypedDict):
+    """
+    Expectation values accumulated during a SSE simulation.
+
+    Each ValueList has a basis of (trajectory, time), or (trajectory, time, state)
+    for projections onto a list of states.
+    """
+
+    operators: list[ValueList[TupleBasisLike[Any, Any]]]
+    diagonal_operators: list[ValueList[TupleBasisLike[Any, Any]]]
+    projections: list[ValueList[TupleBasisLike[Any, Any]]]
+
+
+def _is_same_basis(basis: BasisLike[Any, Any], other: BasisLike[Any, Any]) -> bool:
+    if basis is other:
+        return True
+    if isinstance(basis, FundamentalBasis) and isinstance(other, FundamentalBasis):
+        return basis.n == other.n
+    if isinstance(basis, TupleBasis) and isinstance(other, TupleBasis):
+        return basis.ndim == other.ndim and all(
+            itertools.starmap(_is_same_basis, zip(basis, other, strict=True))
+        )
+    return False
+
+
+def _get_diagonal_observable_data(
+    operator: DiagonalOperator[Any, Any], basis: TupleBasisLike[Any, Any]
+) -> np.ndarray[Any, np.dtype[np.complex128]]:
+    # An operator which is diagonal in the basis of the hamiltonian
+    # is applied as a vector, without forming the full matrix
+    if _is_same_basis(operator["basis"][0], basis[0]) and _is_same_basis(
+        operator["basis"][1], basis[1]
+    ):
+        return np.asarray(operator["data"], dtype=np.complex128)
+    return convert_diagonal_operator_to_basis(operator, basis)["data"].reshape(
+        basis.shape
+    )
 
 
-def _select_random_localized_state(
-    states: StateVectorList[_B2, _B1],
-) -> StateVector[_B1]:
+def solve_stochastic_schrodinger_equation_banded_observables(  # noqa: PLR0913
+    initial_state: StateVector[_B2],
+    times: _AX0Inv,
+    hamiltonian: SingleBasisOperator[_B1],
+    collapse_operators: list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None = None,
+    *,
+    operators: Sequence[Operator[Any, Any]] = (),
+    diagonal_operators: Sequence[DiagonalOperator[Any, Any]] = (),
+    projections: Sequence[StateVectorList[Any, Any]] = (),
+    n_trajectories: int = 1,
+    r_threshold: float = 1e-8,
+    method: SSEMethod = "Euler",
+    rng: np.random.Generator | None = None,
+) -> SSEExpectationValues:
     """
-    Select a random state built from states.
+    Solve the stochastic schrodinger equation, storing only expectation values.
 
-    This finds the states which diagonalize the overall density matrix,
-    and selects states according to their overall occupation.
+    The expectation of each observable is accumulated as the simulation runs
+    and the states are discarded, so the storage required is independent of
+    the size of the basis. The values match those of calculate_expectation_list
+    applied to the states of solve_stochastic_schrodinger_equation_rust_banded,
+    and for projections the occupation |<phi|psi>|^2 of each state phi.
 
     Parameters
     ----------
-    states : StateVectorList[_B2Inv, _B1Inv]
+    initial_state : StateVector[_B2]
+    times : _AX0Inv
+    hamiltonian : SingleBasisOperator[_B1]
+    collapse_operators : list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None, optional
+    operators : Sequence[Operator[Any, Any]], optional
+    diagonal_operators : Sequence[DiagonalOperator[Any, Any]], optional
+    projections : Sequence[StateVectorList[Any, Any]], optional
+        lists of states, such as wannier states, to project onto
+    n_trajectories : int, optional
+        by default 1
+    r_threshold : float, optional
+        threshold below which operator elements are discarded, by default 1e-8
+    method : SSEMethod, optional
+        method, by default "Euler"
+    rng : np.random.Generator | None, optional
+        source of noise, by default None
 
     Returns
     -------
-    StateVector[_B1Inv]
+    SSEExpectationValues
     """
-    states["data"].reshape(states["basis"].shape)
-
-    op = calculate_inner_products(states, states)
-    op["data"] /= np.linalg.norm(op["data"])
-    # Vectors representing the combination of states that diagonalizes rho
-    eigenstates = calculate_eigenvectors_hermitian(op)
-
-    probabilities = eigenstates["eigenvalue"]
-    probabilities /= np.sum(probabilities)
+    banded_h, banded_collapse, dt = _get_banded_system(
+        times, hamiltonian, collapse_operators, r_threshold
+    )
+    basis = hamiltonian["basis"]
+    observables: list[_integrator.Observable] = [
+        *(
+            _integrator.OperatorObservable(
+                convert_operator_to_basis(o, basis)["data"].reshape(basis.shape)
+            )
+            for o in operators
+        ),
+        *(
+            _integrator.OperatorObservable(_get_diagonal_observable_data(o, basis))
+            for o in diagonal_operators
+        ),
+        *(
+            _integrator.ProjectionObservable(
+                convert_state_vector_list_to_basis(p, basis[0])["data"].reshape(
+                    p["basis"][0].n, -1
+                )
+            )
+            for p in projections
+        ),
+    ]
+    initial_state_converted = convert_state_vector_to_basis(initial_state, basis[0])
+    values = _integrator.integrate_sse_observables(
+        _integrator.SSESystem(banded_h, banded_collapse),
+        np.tile(initial_state_converted["data"], (n_trajectories, 1)),
+        _integrator.SimulationConfig(n=times.n, step=times.step, dt=dt, method=method),
+        observables,
+        rng=rng,
+    )
 
-    idx = rng.choice(probabilities.size, p=probabilities)
-    transformation = get_state_vector(eigenstates, idx)
-    transformation["data"] /= np.sqrt(2)
-    return get_weighted_state_vector(states, transformation)
+    trajectory_basis = TupleBasis(FundamentalBasis(n_trajectories), times)
+    operator_values: list[ValueList[TupleBasisLike[Any, Any]]] = [
+        {"basis": trajectory_basis, "data": v.reshape(-1)}
+        for v in values[: len(operators) + len(diagonal_operators)]
+    ]
+    return {
+        "operators": operator_values[: len(operators)],
+        "diagonal_operators": operator_values[len(operators) :],
+        "projections": [
+            {
+                "basis": TupleBasis(trajectory_basis, p["basis"][0]),
+                "data": v.reshape(-1),
+            }
+            for (p, v) in zip(
+                projections,
+                values[len(operators) + len(diagonal_operators) :],
+                strict=True,
+            )
+        ],
+    }
 
 
 @overload
@@ -588,7 +1229,8 @@ def solve_stochastic_schrodinger_equation_localized(
     initial_state: StateVector[_B1],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[SingleBasisOperator[_B1]] | None = None,
+    collapse_operators: list[SingleBasisOperator[_B1] | SingleBasisJumpOperator[_B1]]
+    | None = None,
     *,
     n_trajectories: _L1Inv,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[_L1Inv], _AX0Inv], _B1]:
@@ -600,7 +1242,8 @@ def solve_stochastic_schrodinger_equation_localized(
     initial_state: StateVector[_B1],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[SingleBasisOperator[_B1]] | None = None,
+    collapse_operators: list[SingleBasisOperator[_B1] | SingleBasisJumpOperator[_B1]]
+    | None = None,
     *,
     n_trajectories: Literal[1] = 1,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[Literal[1]], _AX0Inv], _B1]:
@@ -611,36 +1254,47 @@ def solve_stochastic_schrodinger_equation_localized(  # type: ignore bad overloa
     initial_state: StateVector[_B1],
     times: _AX0Inv,
     hamiltonian: SingleBasisOperator[_B1],
-    collapse_operators: list[SingleBasisOperator[_B1]] | None = None,
+    collapse_operators: list[SingleBasisOperator[_B1] | SingleBasisJumpOperator[_B1]]
+    | None = None,
     *,
     n_trajectories: _L1Inv | Literal[1] = 1,
     n_realizations: int = 2,
+    rng: np.random.Generator | None = None,
 ) -> StateVectorList[TupleBasisLike[FundamentalBasis[Any], _AX0Inv], _B1]:
     """
     Find the quantum trajectores, using the localized stochastic schrodinger approach.
 
+    All realizations of every trajectory are integrated together, and
+    after each time step the realizations are re-localized into a single state.
+
     Returns
     -------
     StateVectorList[TupleBasisLike[FundamentalBasis[int], _AX0Inv], _B1Inv]
     """
-    data = np.zeros((n_trajectories, times.n, initial_state["basis"].n), dtype=complex)
-
-    for trajectory in range(n_trajectories):
-        state = initial_state
-        for t in range(times.n):
-            result = solve_stochastic_schrodinger_equation(
-                state,
-                EvenlySpacedTimeBasis(2, times.step, 0, times.dt),
-                hamiltonian,
-                collapse_operators,
-                n_trajectories=n_realizations,
-            )
-            # Re-localize our state
-            state = _select_random_localized_state(
-                get_state_along_axis(result, axes=(1,), idx=(1,))
+    collapse_operators = [] if collapse_operators is None else collapse_operators
+    # The operators are scaled as in solve_stochastic_schrodinger_equation
+    system = _integrator.SSESystem(
+        as_operator_representation(
+            hamiltonian["data"].reshape(hamiltonian["basis"].shape) / hbar
+        ),
+        [
+            get_element_representation(
+                o["basis"][0].n, o["target"], o["source"], o["amplitude"] / hbar
             )
-
-            data[trajectory, t] = state["data"]
+            if _is_jump_operator(o)
+            else as_operator_representation(o["data"].reshape(o["basis"].shape) / hbar)
+            for o in collapse_operators
+        ],
+    )
+    data = _integrator.integrate_localized_sse(
+        system,
+        np.tile(initial_state["data"], (n_trajectories, 1)),
+        _integrator.SimulationConfig(
+            n=times.n, step=times.step, dt=times.fundamental_dt
+        ),
+        n_realizations=n_realizations,
+        rng=rng,
+    )
 
     return {
         "basis": TupleBasis(
@@ -649,3 +1303,207 @@ def solve_stochastic_schrodinger_equation_localized(  # type: ignore bad overloa
         ),
         "data": data.reshape(-1),
     }
+
+
+def _get_position_diagonal(
+    operator: DiagonalOperator[Any, Any],
+    basis: TupleBasisWithLengthLike[*tuple[FundamentalPositionBasis[Any, Any], ...]],
+) -> np.ndarray[tuple[int], np.dtype[np.complex128]]:
+    if all(
+        isinstance(b, TupleBasis)
+        and b.shape == basis.shape
+        and all(isinstance(child, FundamentalPositionBasis) for child in b)
+        for b in operator["basis"]
+    ):
+        return np.asarray(operator["data"], dtype=np.complex128)
+    converted = convert_diagonal_operator_to_basis(
+        operator, TupleBasis(basis, basis)
+    )["data"].reshape(basis.n, basis.n)
+    diagonal = np.diag(converted)
+    off_diagonal = np.linalg.norm(converted - np.diag(diagonal))
+    if off_diagonal > 1e-8 * np.linalg.norm(converted):
+        msg = "Noise operators must be diagonal in the fundamental position basis"
+        raise ValueError(msg)
+    return diagonal.astype(np.complex128)
+
+
+def solve_stochastic_schrodinger_equation_split_operator(  # noqa: PLR0913
+    initial_state: StateVector[Any],
+    times: _AX0Inv,
+    potential: Potential[Any],
+    mass: float,
+    noise_operators: Sequence[DiagonalOperator[Any, Any]] = (),
+    *,
+    n_trajectories: int = 1,
+    bloch_fraction: np.ndarray[tuple[int], np.dtype[np.float64]] | None = None,
+    method: SSEMethod = "Euler",
+    rng: np.random.Generator | None = None,
+) -> StateVectorList[
+    TupleBasisLike[FundamentalBasis[int], _AX0Inv],
+    TupleBasisWithLengthLike[*tuple[FundamentalPositionBasis[Any, Any], ...]],
+]:
+    """
+    Solve the stochastic schrodinger equation for a particle in a potential.
+
+    The coherent evolution under T(k) + V(x) is taken using a split operator
+    step, and the noise operators, which must be diagonal in the fundamental
+    position basis of the potential, are applied with an SSE step with no
+    hamiltonian. Every part of the step is therefore elementwise or an fft,
+    so this scales to large 2D or 3D grids.
+
+    As in solve_schrodinger_equation_split_operator, the states are found
+    at times.times.
+
+    Parameters
+    ----------
+    initial_state : StateVector[Any]
+    times : _AX0Inv
+    potential : Potential[Any]
+    mass : float
+    noise_operators : Sequence[DiagonalOperator[Any, Any]], optional
+        operators diagonal in the fundamental position basis, by default ().
+        Operators in any other basis are converted, and must be diagonal
+        once converted.
+    n_trajectories : int, optional
+        number of trajectories, by default 1
+    bloch_fraction : np.ndarray[tuple[int], np.dtype[np.float64]] | None, optional
+        bloch phase, by default None
+    method : SSEMethod, optional
+        method used for the noise, by default "Euler"
+    rng : np.random.Generator | None, optional
+        source of noise, by default None
+
+    Returns
+    -------
+    StateVectorList[TupleBasisLike[FundamentalBasis[int], _AX0Inv], TupleBasisWithLengthLike[*tuple[FundamentalPositionBasis[Any, Any], ...]]]
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    system = get_split_operator_system(potential, mass, bloch_fraction)
+    # The operators are scaled as in solve_stochastic_schrodinger_equation_rust
+    noise_system = _integrator.SSESystem(
+        BandedOperator([np.zeros(system.basis.n, dtype=np.complex128)], [0]),
+        [
+            BandedOperator(
+                [_get_position_diagonal(o, system.basis) / np.sqrt(hbar)], [0]
+            )
+            for o in noise_operators
+        ],
+    )
+
+    def _propagate(
+        states: np.ndarray[tuple[int, int], np.dtype[np.complex128]],
+        dt: float,
+        n_steps: int,
+    ) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+        phases = system.get_phases(dt)
+        for _ in range(n_steps):
+            states = split_operator_step(phases, states)
+            dw = _integrator.get_noise(rng, len(noise_operators), n_trajectories, dt)
+            states = _integrator.sse_step(
+                noise_system, states, dt, dw, method=method, rng=rng
+            )
+        return states
+
+    initial = convert_state_vector_to_basis(initial_state, system.basis)
+    states = np.tile(initial["data"].astype(np.complex128), (n_trajectories, 1))
+    states = _propagate(states, times.fundamental_dt, times.offset)
+    dt = get_split_operator_dt(times)
+    data = np.empty((n_trajectories, times.n, system.basis.n), dtype=np.complex128)
+    data[:, 0] = states
+    for i in range(1, times.n):
+        states = _propagate(states, dt, times.step)
+        data[:, i] = states
+
+    return {
+        "basis": TupleBasis(
+            TupleBasis(FundamentalBasis(n_trajectories), times), system.basis
+        ),
+        "data": data.reshape(-1),
+    }
+
+
+def solve_stochastic_schrodinger_equation_until_converged(  # noqa: PLR0913
+    initial_state: StateVector[_B2],
+    times: _AX0Inv,
+    hamiltonian: SingleBasisOperator[_B1],
+    collapse_operators: list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None,
+    observable: Callable[[StateVectorList[_AX0Inv, _B1]], np.ndarray[Any, Any]],
+    *,
+    tolerance: float,
+    batch_size: int = 8,
+    max_trajectories: int | None = None,
+    time_budget: float | None = None,
+    r_threshold: float = 1e-8,
+    method: SSEMethod = "Euler",
+    scheduler: TrajectoryScheduler | None = None,
+) -> ConvergedEnsemble:
+    """
+    Solve the stochastic schrodinger equation until the standard error of observable is below tolerance.
+
+    Trajectories are run in batches of batch_size, as in
+    solve_stochastic_schrodinger_equation_rust_banded, and observable is
+    evaluated for each trajectory, for example the ISF at each time in times.
+    The banded system is built once, and shared by every batch.
+    The simulation stops once the largest standard error of the mean is below
+    tolerance, or max_trajectories or time_budget is reached.
+
+    Parameters
+    ----------
+    initial_state : StateVector[_B2]
+    times : _AX0Inv
+    hamiltonian : SingleBasisOperator[_B1]
+    collapse_operators : list[Operator[_B3, _B4] | JumpOperator[_B3, _B4]] | None
+    observable : Callable[[StateVectorList[_AX0Inv, _B1]], np.ndarray[Any, Any]]
+        the values to track for a single trajectory
+    tolerance : float
+        the largest acceptable standard error of the mean of any value
+    batch_size : int, optional
+        number of trajectories per batch, by default 8
+    max_trajectories : int | None, optional
+        stop after this many trajectories, by default None
+    time_budget : float | None, optional
+        do not start a new batch after this many seconds, by default None
+    r_threshold : float, optional
+        threshold below which operator elements are discarded, by default 1e-8
+    method : SSEMethod, optional
+        method, by default "Euler"
+    scheduler : TrajectoryScheduler | None, optional
+        scheduler used to run each batch, by default TrajectoryScheduler()
+
+    Returns
+    -------
+    ConvergedEnsemble
+        The statistics of observable, and the achieved error
+    """
+    # The system is built once, so each batch only integrates the trajectories
+    solve = _get_banded_solver(
+        initial_state,
+        times,
+        hamiltonian,
+        collapse_operators,
+        r_threshold=r_threshold,
+        method=method,
+    )
+    n_states = hamiltonian["basis"][0].n
+
+    def _solve_batch(
+        n: int, rng: np.random.Generator
+    ) -> StateVectorList[TupleBasisLike[FundamentalBasis[Any], _AX0Inv], _B1]:
+        out = np.empty((n, times.n, n_states), dtype=np.complex128)
+        solve(out, None, rng)
+        return {
+            "basis": TupleBasis(
+                TupleBasis(FundamentalBasis(n), times), hamiltonian["basis"][0]
+            ),
+            "data": out.reshape(-1),
+        }
+
+    return run_trajectories_until_converged(
+        _solve_batch,
+        observable,
+        tolerance=tolerance,
+        batch_size=batch_size,
+        max_trajectories=max_trajectories,
+        time_budget=time_budget,
+        scheduler=scheduler,
+    )
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import inspect
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, TypeVar
+
+import numpy as np
+
+from surface_potential_analysis.basis.basis import FundamentalBasis
+from surface_potential_analysis.basis.stacked_basis import TupleBasis
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from surface_potential_analysis.basis.basis_like import BasisLike
+    from surface_potential_analysis.basis.stacked_basis import TupleBasisLike
+    from surface_potential_analysis.state_vector.state_vector_list import (
+        StateVectorList,
+    )
+
+    _B0 = TypeVar("_B0", bound=BasisLike[Any, Any])
+    _B1 = TypeVar("_B1", bound=BasisLike[Any, Any])
+
+
+@dataclass
+class TrajectoryScheduler:
+    """
+    Configuration used to distribute independent trajectories over a pool of workers.
+
+    Trajectories are split into chunks of chunk_size, and each chunk
+    is given an independent random generator spawned from seed. The result
+    is therefore reproducible for a given seed and chunk_size,
+    independent of the number of workers.
+    """
+
+    n_workers: int | None = None
+    chunk_size: int = 1
+    seed: int | np.random.SeedSequence | None = None
+
+    def get_n_workers(self, n_chunks: int) -> int:
+        """
+        Get the number of workers to use for n_chunks.
+
+        Returns
+        -------
+        int
+        """
+        n_workers = (os.cpu_count() or 1) if self.n_workers is None else self.n_workers
+        return max(1, min(n_workers, n_chunks))
+
+    def get_chunk_sizes(self, n_trajectories: int) -> list[int]:
+        """
+        Get the number of trajectories in each chunk.
+
+        Returns
+        -------
+        list[int]
+        """
+        n_full, remainder = divmod(n_trajectories, self.chunk_size)
+        return [self.chunk_size] * n_full + ([remainder] if remainder > 0 else [])
+
+    def get_seed_sequences(self, n: int) -> list[np.random.SeedSequence]:
+        """
+        Get n independent seed sequences, spawned from seed.
+
+        Returns
+        -------
+        list[np.random.SeedSequence]
+        """
+        seed = (
+            self.seed
+            if isinstance(self.seed, np.random.SeedSequence)
+            else np.random.SeedSequence(self.seed)
+        )
+        return seed.spawn(n)
+
+
+def solver_accepts(solver: Callable[..., Any], name: str) -> bool:
+    """
+    Check if solver takes an argument called name.
+
+    This is used to support several versions of sse_solver_py, which
+    differ in the arguments of each solver.
+
+    Returns
+    -------
+    bool
+    """
+    try:
+        return name in inspect.signature(solver).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def run_trajectories(
+    solve_chunk: Callable[
+        [int, np.random.Generator],
+        StateVectorList[TupleBasisLike[FundamentalBasis[Any], _B0], _B1],
+    ],
+    n_trajectories: int,
+    scheduler: TrajectoryScheduler | None = None,
+    *,
+    out: np.ndarray[Any, np.dtype[np.complex128]] | None = None,
+) -> StateVectorList[TupleBasisLike[FundamentalBasis[int], _B0], _B1]:
+    """
+    Run n_trajectories independent trajectories, using the scheduler.
+
+    solve_chunk(n, rng) should return the states of n trajectories, as a
+    StateVectorList with a basis of ((trajectory, time), state). The chunks
+    are merged along the trajectory axis, in order.
+
+    Parameters
+    ----------
+    solve_chunk : Callable[[int, np.random.Generator], StateVectorList[TupleBasisLike[FundamentalBasis[Any], _B0], _B1]]
+    n_trajectories : int
+    scheduler : TrajectoryScheduler | None, optional
+        scheduler, by default TrajectoryScheduler()
+    out : np.ndarray[Any, np.dtype[np.complex128]] | None, optional
+        array to store the result in, with a leading axis of n_trajectories
+
+    Returns
+    -------
+    StateVectorList[TupleBasisLike[FundamentalBasis[int], _B0], _B1]
+
+    Raises
+    ------
+    ValueError
+        If n_trajectories is less than one
+    """
+    if n_trajectories < 1:
+        # The basis of the result is only known once a chunk has been solved
+        msg = "n_trajectories must be at least 1"
+        raise ValueError(msg)
+    scheduler = TrajectoryScheduler() if scheduler is None else scheduler
+    chunk_sizes = scheduler.get_chunk_sizes(n_trajectories)
+    generators = [
+        np.random.default_rng(s) for s in scheduler.get_seed_sequences(len(chunk_sizes))
+    ]
+    starts = np.cumsum([0, *chunk_sizes])
+
+    def _solve(
+        idx: int,
+    ) -> StateVectorList[TupleBasisLike[FundamentalBasis[Any], _B0], _B1]:
+        return solve_chunk(chunk_sizes[idx], generators[idx])
+
+    with ThreadPoolExecutor(scheduler.get_n_workers(len(chunk_sizes))) as executor:
+        results = executor.map(_solve, range(len(chunk_sizes)))
+        first = next(results)
+        times, states = first["basis"][0][1], first["basis"][1]
+        shape = (n_trajectories, times.n, states.n)
+        out = np.empty(shape, dtype=np.complex128) if out is None else out
+        out = out.reshape(shape)
+        for i, result in enumerate(itertools.chain([first], results)):
+            out[starts[i] : starts[i + 1]] = result["data"].reshape(
+                chunk_sizes[i], times.n, states.n
+            )
+
+    return {
+        "basis": TupleBasis(
+            TupleBasis(FundamentalBasis(n_trajectories), times), states
+        ),
+        "data": out.reshape(-1),
+    }
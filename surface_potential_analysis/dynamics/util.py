@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, Any, cast
 
 import numpy as np
+import scipy.sparse
 
 from surface_potential_analysis.basis.basis import FundamentalBasis
 from surface_potential_analysis.basis.stacked_basis import TupleBasis
@@ -49,3 +50,57 @@ def build_hop_operator(
     hop_shift = get_hop_shift(hop, len(shape))
     operator = np.identity(cast(int, np.prod(shape))).reshape(*shape, *shape)  # type: ignore shape not array like
     return np.roll(operator, hop_shift, tuple(range(len(shape))))  # type: ignore[no-any-return]
+
+
+def get_hop_indices(
+    hop: int, shape: tuple[IntLike_co, ...]
+) -> np.ndarray[tuple[int], np.dtype[np.int_]]:
+    """
+    Given a hop index, get the flat index of the site reached from each site.
+
+    This is the shift representation of build_hop_operator, such that
+    build_hop_operator(hop, shape)[get_hop_indices(hop, shape)[i], i] == 1.
+
+    Parameters
+    ----------
+    hop : int
+        hop index
+    shape : tuple[IntLike_co, ...]
+        shape
+
+    Returns
+    -------
+    np.ndarray[tuple[int], np.dtype[np.int_]]
+    """
+    hop_shift = get_hop_shift(hop, len(shape))
+    stacked = np.unravel_index(np.arange(np.prod(shape)), shape)
+    return np.ravel_multi_index(  # type: ignore[no-any-return]
+        tuple(x + dx for (x, dx) in zip(stacked, hop_shift, strict=True)),
+        shape,
+        mode="wrap",
+    )
+
+
+def build_hop_operator_sparse(
+    hop: int, shape: tuple[IntLike_co, ...]
+) -> scipy.sparse.csr_matrix:
+    """
+    Given a hop index, build a sparse hop operator in the given shape.
+
+    This is build_hop_operator(hop, shape), reshaped into a (n, n) csr matrix.
+
+    Parameters
+    ----------
+    hop : int
+        hop index
+    shape : tuple[IntLike_co, ...]
+        shape
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+    """
+    n = int(np.prod(shape))
+    return scipy.sparse.csr_matrix(
+        (np.ones(n), (get_hop_indices(hop, shape), np.arange(n))), shape=(n, n)
+    )
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, TypeVar
+import hashlib
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Self, TypeVar
+
+import numpy as np
 
 from surface_potential_analysis.basis.basis_like import (
     convert_matrix,
@@ -10,6 +15,8 @@ from surface_potential_analysis.operator.operator import DiagonalOperator, as_op
 from surface_potential_analysis.operator.operator_list import as_operator_list
 
 if TYPE_CHECKING:
+    from types import TracebackType
+
     from surface_potential_analysis.basis.basis_like import BasisLike
     from surface_potential_analysis.basis.stacked_basis import TupleBasisLike
     from surface_potential_analysis.operator.operator import (
@@ -27,12 +34,162 @@ if TYPE_CHECKING:
     _B4 = TypeVar("_B4", bound=BasisLike[Any, Any])
 
 
+def _update_digest(hasher: Any, value: Any) -> None:  # noqa: ANN401
+    hasher.update(type(value).__qualname__.encode())
+    if isinstance(value, np.ndarray):
+        contiguous = np.ascontiguousarray(value)
+        hasher.update(f"{contiguous.dtype.str}{contiguous.shape}".encode())
+        hasher.update(contiguous.view(np.uint8).data)
+    elif isinstance(value, tuple | list):
+        for item in value:  # type: ignore unknown
+            _update_digest(hasher, item)
+    elif isinstance(value, dict):
+        for key in sorted(value):  # type: ignore unknown
+            hasher.update(str(key).encode())  # type: ignore unknown
+            _update_digest(hasher, value[key])
+    elif hasattr(value, "__dict__"):
+        _update_digest(hasher, vars(value))
+    else:
+        hasher.update(repr(value).encode())
+
+
+def _get_conversion_key(
+    operator: Operator[Any, Any], basis: TupleBasisLike[Any, Any]
+) -> bytes:
+    # Bases do not define equality, so instead we key on the content of
+    # the basis, which includes any explicit vectors that make up the basis
+    hasher = hashlib.blake2b(digest_size=32)
+    _update_digest(hasher, operator["data"])
+    _update_digest(hasher, operator["basis"])
+    _update_digest(hasher, basis)
+    return hasher.digest()
+
+
+class OperatorConversionCache:
+    """
+    A bounded LRU cache of operators converted into a new basis.
+
+    While the cache is active (using it as a context manager)
+    convert_operator_to_basis will re-use any previously converted operator
+    with identical data and basis. Once the total size of the cached data exceeds
+    max_bytes the least recently used operators are evicted.
+    """
+
+    def __init__(self, max_bytes: int = 2**30) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, Operator[Any, Any]] = OrderedDict()
+        self._n_bytes = 0
+        self._tokens: list[Any] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __enter__(self) -> Self:
+        self._tokens.append(_ACTIVE_CONVERSION_CACHE.set(self))
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        _ACTIVE_CONVERSION_CACHE.reset(self._tokens.pop())
+
+    @property
+    def n_bytes(self) -> int:
+        """The memory used by the data of the cached operators, in bytes."""
+        return self._n_bytes
+
+    def get(
+        self, operator: Operator[_B0Inv, _B1Inv], basis: TupleBasisLike[_B2Inv, _B3Inv]
+    ) -> Operator[_B2Inv, _B3Inv] | None:
+        """
+        Get the converted operator, if it is present in the cache.
+
+        Parameters
+        ----------
+        operator : Operator[_B0Inv, _B1Inv]
+        basis : TupleBasisLike[_B2Inv, _B3Inv]
+
+        Returns
+        -------
+        Operator[_B2Inv, _B3Inv] | None
+        """
+        key = _get_conversion_key(operator, basis)
+        cached = self._entries.get(key)
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        # The caller is free to modify the operator in place, so we return a copy
+        return {"basis": basis, "data": cached["data"].copy()}
+
+    def put(
+        self,
+        operator: Operator[_B0Inv, _B1Inv],
+        converted: Operator[_B2Inv, _B3Inv],
+    ) -> None:
+        """
+        Add the converted operator to the cache, evicting old entries if required.
+
+        Parameters
+        ----------
+        operator : Operator[_B0Inv, _B1Inv]
+            The operator before conversion
+        converted : Operator[_B2Inv, _B3Inv]
+            The operator after conversion
+        """
+        size = converted["data"].nbytes
+        if size > self.max_bytes:
+            return
+        key = _get_conversion_key(operator, converted["basis"])
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._n_bytes -= previous["data"].nbytes
+        self._entries[key] = {
+            "basis": converted["basis"],
+            "data": converted["data"].copy(),
+        }
+        self._n_bytes += size
+        while self._n_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._n_bytes -= evicted["data"].nbytes
+
+    def clear(self) -> None:
+        """Remove all operators from the cache."""
+        self._entries.clear()
+        self._n_bytes = 0
+
+
+_ACTIVE_CONVERSION_CACHE = ContextVar[OperatorConversionCache | None](
+    "_ACTIVE_CONVERSION_CACHE", default=None
+)
+
+
+def get_operator_conversion_cache() -> OperatorConversionCache | None:
+    """
+    Get the currently active OperatorConversionCache.
+
+    Returns
+    -------
+    OperatorConversionCache | None
+    """
+    return _ACTIVE_CONVERSION_CACHE.get()
+
+
 def convert_operator_to_basis(
     operator: Operator[_B0Inv, _B1Inv], basis: TupleBasisLike[_B2Inv, _B3Inv]
 ) -> Operator[_B2Inv, _B3Inv]:
     """
     Given an operator, convert it to the given basis.
 
+    If an OperatorConversionCache is active, the converted operator
+    is looked up and stored in the cache.
+
     Parameters
     ----------
     eigenstate : Eigenstate[_B3d0Inv]
@@ -42,6 +199,21 @@ def convert_operator_to_basis(
     -------
     Eigenstate[_B3d1Inv]
     """
+    cache = _ACTIVE_CONVERSION_CACHE.get()
+    if cache is not None:
+        cached = cache.get(operator, basis)
+        if cached is not None:
+            return cached
+
+    converted = _convert_operator_to_basis(operator, basis)
+    if cache is not None:
+        cache.put(operator, converted)
+    return converted
+
+
+def _convert_operator_to_basis(
+    operator: Operator[_B0Inv, _B1Inv], basis: TupleBasisLike[_B2Inv, _B3Inv]
+) -> Operator[_B2Inv, _B3Inv]:
     converted = convert_matrix(
         operator["data"].reshape(operator["basis"].shape),
         operator["basis"][0],
@@ -97,6 +97,65 @@ def as_diagonal_operator(operator: Operator[_B0, _B1]) -> DiagonalOperator[_B0,
     return {"basis": operator["basis"], "data": diagonal.reshape(-1)}
 
 
+class JumpOperator(TypedDict, Generic[_B0_co, _B1_co]):
+    """
+    Represents a sparse operator as a list of jumps.
+
+    The operator is sum_i amplitude[i] |target[i]><source[i]|, where target
+    indexes the lhs basis and source indexes the rhs basis.
+    """
+
+    basis: TupleBasisLike[_B0_co, _B1_co]
+    source: np.ndarray[tuple[int], np.dtype[np.int_]]
+    target: np.ndarray[tuple[int], np.dtype[np.int_]]
+    amplitude: np.ndarray[tuple[int], np.dtype[np.complex128]]
+
+
+SingleBasisJumpOperator = JumpOperator[_B0_co, _B0_co]
+"""Represents a jump operator where both vector and dual vector uses the same basis"""
+
+
+def as_operator_from_jump_operator(
+    operator: JumpOperator[_B0, _B1],
+) -> Operator[_B0, _B1]:
+    """
+    Convert a jump operator into an operator.
+
+    Parameters
+    ----------
+    operator : JumpOperator[_B0, _B1]
+
+    Returns
+    -------
+    Operator[_B0, _B1]
+    """
+    data = np.zeros(operator["basis"].shape, dtype=np.complex128)
+    np.add.at(data, (operator["target"], operator["source"]), operator["amplitude"])
+    return {"basis": operator["basis"], "data": data.reshape(-1)}
+
+
+def as_jump_operator(operator: Operator[_B0, _B1]) -> JumpOperator[_B0, _B1]:
+    """
+    Convert an operator into a jump operator, with a jump for each non-zero element.
+
+    Parameters
+    ----------
+    operator : Operator[_B0, _B1]
+
+    Returns
+    -------
+    JumpOperator[_B0, _B1]
+    """
+    data = operator["data"].reshape(operator["basis"].shape)
+    target, source = np.nonzero(data)
+    return {
+        "basis": operator["basis"],
+        "source": source,
+        "target": target,
+        "amplitude": data[target, source].astype(np.complex128),
+    }
+
+
 def sum_diagonal_operator_over_axes(
     operator: DiagonalOperator[_SB0Inv, _SB1Inv], axes: tuple[int, ...]
 ) -> DiagonalOperator[Any, Any]:
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+@dataclass
+class WelfordAccumulator:
+    """
+    Streaming mean and variance of a sequence of equally shaped samples.
+
+    The mean and the sum of squared deviations m2 = sum |x - mean|^2
+    are updated using Welford's algorithm, so the samples are never stored.
+    Accumulators of independent samples, for example from separate worker
+    processes, can be combined using merge.
+    """
+
+    n: int = 0
+    mean: np.ndarray[Any, np.dtype[Any]] | None = None
+    m2: np.ndarray[Any, np.dtype[np.float64]] | None = None
+
+    def add(self, sample: np.ndarray[Any, np.dtype[Any]]) -> None:
+        """Add a single sample."""
+        self.add_batch(np.asarray(sample)[np.newaxis])
+
+    def add_batch(self, samples: np.ndarray[Any, np.dtype[Any]]) -> None:
+        """Add a batch of samples, stacked along the first axis."""
+        samples = np.asarray(samples)
+        mean = np.mean(samples, axis=0)
+        m2 = np.sum(np.square(np.abs(samples - mean)), axis=0)
+        self.merge(WelfordAccumulator(samples.shape[0], mean, m2))
+
+    def merge(self, other: WelfordAccumulator) -> None:
+        """Add the samples of other to this accumulator."""
+        if other.n == 0:
+            return
+        if self.n == 0 or self.mean is None or self.m2 is None:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            return
+        assert other.mean is not None
+        assert other.m2 is not None
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        # The mean and m2 are never updated in place, so the dtype is promoted
+        # when merging a complex accumulator into a real one, and other
+        # is never changed by a later merge
+        self.mean = self.mean + delta * (other.n / n)
+        self.m2 = self.m2 + other.m2 + np.square(np.abs(delta)) * (self.n * other.n / n)
+        self.n = n
+
+    @property
+    def variance(self) -> np.ndarray[Any, np.dtype[np.float64]]:
+        """The unbiased sample variance, which is nan for fewer than two samples."""
+        assert self.m2 is not None
+        if self.n < 2:  # noqa: PLR2004
+            return np.full_like(self.m2, np.nan)
+        return self.m2 / (self.n - 1)
+
+    @property
+    def standard_deviation(self) -> np.ndarray[Any, np.dtype[np.float64]]:
+        """The sample standard deviation."""
+        return np.sqrt(self.variance)
+
+    @property
+    def standard_error(self) -> np.ndarray[Any, np.dtype[np.float64]]:
+        """The standard error of the mean."""
+        return np.sqrt(self.variance / self.n)
+
+
+def merge_accumulators(
+    accumulators: Iterable[WelfordAccumulator],
+) -> WelfordAccumulator:
+    """
+    Merge several accumulators into a single accumulator.
+
+    Parameters
+    ----------
+    accumulators : Iterable[WelfordAccumulator]
+
+    Returns
+    -------
+    WelfordAccumulator
+    """
+    out = WelfordAccumulator()
+    for accumulator in accumulators:
+        out.merge(accumulator)
+    return out
@@ -0,0 +1,1511 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pytest
+import scipy.linalg
+import scipy.sparse
+import scipy.sparse.linalg
+from scipy.constants import hbar
+
+from surface_potential_analysis.basis.basis import (
+    FundamentalBasis,
+    FundamentalPositionBasis,
+)
+from surface_potential_analysis.basis.stacked_basis import TupleBasis
+from surface_potential_analysis.basis.time_basis_like import (
+    EvenlySpacedTimeBasis,
+    ExplicitTimeBasis,
+)
+from surface_potential_analysis.dynamics.ensemble import (
+    accumulate_expectations,
+    accumulate_probabilities,
+    get_ensemble_average,
+)
+from surface_potential_analysis.dynamics.incoherent_propagation.eigenstates import (
+    calculate_equilibrium_state,
+    calculate_tunnelling_eigenstates,
+    calculate_tunnelling_eigenstates_bloch,
+    calculate_tunnelling_eigenstates_from_jump_matrix,
+    calculate_tunnelling_simulation_state,
+    calculate_tunnelling_simulation_state_sparse,
+    get_equilibrium_state,
+)
+from surface_potential_analysis.dynamics.incoherent_propagation.isf import (
+    calculate_band_averaged_isf_from_jump_matrix,
+    calculate_equilibrium_initial_state_isf,
+    calculate_equilibrium_state_averaged_isf,
+    calculate_isf_at_times,
+    calculate_isf_from_jump_matrix,
+    get_equilibrium_band_occupation,
+)
+from surface_potential_analysis.dynamics.incoherent_propagation.kinetic_monte_carlo import (
+    simulate_kinetic_monte_carlo,
+)
+from surface_potential_analysis.dynamics.incoherent_propagation.tunnelling_matrix import (
+    as_sparse_tunnelling_matrix,
+    get_a_matrix_from_jump_matrix,
+    get_a_matrix_reduced_bands,
+    get_jump_matrix_from_a_matrix,
+    get_jump_matrix_from_batch_function,
+    get_jump_matrix_from_function,
+    get_sparse_a_matrix_from_jump_matrix,
+    get_sparse_tunnelling_m_matrix,
+    get_tunnelling_m_matrix,
+    get_tunnelling_m_matrix_kernel,
+)
+from surface_potential_analysis.dynamics.isf_fit import (
+    fit_isf_batch,
+    fit_isf_list,
+    get_double_exponential_model,
+    get_fey_4_variable_model_110,
+    get_fey_model_110,
+    get_fey_model_112bar,
+)
+from surface_potential_analysis.dynamics.schrodinger.solve import (
+    solve_schrodinger_equation_decomposition,
+    solve_schrodinger_equation_krylov,
+    solve_schrodinger_equation_split_operator,
+)
+from surface_potential_analysis.dynamics.stochastic_schrodinger._integrator import (
+    SimulationConfig,
+    SSEMethod,
+    SSEStepStatistics,
+    SSESystem,
+    integrate_localized_sse,
+    integrate_sse,
+    iter_sse,
+    select_localized_states,
+    solve_sse,
+    solve_sse_banded,
+    solve_sse_euler_bra_ket,
+    sse_step,
+)
+from surface_potential_analysis.dynamics.stochastic_schrodinger._operators import (
+    BandedOperator,
+    BraKetOperator,
+    DenseOperator,
+    SparseOperator,
+    get_banded_operator,
+    get_banded_operator_from_elements,
+    get_element_representation,
+    get_operator_diagonals,
+    get_operator_representation,
+)
+from surface_potential_analysis.dynamics.stochastic_schrodinger.solve import (
+    get_collapse_operators_from_a_matrix,
+    get_jump_operators_from_a_matrix,
+    get_jump_operators_from_function,
+    get_simplified_collapse_operators_from_a_matrix,
+    get_simplified_jump_operators_from_a_matrix,
+    solve_stochastic_schrodinger_equation_banded_iter,
+    solve_stochastic_schrodinger_equation_banded_memmap,
+    solve_stochastic_schrodinger_equation_banded_observables,
+    solve_stochastic_schrodinger_equation_banded_trajectories,
+    solve_stochastic_schrodinger_equation_rust_banded,
+    solve_stochastic_schrodinger_equation_split_operator,
+    solve_stochastic_schrodinger_equation_until_converged,
+)
+from surface_potential_analysis.dynamics.trajectories import (
+    TrajectoryScheduler,
+    run_trajectories,
+    solver_accepts,
+)
+from surface_potential_analysis.dynamics.tunnelling_basis import (
+    TunnellingSimulationBandsBasis,
+    get_basis_from_shape,
+)
+from surface_potential_analysis.dynamics.util import (
+    build_hop_operator,
+    build_hop_operator_sparse,
+)
+from surface_potential_analysis.hamiltonian_builder.momentum_basis import (
+    total_surface_hamiltonian,
+)
+from surface_potential_analysis.operator.operator import as_operator_from_jump_operator
+from surface_potential_analysis.stacked_basis.conversion import (
+    stacked_basis_as_fundamental_momentum_basis,
+)
+from surface_potential_analysis.state_vector.eigenstate_calculation import (
+    calculate_expectation_list,
+)
+from surface_potential_analysis.util.statistics import (
+    WelfordAccumulator,
+    merge_accumulators,
+)
+
+rng = np.random.default_rng()
+
+
+def _random_hermitian(n: int) -> np.ndarray[tuple[int, int], np.dtype[np.complex128]]:
+    data = rng.random((n, n)) + 1j * rng.random((n, n))
+    return (data + np.conj(data.T)) / 2
+
+
+def _random_state(n: int) -> np.ndarray[tuple[int], np.dtype[np.complex128]]:
+    data = rng.random(n) + 1j * rng.random(n)
+    return data / np.linalg.norm(data)
+
+
+class SSEIntegratorTest(unittest.TestCase):
+    def test_banded_operator_apply(self) -> None:
+        n = rng.integers(3, 10)
+        matrix = rng.random((n, n)) + 1j * rng.random((n, n))
+        diagonals = [np.diag(np.roll(matrix, shift=-i, axis=0)) for i in range(n)]
+        operator = BandedOperator(diagonals, list(range(n)))
+
+        states = rng.random((4, n)) + 1j * rng.random((4, n))
+        np.testing.assert_array_almost_equal(operator.apply(states), states @ matrix.T)
+        np.testing.assert_array_almost_equal(
+            operator.apply_adjoint(states), states @ np.conj(matrix)
+        )
+
+    def test_get_operator_diagonals(self) -> None:
+        n = rng.integers(3, 10)
+        matrix = rng.random((n, n)) + 1j * rng.random((n, n))
+        expected = [np.diag(np.roll(matrix, shift=-i, axis=0)) for i in range(n)]
+        np.testing.assert_array_equal(get_operator_diagonals(matrix), expected)
+
+        banded = get_banded_operator(matrix, 0)
+        np.testing.assert_array_almost_equal(banded.apply(np.eye(n)), matrix.T)
+
+    def test_get_operator_representation(self) -> None:
+        n = rng.integers(10, 20)
+        diagonal = np.diag(rng.random(n)).astype(np.complex128)
+        self.assertIsInstance(get_operator_representation(diagonal), BandedOperator)
+
+        single = np.zeros((n, n), dtype=np.complex128)
+        single[rng.integers(0, n, 3), rng.integers(0, n, 3)] = 1
+        self.assertIsInstance(get_operator_representation(single), SparseOperator)
+
+        dense = rng.random((n, n)).astype(np.complex128)
+        representation = get_operator_representation(dense)
+        self.assertIsInstance(representation, DenseOperator)
+        np.testing.assert_array_almost_equal(representation.apply(np.eye(n)), dense.T)
+
+    def test_coherent_evolution(self) -> None:
+        n = rng.integers(3, 10)
+        hamiltonian = _random_hermitian(n)
+        initial = _random_state(n)
+
+        config = SimulationConfig(n=5, step=2000, dt=1e-5, n_trajectories=2)
+        actual = solve_sse(initial, hamiltonian, [], config)
+
+        times = np.arange(5) * config.step * config.dt
+        expected = np.array(
+            [scipy.linalg.expm(-1j * hamiltonian * t) @ initial for t in times]
+        )
+        for trajectory in actual:
+            np.testing.assert_array_almost_equal(trajectory, expected, decimal=3)
+
+    def test_banded_matches_dense(self) -> None:
+        n = rng.integers(3, 10)
+        hamiltonian = _random_hermitian(n)
+        operator = np.diag(rng.random(n)).astype(np.complex128)
+        initial = _random_state(n)
+        config = SimulationConfig(n=3, step=10, dt=1e-3, n_trajectories=3)
+
+        seed = rng.integers(0, 2**32)
+        dense = solve_sse(
+            initial, hamiltonian, [operator], config, rng=np.random.default_rng(seed)
+        )
+        banded = solve_sse_banded(
+            initial,
+            [np.diag(np.roll(hamiltonian, -i, axis=0)) for i in range(n)],
+            list(range(n)),
+            [[np.diag(operator)]],
+            [[0]],
+            config,
+            rng=np.random.default_rng(seed),
+        )
+        np.testing.assert_array_almost_equal(dense, banded)
+
+    def test_diagonal_operator_preserves_occupation(self) -> None:
+        n = rng.integers(3, 10)
+        operator = np.diag(rng.random(n)).astype(np.complex128)
+        system = SSESystem(
+            SparseOperator(np.diag(rng.random(n))), [SparseOperator(operator)]
+        )
+        initial = np.tile(_random_state(n), (100, 1))
+        config = SimulationConfig(n=2, step=100, dt=1e-3, method="Milstein")
+
+        states = integrate_sse(system, initial, config)[:, -1]
+        probabilities = np.square(np.abs(states))
+        probabilities /= np.sum(probabilities, axis=1, keepdims=True)
+        # Diagonal noise and hamiltonian cannot move weight between states
+        # on average, although each trajectory tends to a single state
+        np.testing.assert_array_almost_equal(
+            np.average(probabilities, axis=0),
+            np.square(np.abs(initial[0])),
+            decimal=1,
+        )
+
+    def test_solve_sse_into_output(self) -> None:
+        n = rng.integers(3, 10)
+        config = SimulationConfig(n=4, step=3, dt=1e-3, n_trajectories=2)
+        out = np.zeros((config.n_trajectories, config.n, n), dtype=np.complex128)
+        actual = solve_sse(
+            _random_state(n),
+            _random_hermitian(n),
+            [np.diag(rng.random(n))],
+            config,
+            out=out,
+        )
+        self.assertIs(actual, out)
+        np.testing.assert_array_almost_equal(
+            np.linalg.norm(out, axis=2), np.ones((2, 4)), decimal=2
+        )
+
+    def test_iter_sse_matches_integrate_sse(self) -> None:
+        n = rng.integers(3, 10)
+        system = SSESystem(
+            get_operator_representation(_random_hermitian(n)),
+            [get_operator_representation(np.diag(rng.random(n)))],
+        )
+        initial = np.tile(_random_state(n), (3, 1))
+        config = SimulationConfig(n=4, step=5, dt=1e-3)
+
+        seed = rng.integers(0, 2**32)
+        expected = integrate_sse(
+            system, initial, config, rng=np.random.default_rng(seed)
+        )
+        actual = list(
+            iter_sse(system, initial, config, rng=np.random.default_rng(seed))
+        )
+        self.assertEqual(len(actual), config.n)
+        np.testing.assert_array_equal(np.stack(actual, axis=1), expected)
+
+    def test_solve_banded_memmap(self) -> None:
+        n = rng.integers(3, 10)
+        basis = FundamentalBasis(n)
+        hamiltonian = {
+            "basis": TupleBasis(basis, basis),
+            "data": _random_hermitian(n).reshape(-1) * 1e-33,
+        }
+        collapse = {
+            "basis": TupleBasis(basis, basis),
+            "data": np.diag(rng.random(n)).astype(np.complex128).reshape(-1),
+        }
+        initial = {"basis": basis, "data": _random_state(n)}
+        times = EvenlySpacedTimeBasis(3, 4, 0, 1e-33)
+
+        seed = rng.integers(0, 2**32)
+        expected = [
+            s["data"]
+            for s in solve_stochastic_schrodinger_equation_banded_iter(
+                initial,
+                times,
+                hamiltonian,
+                [collapse],
+                n_trajectories=2,
+                rng=np.random.default_rng(seed),
+            )
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            actual = solve_stochastic_schrodinger_equation_banded_memmap(
+                Path(directory) / "states.npy",
+                initial,
+                times,
+                hamiltonian,
+                [collapse],
+                n_trajectories=2,
+                rng=np.random.default_rng(seed),
+            )
+            self.assertEqual(actual["basis"][0].shape, (2, 3))
+            np.testing.assert_array_equal(
+                actual["data"].reshape(2, 3, n),
+                np.stack([e.reshape(2, n) for e in expected], axis=1),
+            )
+
+    def test_solve_banded_trajectories(self) -> None:
+        n = rng.integers(3, 10)
+        basis = FundamentalBasis(n)
+        hamiltonian = {
+            "basis": TupleBasis(basis, basis),
+            "data": _random_hermitian(n).reshape(-1) * 1e-33,
+        }
+        collapse = {
+            "basis": TupleBasis(basis, basis),
+            "data": np.diag(rng.random(n)).astype(np.complex128).reshape(-1),
+        }
+        initial = {"basis": basis, "data": _random_state(n)}
+        times = EvenlySpacedTimeBasis(3, 4, 0, 1e-33)
+
+        seed = rng.integers(0, 2**32)
+        results = [
+            list(
+                solve_stochastic_schrodinger_equation_banded_trajectories(
+                    initial,
+                    times,
+                    hamiltonian,
+                    [collapse],
+                    n_trajectories=3,
+                    rng=np.random.default_rng(seed),
+                )
+            )
+            for _ in range(2)
+        ]
+        self.assertEqual(len(results[0]), 3)
+        self.assertEqual(results[0][0]["basis"].shape, (3, n))
+        for expected, actual in zip(*results, strict=True):
+            np.testing.assert_array_equal(actual["data"], expected["data"])
+        self.assertFalse(np.array_equal(results[0][0]["data"], results[0][1]["data"]))
+
+    def test_scheduled_trajectories_are_reproducible(self) -> None:
+        n = rng.integers(3, 10)
+        basis = FundamentalBasis(n)
+        hamiltonian = {
+            "basis": TupleBasis(basis, basis),
+            "data": _random_hermitian(n).reshape(-1) * 1e-33,
+        }
+        collapse = {
+            "basis": TupleBasis(basis, basis),
+            "data": np.diag(rng.random(n)).astype(np.complex128).reshape(-1),
+        }
+        initial = {"basis": basis, "data": _random_state(n)}
+        times = EvenlySpacedTimeBasis(3, 4, 0, 1e-33)
+
+        seed = rng.integers(0, 2**32)
+        serial = solve_stochastic_schrodinger_equation_rust_banded(
+            initial,
+            times,
+            hamiltonian,
+            [collapse],
+            n_trajectories=5,
+            scheduler=TrajectoryScheduler(n_workers=1, chunk_size=2, seed=seed),
+        )
+        parallel = solve_stochastic_schrodinger_equation_rust_banded(
+            initial,
+            times,
+            hamiltonian,
+            [collapse],
+            n_trajectories=5,
+            scheduler=TrajectoryScheduler(n_workers=3, chunk_size=2, seed=seed),
+        )
+        self.assertEqual(parallel["basis"][0].shape, (5, 3))
+        np.testing.assert_array_equal(serial["data"], parallel["data"])
+
+    def test_run_trajectories_validates_n_trajectories(self) -> None:
+        def _solve_chunk(n: int, rng: np.random.Generator) -> dict:
+            basis = TupleBasis(FundamentalBasis(n), FundamentalBasis(1))
+            return {
+                "basis": TupleBasis(basis, FundamentalBasis(1)),
+                "data": rng.random(n),
+            }
+
+        self.assertEqual(run_trajectories(_solve_chunk, 3)["data"].size, 3)
+        with pytest.raises(ValueError, match="n_trajectories must be at least 1"):
+            run_trajectories(_solve_chunk, 0)
+
+        self.assertTrue(solver_accepts(solve_sse_banded, "rng"))
+        self.assertFalse(solver_accepts(solve_sse_banded, "seed"))
+        self.assertFalse(solver_accepts(len, "rng"))
+
+    def test_solve_banded_no_collapse_operators(self) -> None:
+        n = rng.integers(3, 10)
+        basis = FundamentalBasis(n)
+        hamiltonian = _random_hermitian(n)
+        initial = {"basis": basis, "data": _random_state(n)}
+        times = EvenlySpacedTimeBasis(3, 2000, 0, 6e-2)
+        system = {
+            "basis": TupleBasis(basis, basis),
+            "data": hbar * hamiltonian.reshape(-1),
+        }
+
+        expected = np.array(
+            [
+                scipy.linalg.expm(-1j * hamiltonian * t) @ initial["data"]
+                for t in times.nt_points * times.fundamental_dt
+            ]
+        )
+        actual = solve_stochastic_schrodinger_equation_rust_banded(
+            initial, times, system
+        )
+        np.testing.assert_array_almost_equal(
+            actual["data"].reshape(times.n, n), expected, decimal=3
+        )
+        for state, expected_state in zip(
+            solve_stochastic_schrodinger_equation_banded_iter(
+                initial, times, system, n_trajectories=1
+            ),
+            expected,
+            strict=True,
+        ):
+            np.testing.assert_array_almost_equal(
+                state["data"], expected_state, decimal=3
+            )
+
+    def test_order_2_explicit_weak(self) -> None:
+        n = rng.integers(3, 10)
+        hamiltonian = _random_hermitian(n)
+        initial = _random_state(n)
+
+        config = SimulationConfig(
+            n=5, step=200, dt=1e-3, n_trajectories=2, method="Order2ExplicitWeak"
+        )
+        actual = solve_sse(initial, hamiltonian, [], config)
+
+        times = np.arange(5) * config.step * config.dt
+        expected = np.array(
+            [scipy.linalg.expm(-1j * hamiltonian * t) @ initial for t in times]
+        )
+        for trajectory in actual:
+            np.testing.assert_array_almost_equal(trajectory, expected, decimal=4)
+
+        operator = np.diag(rng.random(n)).astype(np.complex128)
+        system = SSESystem(DenseOperator(np.zeros((n, n))), [DenseOperator(operator)])
+        states = integrate_sse(
+            system,
+            np.tile(initial, (100, 1)),
+            SimulationConfig(n=2, step=20, dt=1e-2, method="Order2ExplicitWeak"),
+        )[:, -1]
+        probabilities = np.square(np.abs(states))
+        probabilities /= np.sum(probabilities, axis=1, keepdims=True)
+        np.testing.assert_array_almost_equal(
+            np.average(probabilities, axis=0), np.square(np.abs(initial)), decimal=1
+        )
+
+    def test_order_2_explicit_weak_convergence(self) -> None:
+        n = 3
+        hamiltonian = _random_hermitian(n)
+        operator = rng.random((n, n)) + 1j * rng.random((n, n))
+        initial = _random_state(n)
+        system = SSESystem(DenseOperator(hamiltonian), [DenseOperator(operator)])
+
+        identity = np.eye(n)
+        jump = np.conj(operator.T) @ operator
+        generator = (
+            -1j * (np.kron(hamiltonian, identity) - np.kron(identity, hamiltonian.T))
+            + np.kron(operator, np.conj(operator))
+            - 0.5 * (np.kron(jump, identity) + np.kron(identity, jump.T))
+        )
+        rho = np.outer(initial, np.conj(initial)).reshape(-1)
+
+        # The expectation over the noise of a single step is found using
+        # gauss hermite quadrature for dW, repeating each point to average
+        # over both values of the additional two point noise
+        points, weights = np.polynomial.hermite_e.hermegauss(9)
+        real, imag = (p.reshape(-1) for p in np.meshgrid(points, points))
+        weight = np.outer(weights, weights).reshape(-1) / (2 * np.pi)
+        n_repeats = 32
+
+        def _get_local_error(dt: float, method: SSEMethod) -> float:
+            dw = np.tile(np.sqrt(dt / 2) * (real + 1j * imag), n_repeats)[np.newaxis]
+            seed = rng.integers(0, 2**32)
+            states = sse_step(
+                system,
+                np.tile(initial, (dw.shape[1], 1)),
+                dt,
+                dw,
+                method=method,
+                rng=np.random.default_rng(seed),
+            )
+            states /= np.linalg.norm(states, axis=1, keepdims=True)
+
+            sign = np.random.default_rng(seed).choice([-1, 1], size=(2, 2, dw.size))
+            plus = (sign[1, 0] > 0).reshape(n_repeats, -1)
+            counts = np.sum(plus, axis=0)
+            sample_weight = np.tile(weight, n_repeats) / (
+                2 * np.where(plus, counts, n_repeats - counts).reshape(-1)
+            )
+            actual = np.einsum("a,ai,aj->ij", sample_weight, states, np.conj(states))
+            expected = scipy.linalg.expm(generator * dt) @ rho
+            return float(np.linalg.norm(actual.reshape(-1) - expected))
+
+        # The local error of a scheme of weak order p is O(dt^(p + 1))
+        euler = _get_local_error(1e-2, "Euler") / _get_local_error(5e-3, "Euler")
+        self.assertAlmostEqual(euler, 4, delta=1)
+        order_2 = _get_local_error(1e-2, "Order2ExplicitWeak") / _get_local_error(
+            5e-3, "Order2ExplicitWeak"
+        )
+        self.assertAlmostEqual(order_2, 8, delta=2)
+
+    def test_adaptive_step(self) -> None:
+        n = rng.integers(3, 10)
+        hamiltonian = _random_hermitian(n)
+        initial = _random_state(n)
+
+        config = SimulationConfig(
+            n=3, step=2, dt=1e-1, n_trajectories=2, tolerance=1e-5
+        )
+        statistics = SSEStepStatistics()
+        actual = solve_sse(initial, hamiltonian, [], config, statistics=statistics)
+
+        self.assertGreater(statistics.n_rejected, 0)
+        self.assertGreater(statistics.n_accepted, 0)
+        self.assertGreater(statistics.accepted_time, 0)
+
+        times = np.arange(3) * config.step * config.dt
+        expected = np.array(
+            [scipy.linalg.expm(-1j * hamiltonian * t) @ initial for t in times]
+        )
+        for trajectory in actual:
+            np.testing.assert_array_almost_equal(trajectory, expected, decimal=2)
+
+    def test_adaptive_step_per_trajectory(self) -> None:
+        energies = np.array([1e-3, 1e1])
+        system = SSESystem(DenseOperator(np.diag(energies).astype(np.complex128)))
+        config = SimulationConfig(n=2, step=1, dt=1e-1, tolerance=1e-4)
+
+        statistics = SSEStepStatistics()
+        states = np.array(
+            list(
+                iter_sse(
+                    system,
+                    np.eye(2, dtype=np.complex128),
+                    config,
+                    rng=rng,
+                    statistics=statistics,
+                )
+            )
+        )
+        # Only the trajectory with the large energy is halved
+        self.assertGreater(statistics.n_rejected, 0)
+        np.testing.assert_allclose(
+            states[1, 0, 0],
+            np.square(1 - 0.5j * energies[0] * config.dt),
+            rtol=1e-12,
+        )
+
+    def test_localized_sse_coherent_evolution(self) -> None:
+        n = rng.integers(3, 10)
+        hamiltonian = _random_hermitian(n)
+        initial = _random_state(n)
+
+        identical = np.tile(initial, (4, 2, 1))
+        selected = select_localized_states(identical, rng)
+        np.testing.assert_array_almost_equal(
+            np.abs(selected @ np.conj(initial)), np.ones(4)
+        )
+
+        config = SimulationConfig(n=3, step=500, dt=1e-4)
+        actual = integrate_localized_sse(
+            SSESystem(DenseOperator(hamiltonian)),
+            np.tile(initial, (2, 1)),
+            config,
+            n_realizations=2,
+        )
+        times = (np.arange(3) + 1) * config.step * config.dt
+        expected = np.array(
+            [scipy.linalg.expm(-1j * hamiltonian * t) @ initial for t in times]
+        )
+        np.testing.assert_array_almost_equal(
+            np.abs(np.einsum("tik,ik->ti", actual, np.conj(expected))),
+            np.ones((2, 3)),
+            decimal=3,
+        )
+
+
+class SSEObservablesTest(unittest.TestCase):
+    def test_solve_banded_observables(self) -> None:
+        n = rng.integers(3, 10)
+        basis = FundamentalBasis(n)
+        hamiltonian = {
+            "basis": TupleBasis(basis, basis),
+            "data": _random_hermitian(n).reshape(-1) * 1e-33,
+        }
+        collapse = {
+            "basis": TupleBasis(basis, basis),
+            "data": np.diag(rng.random(n)).astype(np.complex128).reshape(-1),
+        }
+        initial = {"basis": basis, "data": _random_state(n)}
+        times = EvenlySpacedTimeBasis(3, 4, 0, 1e-33)
+        operator = {
+            "basis": TupleBasis(basis, basis),
+            "data": _random_hermitian(n).reshape(-1),
+        }
+        diagonal = {"basis": TupleBasis(basis, basis), "data": rng.random(n)}
+        projections = {
+            "basis": TupleBasis(FundamentalBasis(2), basis),
+            "data": np.array([_random_state(n), _random_state(n)]).reshape(-1),
+        }
+
+        seed = rng.integers(0, 2**32)
+        states = list(
+            solve_stochastic_schrodinger_equation_banded_iter(
+                initial,
+                times,
+                hamiltonian,
+                [collapse],
+                n_trajectories=2,
+                rng=np.random.default_rng(seed),
+            )
+        )
+        actual = solve_stochastic_schrodinger_equation_banded_observables(
+            initial,
+            times,
+            hamiltonian,
+            [collapse],
+            operators=[operator],
+            diagonal_operators=[diagonal],
+            projections=[projections],
+            n_trajectories=2,
+            rng=np.random.default_rng(seed),
+        )
+
+        expected_operator = [
+            calculate_expectation_list(operator, s)["data"] for s in states
+        ]
+        np.testing.assert_array_almost_equal(
+            actual["operators"][0]["data"].reshape(2, 3),
+            np.transpose(expected_operator),
+        )
+        expected_diagonal = [
+            np.sum(
+                np.square(np.abs(s["data"].reshape(2, n))) * diagonal["data"], axis=1
+            )
+            for s in states
+        ]
+        np.testing.assert_array_almost_equal(
+            actual["diagonal_operators"][0]["data"].reshape(2, 3),
+            np.transpose(expected_diagonal),
+        )
+        expected_projections = [
+            np.square(
+                np.abs(
+                    s["data"].reshape(2, n)
+                    @ np.conj(projections["data"].reshape(2, n)).T
+                )
+            )
+            for s in states
+        ]
+        np.testing.assert_array_almost_equal(
+            actual["projections"][0]["data"].reshape(2, 3, 2),
+            np.stack(expected_projections, axis=1),
+        )
+
+
+class JumpOperatorTest(unittest.TestCase):
+    def test_bra_ket_operator(self) -> None:
+        n = rng.integers(3, 10)
+        amplitudes = rng.random(2) + 1j * rng.random(2)
+        kets = np.array([_random_state(n), _random_state(n)])
+        bras = np.conj(np.array([_random_state(n), _random_state(n)]))
+        operator = BraKetOperator(amplitudes, bras, kets)
+        matrix = np.einsum("k,ki,kj->ij", amplitudes, kets, bras)
+
+        states = rng.random((4, n)) + 1j * rng.random((4, n))
+        np.testing.assert_array_almost_equal(operator.apply(states), states @ matrix.T)
+        np.testing.assert_array_almost_equal(
+            operator.apply_adjoint(states), states @ np.conj(matrix)
+        )
+
+        initial = _random_state(n)
+        hamiltonian = _random_hermitian(n)
+        seed = rng.integers(0, 2**32)
+        expected = solve_sse(
+            initial,
+            hamiltonian,
+            [np.outer(kets[i], bras[i]) * amplitudes[i] for i in range(2)],
+            SimulationConfig(n=3, step=10, dt=1e-3, n_trajectories=3),
+            rng=np.random.default_rng(seed),
+        )
+        actual = solve_sse_euler_bra_ket(
+            initial,
+            hamiltonian,
+            amplitudes,
+            bras,
+            kets,
+            3,
+            10,
+            1e-3,
+            n_trajectories=3,
+            rng=np.random.default_rng(seed),
+        )
+        np.testing.assert_array_almost_equal(actual, expected)
+
+    def test_get_element_representation(self) -> None:
+        n = rng.integers(10, 20)
+        rows = rng.integers(0, n, 5)
+        columns = rng.integers(0, n, 5)
+        values = rng.random(5) + 1j * rng.random(5)
+        matrix = np.zeros((n, n), dtype=np.complex128)
+        np.add.at(matrix, (rows, columns), values)
+
+        representation = get_element_representation(n, rows, columns, values)
+        np.testing.assert_array_almost_equal(representation.apply(np.eye(n)), matrix.T)
+        banded = get_banded_operator_from_elements(n, rows, columns, values, 0)
+        np.testing.assert_array_almost_equal(banded.apply(np.eye(n)), matrix.T)
+
+    def test_jump_operators_from_a_matrix(self) -> None:
+        basis = TupleBasis(
+            FundamentalBasis(3), FundamentalBasis(4), FundamentalBasis(2)
+        )
+        matrix = {
+            "basis": TupleBasis(basis, basis),
+            "data": 10 * rng.random((basis.n, basis.n)).reshape(-1),
+        }
+
+        expected = get_simplified_collapse_operators_from_a_matrix(matrix)
+        actual = get_simplified_jump_operators_from_a_matrix(matrix)
+        self.assertEqual(len(actual), len(expected))
+        for a, e in zip(actual, expected, strict=True):
+            self.assertEqual(a["source"].size, 12)
+            np.testing.assert_array_almost_equal(
+                as_operator_from_jump_operator(a)["data"], e["data"]
+            )
+
+        elements = get_jump_operators_from_a_matrix(matrix)
+        dense = get_collapse_operators_from_a_matrix(
+            {"basis": matrix["basis"], "data": matrix["data"].copy()}
+        )
+        self.assertEqual(len(elements), len(dense))
+        for a, e in zip(elements, dense, strict=True):
+            np.testing.assert_array_almost_equal(
+                as_operator_from_jump_operator(a)["data"], e["data"].reshape(-1)
+            )
+
+    def test_solve_banded_jump_operators(self) -> None:
+        n = rng.integers(3, 10)
+        basis = FundamentalBasis(n)
+        hamiltonian = {
+            "basis": TupleBasis(basis, basis),
+            "data": _random_hermitian(n).reshape(-1) * 1e-33,
+        }
+        jump = {
+            "basis": TupleBasis(basis, basis),
+            "source": np.arange(n),
+            "target": np.roll(np.arange(n), 1),
+            "amplitude": rng.random(n).astype(np.complex128),
+        }
+        initial = {"basis": basis, "data": _random_state(n)}
+        times = EvenlySpacedTimeBasis(3, 4, 0, 1e-33)
+
+        seed = rng.integers(0, 2**32)
+        expected = solve_stochastic_schrodinger_equation_rust_banded(
+            initial,
+            times,
+            hamiltonian,
+            [as_operator_from_jump_operator(jump)],
+            n_trajectories=2,
+            scheduler=TrajectoryScheduler(seed=seed),
+        )
+        actual = solve_stochastic_schrodinger_equation_rust_banded(
+            initial,
+            times,
+            hamiltonian,
+            [jump],
+            n_trajectories=2,
+            scheduler=TrajectoryScheduler(seed=seed),
+        )
+        np.testing.assert_array_almost_equal(actual["data"], expected["data"])
+
+    def test_jump_operators_from_function(self) -> None:
+        shape = (3, 4)
+        n_bands = 2
+        bands_basis = TunnellingSimulationBandsBasis(
+            rng.random((2, n_bands)), (np.array([1.0, 0]), np.array([0, 1.0]))
+        )
+        rates = rng.random((n_bands, n_bands, 3, 3))
+        rates[0, 1, 1, 1] = 0
+
+        def a_function(
+            n0: int, n1: int, _d0: tuple[int, int], d1: tuple[int, int]
+        ) -> float:
+            return rates[n0, n1, d1[0] + 1, d1[1] + 1]
+
+        actual = get_jump_operators_from_function(shape, bands_basis, a_function)
+        self.assertEqual(len(actual), 12 * n_bands * n_bands * 9 - 12)
+
+        expected = np.zeros((12 * n_bands, 12 * n_bands), dtype=np.complex128)
+        for operator in actual:
+            expected[operator["target"], operator["source"]] += operator["amplitude"]
+        for i0, j0, n0, n1, d0, d1 in np.ndindex(3, 4, n_bands, n_bands, 3, 3):
+            i = np.ravel_multi_index((i0, j0, n0), (3, 4, n_bands))
+            j = np.ravel_multi_index(
+                (i0 + d0 - 1, j0 + d1 - 1, n1), (3, 4, n_bands), mode="wrap"
+            )
+            expected[i, j] -= rates[n0, n1, d0, d1]
+        np.testing.assert_array_almost_equal(expected, 0)
+
+
+class SchrodingerSolveTest(unittest.TestCase):
+    def test_krylov_matches_decomposition(self) -> None:
+        n = rng.integers(3, 10)
+        basis = FundamentalBasis(n)
+        hamiltonian = {
+            "basis": TupleBasis(basis, basis),
+            "data": hbar * _random_hermitian(n).reshape(-1),
+        }
+        initial = {"basis": basis, "data": _random_state(n)}
+        times = EvenlySpacedTimeBasis(5, 10, 3, 2.0)
+
+        expected = solve_schrodinger_equation_decomposition(
+            initial, times, hamiltonian, debug=True
+        )
+        actual = solve_schrodinger_equation_krylov(
+            initial, times, hamiltonian, debug=True
+        )
+        np.testing.assert_array_almost_equal(
+            actual["data"], expected["data"].reshape(-1)
+        )
+
+        sparse = scipy.sparse.csr_matrix(hamiltonian["data"].reshape(n, n))
+        actual = solve_schrodinger_equation_krylov(
+            initial, times, scipy.sparse.linalg.aslinearoperator(sparse)
+        )
+        np.testing.assert_array_almost_equal(
+            actual["data"], expected["data"].reshape(-1)
+        )
+
+        # A constant energy offset only changes the global phase
+        offset = 1e3 * hbar
+        actual = solve_schrodinger_equation_krylov(
+            initial, times, sparse + offset * scipy.sparse.identity(n)
+        )
+        np.testing.assert_array_almost_equal(
+            actual["data"].reshape(times.n, n),
+            expected["data"].reshape(times.n, n)
+            * np.exp(-1j * offset * times.times / hbar)[:, np.newaxis],
+        )
+
+    def test_split_operator_matches_expm(self) -> None:
+        basis = TupleBasis(
+            FundamentalPositionBasis(np.array([1.0, 0]), 6),
+            FundamentalPositionBasis(np.array([0, 1.0]), 5),
+        )
+        potential = {"basis": basis, "data": hbar * rng.random(30)}
+        initial = {"basis": basis, "data": _random_state(30)}
+        times = EvenlySpacedTimeBasis(4, 200, 100, 1.0)
+
+        actual = solve_schrodinger_equation_split_operator(
+            initial, times, potential, hbar
+        )
+        hamiltonian = total_surface_hamiltonian(potential, hbar)
+        expected = np.array(
+            [
+                scipy.linalg.expm(-1j * hamiltonian["data"].reshape(30, 30) * t / hbar)
+                @ initial["data"]
+                for t in times.times
+            ]
+        )
+        np.testing.assert_array_almost_equal(
+            actual["data"].reshape(4, 30), expected, decimal=3
+        )
+
+    def test_stochastic_split_operator(self) -> None:
+        basis = TupleBasis(
+            FundamentalPositionBasis(np.array([1.0, 0]), 6),
+            FundamentalPositionBasis(np.array([0, 1.0]), 5),
+        )
+        potential = {"basis": basis, "data": hbar * rng.random(30)}
+        initial = {"basis": basis, "data": _random_state(30)}
+        times = EvenlySpacedTimeBasis(4, 200, 0, 1.0)
+
+        expected = solve_schrodinger_equation_split_operator(
+            initial, times, potential, hbar
+        )
+        actual = solve_stochastic_schrodinger_equation_split_operator(
+            initial, times, potential, hbar, n_trajectories=2
+        )
+        for trajectory in actual["data"].reshape(2, -1):
+            np.testing.assert_array_almost_equal(trajectory, expected["data"])
+
+        times = EvenlySpacedTimeBasis(4, 200, 100, 1.0)
+        expected = solve_schrodinger_equation_split_operator(
+            initial, times, potential, hbar
+        )
+        actual = solve_stochastic_schrodinger_equation_split_operator(
+            initial, times, potential, hbar
+        )
+        np.testing.assert_array_almost_equal(actual["data"], expected["data"])
+        times = EvenlySpacedTimeBasis(4, 200, 0, 1.0)
+
+        noise = {
+            "basis": TupleBasis(basis, basis),
+            "data": np.sqrt(hbar) * rng.random(30),
+        }
+        actual = solve_stochastic_schrodinger_equation_split_operator(
+            initial, times, potential, hbar, [noise], n_trajectories=3
+        )
+        self.assertEqual(actual["basis"][0].shape, (3, 4))
+        data = actual["data"].reshape(3, 4, 30)
+        np.testing.assert_array_almost_equal(
+            data[:, 0], np.tile(initial["data"], (3, 1))
+        )
+        np.testing.assert_allclose(np.linalg.norm(data, axis=-1), 1, rtol=0.1)
+
+        momentum_basis = stacked_basis_as_fundamental_momentum_basis(basis)
+        noise = {
+            "basis": TupleBasis(momentum_basis, momentum_basis),
+            "data": np.sqrt(hbar) * rng.random(30),
+        }
+        with pytest.raises(ValueError, match="must be diagonal"):
+            solve_stochastic_schrodinger_equation_split_operator(
+                initial, times, potential, hbar, [noise]
+            )
+
+
+class EnsembleStatisticsTest(unittest.TestCase):
+    def test_welford_accumulator(self) -> None:
+        samples = rng.random((20, 3, 4)) + 1j * rng.random((20, 3, 4))
+
+        accumulator = WelfordAccumulator()
+        for sample in samples[:7]:
+            accumulator.add(sample)
+        batched = WelfordAccumulator()
+        batched.add_batch(samples[7:])
+        merged = merge_accumulators([accumulator, WelfordAccumulator(), batched])
+
+        self.assertEqual(merged.n, 20)
+        np.testing.assert_array_almost_equal(merged.mean, np.mean(samples, axis=0))
+        np.testing.assert_array_almost_equal(
+            merged.variance, np.var(samples, axis=0, ddof=1)
+        )
+        np.testing.assert_array_almost_equal(
+            merged.standard_error, np.std(samples, axis=0, ddof=1) / np.sqrt(20)
+        )
+
+    def test_welford_accumulator_promotes_dtype(self) -> None:
+        samples = np.array([[1, 2], [3, 4], [1j, 2.0], [0.5, 1j]])
+
+        real = WelfordAccumulator()
+        real.add(np.array([1, 2]))
+        real.add(np.array([3, 4]))
+        complex_accumulator = WelfordAccumulator()
+        complex_accumulator.add_batch(samples[2:])
+        mean = np.copy(complex_accumulator.mean)
+        real.merge(complex_accumulator)
+
+        np.testing.assert_array_almost_equal(real.mean, np.mean(samples, axis=0))
+        np.testing.assert_array_almost_equal(
+            real.variance, np.var(samples, axis=0, ddof=1)
+        )
+        np.testing.assert_array_equal(complex_accumulator.mean, mean)
+
+    def test_accumulate_trajectories(self) -> None:
+        n = 5
+        times = EvenlySpacedTimeBasis(3, 1, 0, 1.0)
+        basis = TupleBasis(times, FundamentalBasis(n))
+        trajectories = [
+            {"basis": basis, "data": _random_state(3 * n)} for _ in range(4)
+        ]
+        operator = {
+            "basis": TupleBasis(FundamentalBasis(n), FundamentalBasis(n)),
+            "data": _random_hermitian(n).reshape(-1),
+        }
+
+        probabilities = WelfordAccumulator()
+        expectations = WelfordAccumulator()
+        for trajectory in trajectories:
+            accumulate_probabilities(trajectory, probabilities)
+            accumulate_expectations(operator, trajectory, expectations)
+
+        actual = get_ensemble_average(probabilities, basis)
+        expected = np.array([np.abs(t["data"]) ** 2 for t in trajectories])
+        np.testing.assert_array_almost_equal(actual["data"], np.mean(expected, axis=0))
+        np.testing.assert_array_almost_equal(
+            actual["standard_deviation"], np.std(expected, axis=0, ddof=1) / 2
+        )
+
+        actual = get_ensemble_average(expectations, times)
+        expected = np.array(
+            [calculate_expectation_list(operator, t)["data"] for t in trajectories]
+        )
+        np.testing.assert_array_almost_equal(actual["data"], np.mean(expected, axis=0))
+
+    def test_solve_until_converged(self) -> None:
+        n = rng.integers(3, 10)
+        basis = FundamentalBasis(n)
+        hamiltonian = {
+            "basis": TupleBasis(basis, basis),
+            "data": _random_hermitian(n).reshape(-1) * 1e-33,
+        }
+        collapse = {
+            "basis": TupleBasis(basis, basis),
+            "data": np.diag(rng.random(n)).astype(np.complex128).reshape(-1),
+        }
+        initial = {"basis": basis, "data": _random_state(n)}
+        times = EvenlySpacedTimeBasis(3, 4, 0, 1e-33)
+
+        def _observable(trajectory: dict) -> np.ndarray:
+            return np.abs(trajectory["data"]) ** 2
+
+        seed = rng.integers(0, 2**32)
+        results = [
+            solve_stochastic_schrodinger_equation_until_converged(
+                initial,
+                times,
+                hamiltonian,
+                [collapse],
+                _observable,
+                tolerance=0,
+                batch_size=4,
+                max_trajectories=10,
+                scheduler=TrajectoryScheduler(n_workers=2, chunk_size=3, seed=seed),
+            )
+            for _ in range(2)
+        ]
+        self.assertEqual(results[0].n_trajectories, 10)
+        self.assertFalse(results[0].converged)
+        np.testing.assert_array_equal(
+            results[0].accumulator.mean, results[1].accumulator.mean
+        )
+        self.assertEqual(
+            results[0].error, np.max(results[0].accumulator.standard_error)
+        )
+
+        result = solve_stochastic_schrodinger_equation_until_converged(
+            initial,
+            times,
+            hamiltonian,
+            [collapse],
+            _observable,
+            tolerance=np.inf,
+            batch_size=4,
+        )
+        self.assertTrue(result.converged)
+        self.assertEqual(result.n_trajectories, 4)
+
+        with pytest.raises(ValueError, match="max_trajectories must be at least 1"):
+            solve_stochastic_schrodinger_equation_until_converged(
+                initial,
+                times,
+                hamiltonian,
+                [collapse],
+                _observable,
+                tolerance=0,
+                max_trajectories=0,
+            )
+
+
+class TunnellingEigenstatesTest(unittest.TestCase):
+    def test_bloch_eigenstates(self) -> None:
+        shape = (3, 4)
+        n_bands = 2
+        bands_basis = TunnellingSimulationBandsBasis(
+            rng.random((2, n_bands)), (np.array([1.0, 0]), np.array([0, 1.0]))
+        )
+        jump_matrix = {
+            "basis": TupleBasis(bands_basis, bands_basis),
+            "data": rng.random(n_bands * n_bands * 9).astype(np.complex128),
+        }
+        m_matrix = get_tunnelling_m_matrix(
+            get_a_matrix_from_jump_matrix(jump_matrix, shape)
+        )
+        expected = calculate_tunnelling_eigenstates(m_matrix)
+        n = m_matrix["basis"][0].n
+        matrix = m_matrix["data"].reshape(n, n)
+
+        for actual in (
+            calculate_tunnelling_eigenstates_bloch(m_matrix),
+            calculate_tunnelling_eigenstates_from_jump_matrix(jump_matrix, shape),
+        ):
+            eigenvalues = actual["eigenvalue"] + np.max(np.linalg.eigvals(matrix))
+            np.testing.assert_array_almost_equal(
+                matrix @ actual["data"].T, actual["data"].T * eigenvalues
+            )
+            np.testing.assert_array_almost_equal(
+                np.sort(np.real(actual["eigenvalue"])),
+                np.sort(np.real(expected["eigenvalue"])),
+            )
+            np.testing.assert_array_almost_equal(
+                get_equilibrium_state(actual)["data"],
+                calculate_equilibrium_state(m_matrix)["data"],
+            )
+
+    def test_sparse_tunnelling_matrix(self) -> None:
+        # A shape of 2 along an axis wraps both neighbours onto the same site
+        shape = (2, 3)
+        n_bands = 3
+        bands_basis = TunnellingSimulationBandsBasis(
+            rng.random((2, n_bands)), (np.array([1.0, 0]), np.array([0, 1.0]))
+        )
+        jump_matrix = {
+            "basis": TupleBasis(bands_basis, bands_basis),
+            "data": rng.random(n_bands * n_bands * 9).astype(np.complex128),
+        }
+        n = np.prod(shape) * n_bands
+
+        for hop in range(9):
+            np.testing.assert_array_equal(
+                build_hop_operator_sparse(hop, shape).toarray(),
+                build_hop_operator(hop, shape).reshape(np.prod(shape), -1),
+            )
+
+        jump_stacked = jump_matrix["data"].reshape(n_bands, n_bands, 9)
+        expected = np.zeros((*shape, n_bands, *shape, n_bands), dtype=np.complex128)
+        for hop in range(9):
+            operator = build_hop_operator(hop, shape)
+            for n_0 in range(n_bands):
+                for n_1 in range(n_bands):
+                    expected[:, :, n_1, :, :, n_0] += (
+                        jump_stacked[n_0, n_1, hop] * operator
+                    )
+        expected = expected.reshape(n, n).T
+
+        a_matrix = get_sparse_a_matrix_from_jump_matrix(jump_matrix, shape)
+        np.testing.assert_array_almost_equal(a_matrix["data"].toarray(), expected)
+        np.testing.assert_array_almost_equal(
+            get_a_matrix_from_jump_matrix(jump_matrix, shape)["data"],
+            expected.reshape(-1),
+        )
+
+        reduced = get_sparse_a_matrix_from_jump_matrix(jump_matrix, shape, n_bands=2)
+        self.assertEqual(reduced["basis"][0].shape, (*shape, 2))
+        np.testing.assert_array_almost_equal(
+            reduced["data"].toarray(),
+            expected.reshape(*shape, n_bands, *shape, n_bands)[
+                :, :, :2, :, :, :2
+            ].reshape(np.prod(shape) * 2, -1),
+        )
+
+        m_matrix = get_sparse_tunnelling_m_matrix(a_matrix)
+        dense = get_tunnelling_m_matrix(
+            get_a_matrix_from_jump_matrix(jump_matrix, shape)
+        )
+        np.testing.assert_array_almost_equal(
+            m_matrix["data"].toarray(), dense["data"].reshape(n, n)
+        )
+        np.testing.assert_array_almost_equal(
+            get_tunnelling_m_matrix_kernel(m_matrix),
+            get_tunnelling_m_matrix_kernel(dense),
+        )
+        np.testing.assert_array_almost_equal(
+            np.sort(np.real(calculate_tunnelling_eigenstates(m_matrix)["eigenvalue"])),
+            np.sort(np.real(calculate_tunnelling_eigenstates(dense)["eigenvalue"])),
+        )
+
+    def test_sparse_tunnelling_simulation_state(self) -> None:
+        shape = (3, 4)
+        n_bands = 2
+        bands_basis = TunnellingSimulationBandsBasis(
+            rng.random((2, n_bands)), (np.array([1.0, 0]), np.array([0, 1.0]))
+        )
+        jump_matrix = {
+            "basis": TupleBasis(bands_basis, bands_basis),
+            "data": rng.random(n_bands * n_bands * 9).astype(np.complex128),
+        }
+        m_matrix = get_sparse_tunnelling_m_matrix(
+            get_sparse_a_matrix_from_jump_matrix(jump_matrix, shape)
+        )
+        basis = m_matrix["basis"][0]
+        data = np.zeros(basis.n, dtype=np.complex128)
+        data[1] = 1
+        initial = {"basis": TupleBasis(basis, basis), "data": data}
+
+        for times in (np.linspace(0, 3, 7), np.array([2.0, 0.0, 0.3, 5.0])):
+            expected = calculate_tunnelling_simulation_state(m_matrix, initial, times)
+            for method in ("uniformization", "expm_multiply"):
+                actual = calculate_tunnelling_simulation_state_sparse(
+                    m_matrix, initial, times, method=method
+                )
+                np.testing.assert_array_almost_equal(actual["data"], expected["data"])
+                np.testing.assert_allclose(
+                    np.sum(actual["data"], axis=1), 1, rtol=0, atol=1e-12
+                )
+
+        actual = calculate_tunnelling_simulation_state_sparse(
+            m_matrix, initial, np.linspace(0, 100, 3)
+        )
+        self.assertTrue(np.all(np.real(actual["data"]) >= 0))
+        np.testing.assert_allclose(np.sum(actual["data"], axis=1), 1, atol=1e-14)
+
+    def test_equilibrium_state(self) -> None:
+        shape = (3, 4)
+        n_bands = 2
+        bands_basis = TunnellingSimulationBandsBasis(
+            rng.random((2, n_bands)), (np.array([1.0, 0]), np.array([0, 1.0]))
+        )
+        basis = get_basis_from_shape(shape, n_bands, bands_basis)
+        # A matrix without translational symmetry
+        a_matrix = {
+            "basis": TupleBasis(basis, basis),
+            "data": rng.random(basis.n * basis.n).astype(np.complex128),
+        }
+        m_matrix = get_tunnelling_m_matrix(a_matrix)
+        sparse = as_sparse_tunnelling_matrix(m_matrix)
+        expected = get_equilibrium_state(calculate_tunnelling_eigenstates(m_matrix))
+
+        for method in ("lu", "bicgstab"):
+            actual = calculate_equilibrium_state(sparse, method=method)
+            np.testing.assert_array_almost_equal(actual["data"], expected["data"])
+            self.assertAlmostEqual(np.sum(actual["data"]), 1)
+            np.testing.assert_array_almost_equal(
+                sparse["data"] @ actual["data"], np.zeros(basis.n)
+            )
+
+        # Nothing hops into the last state, so it has no weight in the equilibrium
+        data = a_matrix["data"].reshape(basis.n, basis.n).copy()
+        data[:, -1] = 0
+        m_matrix = get_tunnelling_m_matrix({"basis": a_matrix["basis"], "data": data})
+        for method in ("lu", "bicgstab"):
+            actual = calculate_equilibrium_state(m_matrix, method=method)
+            self.assertAlmostEqual(actual["data"][-1], 0)
+            self.assertTrue(np.all(np.real(actual["data"]) >= 0))
+            self.assertAlmostEqual(np.sum(actual["data"]), 1)
+            np.testing.assert_array_almost_equal(
+                m_matrix["data"].reshape(basis.n, basis.n) @ actual["data"],
+                np.zeros(basis.n),
+            )
+
+        # Two disconnected halves have no unique equilibrium
+        data = a_matrix["data"].reshape(basis.n, basis.n).copy()
+        half = basis.n // 2
+        data[:half, half:] = 0
+        data[half:, :half] = 0
+        m_matrix = get_tunnelling_m_matrix({"basis": a_matrix["basis"], "data": data})
+        with pytest.raises(ValueError, match="no unique equilibrium state"):
+            calculate_equilibrium_state(m_matrix)
+
+    def test_equilibrium_averaged_isf(self) -> None:
+        shape = (3, 4)
+        n_bands = 2
+        bands_basis = TunnellingSimulationBandsBasis(
+            rng.random((2, n_bands)), (np.array([1.0, 0]), np.array([0, 1.0]))
+        )
+        basis = get_basis_from_shape(shape, n_bands, bands_basis)
+        a_matrix = {
+            "basis": TupleBasis(basis, basis),
+            "data": rng.random(basis.n * basis.n).astype(np.complex128),
+        }
+        m_matrix = get_tunnelling_m_matrix(a_matrix)
+        times = np.linspace(0, 2, 7)
+        dk = np.array([0.7, 1.3])
+
+        equilibrium = np.real(calculate_equilibrium_state(m_matrix)["data"])
+        occupation = np.sum(equilibrium.reshape(-1, n_bands), axis=0)
+        occupation /= np.sum(occupation)
+
+        expected = np.zeros((n_bands, times.size), dtype=np.complex128)
+        for band in range(n_bands):
+            initial = np.zeros(basis.n)
+            initial[band] = 1
+            expected[band] = calculate_isf_at_times(
+                m_matrix,
+                {"basis": TupleBasis(basis, basis), "data": initial},
+                times,
+                dk,
+            )["data"]
+        for chunk_size in (1024, 3):
+            np.testing.assert_array_almost_equal(
+                calculate_equilibrium_state_averaged_isf(
+                    m_matrix, times, dk, chunk_size=chunk_size
+                )["data"],
+                np.tensordot(occupation, expected, axes=(0, 0)),
+            )
+
+        initial = np.zeros(basis.n)
+        initial[:n_bands] = occupation
+        np.testing.assert_array_almost_equal(
+            calculate_equilibrium_initial_state_isf(m_matrix, times, dk, chunk_size=3)[
+                "data"
+            ],
+            calculate_isf_at_times(
+                m_matrix,
+                {"basis": TupleBasis(basis, basis), "data": initial},
+                times,
+                dk,
+            )["data"],
+        )
+
+    def test_kinetic_monte_carlo(self) -> None:
+        n_bands = 2
+        bands_basis = TunnellingSimulationBandsBasis(
+            rng.random((2, n_bands)), (np.array([1.0, 0]), np.array([0, 1.0]))
+        )
+        jump_matrix = {
+            "basis": TupleBasis(bands_basis, bands_basis),
+            "data": rng.random(n_bands * n_bands * 9).astype(np.complex128),
+        }
+        times = np.linspace(0, 2, 5)
+        dk = np.array([0.4, 0.9])
+
+        result = simulate_kinetic_monte_carlo(
+            jump_matrix,
+            times,
+            dk,
+            n_walkers=4000,
+            batch_size=1000,
+            rng=np.random.default_rng(1),
+        )
+        expected = calculate_band_averaged_isf_from_jump_matrix(jump_matrix, times, dk)
+        self.assertTrue(
+            np.all(
+                np.abs(result.isf["data"] - expected)
+                <= 5 * result.isf["standard_deviation"] + 1e-10
+            )
+        )
+        self.assertEqual(result.mean_square_displacement["data"][0], 0)
+        self.assertTrue(np.all(np.diff(result.mean_square_displacement["data"]) > 0))
+
+        occupation = result.band_occupation["data"].reshape(times.size, n_bands)
+        np.testing.assert_array_almost_equal(np.sum(occupation, axis=1), 1)
+        np.testing.assert_allclose(
+            occupation,
+            np.broadcast_to(
+                get_equilibrium_band_occupation(jump_matrix), occupation.shape
+            ),
+            atol=0.05,
+        )
+
+    def test_jump_matrix_from_a_matrix(self) -> None:
+        shape = (3, 4)
+        n_bands = 3
+        bands_basis = TunnellingSimulationBandsBasis(
+            rng.random((2, n_bands)), (np.array([1.0, 0]), np.array([0, 1.0]))
+        )
+        jump_matrix = get_jump_matrix_from_batch_function(
+            bands_basis, lambda n_0, n_1, hop: n_0 + 2 * n_1 + 0.1 * hop
+        )
+        np.testing.assert_array_equal(
+            jump_matrix["data"],
+            get_jump_matrix_from_function(
+                bands_basis, lambda n_0, n_1, hop: n_0 + 2 * n_1 + 0.1 * hop
+            )["data"],
+        )
+
+        a_matrix = get_a_matrix_from_jump_matrix(jump_matrix, shape)
+        sparse = get_sparse_a_matrix_from_jump_matrix(jump_matrix, shape)
+        for matrix in (a_matrix, sparse):
+            np.testing.assert_array_almost_equal(
+                get_jump_matrix_from_a_matrix(matrix)["data"], jump_matrix["data"]
+            )
+
+        reduced = get_a_matrix_reduced_bands(a_matrix, 2)
+        np.testing.assert_array_almost_equal(
+            get_a_matrix_reduced_bands(sparse, 2)["data"].toarray(),
+            reduced["data"].reshape(reduced["basis"].shape),
+        )
+        np.testing.assert_array_almost_equal(
+            reduced["data"],
+            get_a_matrix_from_jump_matrix(jump_matrix, shape, n_bands=2)["data"],
+        )
+
+    def test_isf_from_jump_matrix(self) -> None:
+        shape = (4, 5)
+        n_bands = 3
+        bands_basis = TunnellingSimulationBandsBasis(
+            rng.random((2, n_bands)), (np.array([1.0, 0]), np.array([0, 1.0]))
+        )
+        jump_matrix = {
+            "basis": TupleBasis(bands_basis, bands_basis),
+            "data": rng.random(n_bands * n_bands * 9).astype(np.complex128),
+        }
+        m_matrix = get_tunnelling_m_matrix(
+            get_a_matrix_from_jump_matrix(jump_matrix, shape)
+        )
+        times = np.linspace(0, 2, 5)
+        # On a periodic lattice, the ISF is exact for commensurate dk
+        dk = 2 * np.pi * np.array([1 / shape[0], 2 / shape[1]])
+
+        basis = m_matrix["basis"][0]
+        equilibrium = np.real(calculate_equilibrium_state(m_matrix)["data"])
+        occupation = np.sum(equilibrium.reshape(*shape, n_bands), axis=(0, 1))
+        occupation /= np.sum(occupation)
+
+        expected = np.zeros((n_bands, times.size), dtype=np.complex128)
+        for band in range(n_bands):
+            initial = np.zeros(basis.n)
+            initial[band] = 1
+            expected[band] = calculate_isf_at_times(
+                m_matrix,
+                {"basis": TupleBasis(basis, basis), "data": initial},
+                times,
+                dk,
+            )["data"]
+        np.testing.assert_array_almost_equal(
+            calculate_band_averaged_isf_from_jump_matrix(jump_matrix, times, dk),
+            np.tensordot(occupation, expected, axes=(0, 0)),
+        )
+
+        initial = np.zeros(basis.n)
+        initial[:n_bands] = occupation
+        np.testing.assert_array_almost_equal(
+            calculate_isf_from_jump_matrix(jump_matrix, times, dk),
+            calculate_isf_at_times(
+                m_matrix,
+                {"basis": TupleBasis(basis, basis), "data": initial},
+                times,
+                dk,
+            )["data"],
+        )
+
+        scan = calculate_isf_from_jump_matrix(
+            jump_matrix, times, np.array([dk, 2 * dk, 3 * dk]).reshape(3, 1, 2)
+        )
+        self.assertEqual(scan.shape, (3, 1, times.size))
+        np.testing.assert_array_almost_equal(
+            scan[1, 0], calculate_isf_from_jump_matrix(jump_matrix, times, 2 * dk)
+        )
+
+
+class ISFFitTest(unittest.TestCase):
+    def test_model_jacobian(self) -> None:
+        times = np.linspace(0, 4e-9, 50)
+        for model, parameters in (
+            (get_double_exponential_model(), np.array([0.3, 2e9, 0.5, 4e8])),
+            (
+                get_fey_4_variable_model_110(),
+                np.array([1.4e9, 0.2, 0.7e9, 0.8, 0.05]),
+            ),
+            (get_fey_model_110(), np.array([1.4e9, 3e8])),
+            (get_fey_model_112bar(), np.array([2e9, 1e9])),
+            (get_fey_model_112bar(a_dk=0.7), np.array([1e9, 3e9])),
+        ):
+            assert model.jacobian is not None
+            expected = np.zeros((times.size, parameters.size))
+            for i in range(parameters.size):
+                step = np.zeros_like(parameters)
+                step[i] = 1e-6 * parameters[i]
+                expected[:, i] = (
+                    model.function(times, parameters + step)
+                    - model.function(times, parameters - step)
+                ) / (2 * step[i])
+            np.testing.assert_allclose(
+                model.jacobian(times, parameters), expected, rtol=1e-5, atol=1e-8
+            )
+
+    def test_fit_isf_batch(self) -> None:
+        times = np.linspace(0, 4e-9, 100)
+        model = get_double_exponential_model()
+        parameters = np.zeros((2, 3, 4))
+        parameters[..., 0] = 0.4
+        parameters[..., 1] = np.linspace(1e9, 4e9, 3)[np.newaxis, :]
+        parameters[..., 2] = np.array([0.3, 0.5])[:, np.newaxis]
+        parameters[..., 3] = 3e8
+        data = np.array(
+            [model.function(times, p) for p in parameters.reshape(-1, 4)]
+        ).reshape(2, 3, times.size)
+
+        fit = fit_isf_batch(times, data, model, n_workers=2, executor="process")
+        self.assertEqual(fit.parameters.shape, (2, 3, 4))
+        self.assertTrue(np.all(fit.success))
+        np.testing.assert_allclose(fit.parameters, parameters, rtol=1e-4)
+        np.testing.assert_allclose(fit.standard_error / parameters, 0, atol=1e-6)
+
+        isf_list = {
+            "basis": TupleBasis(
+                FundamentalBasis(6),
+                TupleBasis(ExplicitTimeBasis(times), ExplicitTimeBasis(times)),
+            ),
+            "data": data.reshape(-1).astype(np.complex128),
+        }
+        np.testing.assert_allclose(
+            fit_isf_list(isf_list, model).parameters,
+            parameters.reshape(6, 4),
+            rtol=1e-4,
+        )
+
+    def test_fit_isf_list_standard_deviation(self) -> None:
+        times = np.linspace(0, 4e-9, 100)
+        model = get_double_exponential_model()
+        parameters = np.array([0.4, 2e9, 0.3, 3e8])
+        data = model.function(times, parameters)
+        # Only the points with a small standard deviation are correct
+        standard_deviation = np.where(np.arange(times.size) % 2 == 0, 1e-6, 1e3)
+        noisy = data + np.where(standard_deviation > 1, rng.random(times.size), 0)
+
+        isf_list = {
+            "basis": TupleBasis(
+                FundamentalBasis(1),
+                TupleBasis(ExplicitTimeBasis(times), ExplicitTimeBasis(times)),
+            ),
+            "data": noisy.astype(np.complex128),
+            "standard_deviation": standard_deviation,
+        }
+        fit = fit_isf_list(isf_list, model, n_workers=1)
+        np.testing.assert_allclose(fit.parameters[0], parameters, rtol=1e-4)
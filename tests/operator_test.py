@@ -12,6 +12,7 @@ from surface_potential_analysis.basis.basis import (
 from surface_potential_analysis.basis.explicit_basis import ExplicitBasis
 from surface_potential_analysis.basis.stacked_basis import TupleBasis
 from surface_potential_analysis.operator.conversion import (
+    OperatorConversionCache,
     convert_operator_list_to_basis,
     convert_operator_to_basis,
 )
@@ -163,3 +164,41 @@ class OperatorTest(unittest.TestCase):
             np.linalg.norm(converted_back_2["data"]), np.linalg.norm(operator["data"])
         )
         np.testing.assert_array_almost_equal(converted_back_2["data"], operator["data"])
+
+    def test_operator_conversion_cache(self) -> None:
+        m = rng.integers(3, 10)
+        data = rng.random((m, m)).astype(np.complex128)
+
+        operator: Operator[FundamentalBasis[int], FundamentalBasis[int]] = {
+            "basis": TupleBasis(FundamentalBasis(m), FundamentalBasis(m)),
+            "data": data.reshape(-1),
+        }
+        expected = convert_operator_to_basis(
+            operator,
+            TupleBasis(FundamentalTransformedBasis(m), FundamentalTransformedBasis(m)),
+        )
+
+        with OperatorConversionCache(max_bytes=2 * expected["data"].nbytes) as cache:
+            for _ in range(3):
+                actual = convert_operator_to_basis(
+                    operator,
+                    TupleBasis(
+                        FundamentalTransformedBasis(m), FundamentalTransformedBasis(m)
+                    ),
+                )
+                np.testing.assert_array_almost_equal(actual["data"], expected["data"])
+            self.assertEqual(cache.misses, 1)
+            self.assertEqual(cache.hits, 2)
+            self.assertEqual(cache.n_bytes, expected["data"].nbytes)
+
+            for i in range(3):
+                shifted: Operator[FundamentalBasis[int], FundamentalBasis[int]] = {
+                    "basis": operator["basis"],
+                    "data": operator["data"] + i + 1,
+                }
+                convert_operator_to_basis(shifted, expected["basis"])
+            self.assertEqual(len(cache), 2)
+            self.assertLessEqual(cache.n_bytes, cache.max_bytes)
+
+        convert_operator_to_basis(operator, expected["basis"])
+        self.assertEqual(cache.misses, 4)